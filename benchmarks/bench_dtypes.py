@@ -0,0 +1,78 @@
+"""
+Relatório do plano de tipos compacto (feature_registry.yaml).
+
+Compara a matriz de features como saía do round-trip por CSV (gravada e
+relida com pd.read_csv: dummies bool, numéricas int64) com o plano compacto
+(int32 / bool): memória, tempo de fit e métricas dos dois modelos do treino,
+que precisam ser idênticas.
+
+Uso: python -m benchmarks.bench_dtypes
+"""
+
+import io
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+
+from benchmarks.bench_encoding import make_training_frame
+from src.features import apply_dtype_plan, dtype_plan, load_registry, memory_report
+
+warnings.filterwarnings("ignore")
+
+
+def fit_and_score(model, X, y):
+    t0 = time.perf_counter()
+    model.fit(X, y)
+    elapsed = time.perf_counter() - t0
+    return roc_auc_score(y, model.predict_proba(X)[:, 1]), elapsed
+
+
+def csv_round_trip(X):
+    """
+    O caminho antigo do preparo: grava o CSV e lê de volta com pd.read_csv.
+    """
+    buffer = io.StringIO()
+    X.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+
+def main(n=45_211):
+    X, y = make_training_frame(n=n)
+    # Ruído no target para a métrica não saturar em 1.0
+    rng = np.random.default_rng(0)
+    y = np.where(rng.random(n) < 0.15, 1 - y, y)
+    wide = csv_round_trip(X)
+    compact = apply_dtype_plan(wide, dtype_plan(load_registry()))
+    n_bool = sum(pd.api.types.is_bool_dtype(dtype) for dtype in wide.dtypes)
+
+    before, after = memory_report(wide), memory_report(compact)
+    print(f"\n=== Matriz de features ({n} linhas x {X.shape[1]} colunas) ===")
+    print(
+        f"  CSV round-trip           {before / 1e6:8.2f} MB   "
+        f"({n_bool} bool + {X.shape[1] - n_bool} int64)"
+    )
+    print(f"  plano compacto           {after / 1e6:8.2f} MB   ({before / after:.2f}x menor)")
+
+    models = {
+        "log_reg": lambda: LogisticRegression(max_iter=500),
+        "rf": lambda: RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42),
+    }
+    print("\n=== Métricas (roc_auc) e tempo de fit ===")
+    for name, make_model in models.items():
+        auc_wide, t_wide = fit_and_score(make_model(), wide, y)
+        auc_compact, t_compact = fit_and_score(make_model(), compact, y)
+        status = "OK" if np.isclose(auc_wide, auc_compact, rtol=0, atol=1e-12) else "DIFERENTE"
+        print(
+            f"  {name:8s} csv={auc_wide:.6f} ({t_wide:.2f}s)  "
+            f"compacto={auc_compact:.6f} ({t_compact:.2f}s)  {status}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Microbenchmark do encoding de uma linha no serving.
+
+Compara o caminho antigo do /predict (DataFrame de 1 linha + ensure_boolean_columns
++ df.iloc[0].to_dict()) com o FeatureEncoder pré-compilado, isolando o custo do
+encoding e medindo também o tempo total com predict_proba.
+
+Uso: python -m benchmarks.bench_encoding
+"""
+
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from src.features import FeatureEncoder, boolean_columns, load_registry, numeric_columns
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+REGISTRY = load_registry()
+BOOLEAN_COLS = boolean_columns(REGISTRY)
+
+
+def make_training_frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {col: rng.integers(0, 1000, n) for col in numeric_columns(REGISTRY)}
+    for col in BOOLEAN_COLS:
+        data[col] = rng.random(n) < 0.3
+    X = pd.DataFrame(data)
+    y = ((X["duration"] > 500) ^ X["housing_yes"]).astype(int)
+    return X, y
+
+
+def legacy_encode(record):
+    df = pd.DataFrame([record])
+    for col in BOOLEAN_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(bool)
+    return df
+
+
+def timeit(fn, n):
+    samples = np.empty(n)
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    return samples * 1e6  # µs
+
+
+def report(label, samples):
+    print(
+        f"  {label:32s} p50={np.percentile(samples, 50):9.1f}µs  "
+        f"p99={np.percentile(samples, 99):9.1f}µs"
+    )
+    return float(np.percentile(samples, 50))
+
+
+def main(n=2000):
+    X, y = make_training_frame()
+    records = X.head(200).to_dict(orient="records")
+    models = {
+        "log_reg": LogisticRegression(max_iter=500).fit(X, y),
+        "rf": RandomForestClassifier(
+            n_estimators=200, max_depth=10, random_state=42, n_jobs=-1
+        ).fit(X, y),
+    }
+
+    encoder = FeatureEncoder.from_registry(REGISTRY, columns=X.columns)
+    record = records[0]
+
+    print(f"\n=== Encoding de 1 linha ({n} iterações) ===")
+    old = report("DataFrame + ensure_boolean", timeit(lambda: legacy_encode(record), n))
+    new = report("FeatureEncoder.encode", timeit(lambda: encoder.encode(record), n))
+    print(f"  speedup: {old / new:.1f}x")
+
+    print("\n=== Encoding + log (to_dict / to_record) ===")
+    old = report(
+        "DataFrame + iloc[0].to_dict", timeit(lambda: legacy_encode(record).iloc[0].to_dict(), n)
+    )
+    new = report(
+        "encode + to_record", timeit(lambda: encoder.to_record(encoder.encode(record)[0]), n)
+    )
+    print(f"  speedup: {old / new:.1f}x")
+
+    for name, model in models.items():
+        # Mesmas predições nos dois caminhos
+        for r in records:
+            expected = model.predict_proba(legacy_encode(r))
+            assert np.array_equal(model.predict_proba(encoder.encode(r)), expected)
+
+        print(f"\n=== Requisição completa, modelo {name} ===")
+        iters = n if name == "log_reg" else n // 10
+        old = report(
+            "DataFrame + predict_proba",
+            timeit(lambda m=model: m.predict_proba(legacy_encode(record)), iters),
+        )
+        new = report(
+            "encode + predict_proba",
+            timeit(lambda m=model: m.predict_proba(encoder.encode(record)), iters),
+        )
+        print(f"  speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark do micro-batching do /predict.
+
+Simula clientes concorrentes mandando predições de uma linha e mede vazão
+(req/s) e latência p50/p99 sem micro-batching e com janelas de espera
+diferentes, para o modelo sklearn e para o motor achatado (forest_engine).
+
+Uso: python -m benchmarks.bench_microbatch
+"""
+
+import threading
+import time
+import warnings
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from benchmarks.bench_encoding import make_training_frame
+from src.forest_engine import PackedForest
+from src.micro_batcher import MicroBatcher
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+WINDOWS_MS = [0.5, 1, 2, 5]
+
+
+def run_load(predict_one, rows, n_clients, duration):
+    """
+    n_clients threads chamando predict_one(linha) em loop por `duration` s.
+    Retorna (req/s, latências em ms).
+    """
+    latencies = [[] for _ in range(n_clients)]
+    stop = threading.Event()
+    barrier = threading.Barrier(n_clients + 1)
+
+    def client(i):
+        rng = np.random.default_rng(i)
+        barrier.wait()
+        while not stop.is_set():
+            row = rows[rng.integers(len(rows))]
+            t0 = time.perf_counter()
+            predict_one(row)
+            latencies[i].append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    samples = np.concatenate([np.asarray(s) for s in latencies]) * 1e3
+    return len(samples) / duration, samples
+
+
+def report(label, throughput, samples, extra=""):
+    print(
+        f"  {label:24s} {throughput:9.0f} req/s  "
+        f"p50={np.percentile(samples, 50):7.2f}ms  p99={np.percentile(samples, 99):7.2f}ms  {extra}"
+    )
+
+
+def bench_model(name, model, rows, n_clients, duration):
+    print(f"\n=== {name}: {n_clients} clientes concorrentes, {duration:.0f}s por cenário ===")
+
+    throughput, samples = run_load(
+        lambda row: model.predict_proba(row.reshape(1, -1))[:, 1], rows, n_clients, duration
+    )
+    report("sem micro-batching", throughput, samples)
+
+    for window in WINDOWS_MS:
+        batcher = MicroBatcher(max_batch=64, max_wait=window / 1000)
+        throughput, samples = run_load(
+            lambda row, b=batcher: b.predict(model, row), rows, n_clients, duration
+        )
+        batcher.stop()
+        stats = batcher.stats()
+        report(f"janela {window} ms", throughput, samples, f"lote médio={stats['avg_batch']}")
+
+
+def main(n_clients=16, duration=3.0):
+    X, y = make_training_frame()
+    rf = RandomForestClassifier(n_estimators=200, max_depth=10, random_state=42).fit(X, y)
+    rows = X.head(500).to_numpy(dtype=np.float64)
+
+    bench_model("RandomForest (sklearn)", rf, rows, n_clients, duration)
+    bench_model("PackedForest", PackedForest.from_estimator(rf), rows, n_clients, duration)
+
+
+if __name__ == "__main__":
+    main()
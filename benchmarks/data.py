@@ -0,0 +1,73 @@
+"""
+Dados sintéticos no formato do bank-full.csv, compartilhados pela suíte de
+benchmarks e pelos testes (sem depender do pytest).
+"""
+
+import numpy as np
+import pandas as pd
+
+BANK_CATEGORIES = {
+    "job": [
+        "admin.",
+        "blue-collar",
+        "entrepreneur",
+        "housemaid",
+        "management",
+        "retired",
+        "self-employed",
+        "services",
+        "student",
+        "technician",
+        "unemployed",
+        "unknown",
+    ],
+    "marital": ["divorced", "married", "single"],
+    "education": ["primary", "secondary", "tertiary", "unknown"],
+    "default": ["no", "yes"],
+    "housing": ["no", "yes"],
+    "loan": ["no", "yes"],
+    "contact": ["cellular", "telephone", "unknown"],
+    "month": ["apr", "aug", "dec", "feb", "jan", "jul", "jun", "mar", "may", "nov", "oct", "sep"],
+    "poutcome": ["failure", "other", "success", "unknown"],
+}
+
+# Ordem original das colunas do bank-full.csv
+BANK_COLUMNS = [
+    "age",
+    "job",
+    "marital",
+    "education",
+    "default",
+    "balance",
+    "housing",
+    "loan",
+    "contact",
+    "day",
+    "month",
+    "duration",
+    "campaign",
+    "pdays",
+    "previous",
+    "poutcome",
+    "y",
+]
+
+
+def make_raw_bank_frame(n=300, seed=0):
+    """
+    DataFrame sintético no formato do bank-full.csv, com todas as categorias
+    presentes (para gerar as mesmas 42 colunas do dataset real).
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in BANK_COLUMNS:
+        if col in BANK_CATEGORIES:
+            cats = BANK_CATEGORIES[col]
+            # Garante todas as categorias + o resto aleatório
+            values = cats + rng.choice(cats, n - len(cats)).tolist()
+            data[col] = rng.permutation(values)
+        elif col == "y":
+            data[col] = rng.choice(["no", "yes"], n, p=[0.8, 0.2])
+        else:
+            data[col] = rng.integers(-10, 1000, n)
+    return pd.DataFrame(data)[BANK_COLUMNS]
@@ -0,0 +1,310 @@
+"""
+Suíte de benchmarks de performance do pipeline e do serving.
+
+Roda tudo localmente, sem MLflow/Postgres de verdade (tracking em um file
+store temporário, registry e logs de inferência mockados):
+
+  - preprocessing: vazão (linhas/s) do data_bank_marketing, em memória e streaming
+  - load_data: tempo de leitura dos arquivos processados pelo treino
+  - train: tempo de fit de cada candidato de candidate_models()
+  - serve: latência p50/p99 de /predict (encoded e raw) e /predict_batch via TestClient
+
+Uso:
+  python -m benchmarks.suite run [--output resultados.json] [--save-baseline]
+  python -m benchmarks.suite compare [--baseline base.json] atual.json [--threshold 0.2]
+
+O compare sai com código 1 se alguma métrica piorar mais que o threshold.
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from benchmarks.data import make_raw_bank_frame
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+BASELINE_PATH = ROOT / "benchmarks" / "baselines" / "baseline.json"
+DEFAULT_THRESHOLD = 0.2
+
+warnings.filterwarnings("ignore")
+
+
+def metric(value, unit, better):
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def percentiles(samples_s, prefix):
+    ms = np.asarray(samples_s) * 1e3
+    return {
+        f"{prefix}_p50_ms": metric(np.percentile(ms, 50), "ms", "lower"),
+        f"{prefix}_p99_ms": metric(np.percentile(ms, 99), "ms", "lower"),
+    }
+
+
+def best_of(fn, repeat=3):
+    """
+    Menor tempo (s) de `repeat` execuções: menos sensível a ruído da máquina.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+# ----------------------------------------------------------------------
+# Casos
+# ----------------------------------------------------------------------
+
+
+def bench_preprocessing(workdir, raw_df):
+    import src.data_bank_marketing as dbm
+
+    raw_path = workdir / "bank-full.csv"
+    raw_df.to_csv(raw_path, sep=";", index=False)
+    processed = workdir / "processed"
+    processed.mkdir(exist_ok=True)
+
+    results = {}
+    with (
+        patch.object(dbm, "RAW_PATH", raw_path),
+        patch.object(dbm, "PROCESSED_DIR", processed),
+        patch("src.stage_cache.STAGE_CACHE_DIR", workdir / "stage_cache"),
+    ):
+        for label, chunksize in (("in_memory", 0), ("streaming", 10_000)):
+            elapsed = best_of(lambda c=chunksize: dbm.main(chunksize=c, force=True), repeat=2)
+            results[f"preprocess_{label}_rows_per_s"] = metric(
+                len(raw_df) / elapsed, "rows/s", "higher"
+            )
+        # Deixa os arquivos do modo em memória para o load_data
+        dbm.main(chunksize=0, force=True)
+
+    return results, processed
+
+
+def bench_load_data(processed):
+    import src.train_bank_marketing as tbm
+
+    with patch.object(tbm, "PROCESSED", processed):
+        elapsed = best_of(tbm.load_data, repeat=5)
+        data = tbm.load_data()
+    return {"load_data_ms": metric(elapsed * 1e3, "ms", "lower")}, data
+
+
+def bench_training(data):
+    import src.train_bank_marketing as tbm
+
+    X_train, _, y_train, _ = data
+    results = {}
+    for name, model in tbm.candidate_models().items():
+        elapsed = best_of(lambda m=model: m.fit(X_train, y_train), repeat=1)
+        results[f"train_{name}_s"] = metric(elapsed, "s", "lower")
+    return results
+
+
+def bench_serving(data, vocabulary, raw_records, n=300, batch_size=100):
+    from fastapi.testclient import TestClient
+    from sklearn.ensemble import RandomForestClassifier
+
+    X_train, X_test, y_train, _ = data
+    model = RandomForestClassifier(n_estimators=200, max_depth=10, random_state=42).fit(
+        X_train, y_train
+    )
+
+    client_mlflow = MagicMock()
+    version = MagicMock(run_id="BENCH", version="1")
+    client_mlflow.get_latest_versions.return_value = [version]
+
+    os.environ["MODEL_POLL_INTERVAL"] = "0"
+    sys.modules.pop("src.serve_bank", None)
+    with (
+        patch("mlflow.tracking.MlflowClient", return_value=client_mlflow),
+        patch("src.model_cache.load_cached_model", return_value=model),
+        patch("src.model_cache.load_cached_dict", return_value=vocabulary),
+    ):
+        serve = importlib.import_module("src.serve_bank")
+    serve.inference_log = MagicMock()
+
+    client = TestClient(serve.app)
+    encoded = X_test.head(n).to_dict(orient="records")
+    encoded = [{k: (v.item() if hasattr(v, "item") else v) for k, v in r.items()} for r in encoded]
+
+    def timed(path, payloads):
+        samples = []
+        for payload in payloads:
+            t0 = time.perf_counter()
+            resp = client.post(path, json=payload)
+            samples.append(time.perf_counter() - t0)
+            assert resp.status_code == 200, resp.text
+        return samples
+
+    results = {}
+    results.update(percentiles(timed("/predict", [{"input": r} for r in encoded]), "serve_predict"))
+    results.update(
+        percentiles(
+            timed("/predict", [{"input": r, "input_format": "raw"} for r in raw_records[:n]]),
+            "serve_predict_raw",
+        )
+    )
+    batches = [
+        {"inputs": encoded[i : i + batch_size]} for i in range(0, len(encoded), batch_size)
+    ] * 5
+    results.update(percentiles(timed("/predict_batch", batches), f"serve_batch{batch_size}"))
+
+    sys.modules.pop("src.serve_bank", None)
+    return results
+
+
+def run(n_rows=45_211):
+    """
+    Executa todos os casos e devolve o documento de resultados.
+    """
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = pathlib.Path(tmp)
+        # Tracking do MLflow em file store descartável (import do treino)
+        os.environ["MLFLOW_TRACKING_URI"] = (workdir / "mlruns").as_uri()
+
+        from src.features import build_vocabulary
+
+        raw_df = make_raw_bank_frame(n=n_rows, seed=0)
+        vocabulary = build_vocabulary(raw_df.drop(columns=["y"]))
+        raw_records = raw_df.drop(columns=["y"]).head(500).to_dict(orient="records")
+        raw_records = [
+            {k: (v.item() if hasattr(v, "item") else v) for k, v in r.items()} for r in raw_records
+        ]
+
+        # Os prints do pipeline ficam fora do relatório
+        quiet = contextlib.redirect_stdout(io.StringIO())
+
+        metrics = {}
+        print("preprocessing...")
+        with quiet:
+            results, processed = bench_preprocessing(workdir, raw_df)
+        metrics.update(results)
+        print("load_data...")
+        with quiet:
+            results, data = bench_load_data(processed)
+        metrics.update(results)
+        print("train...")
+        metrics.update(bench_training(data))
+        print("serve...")
+        with quiet:
+            metrics.update(bench_serving(data, vocabulary, raw_records))
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "n_rows": n_rows,
+        "metrics": metrics,
+    }
+
+
+# ----------------------------------------------------------------------
+# Comparação com baseline
+# ----------------------------------------------------------------------
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara as métricas em comum. Retorna uma linha por métrica com a
+    variação relativa e se ela é uma regressão (piorou mais que threshold,
+    no sentido de "better" da métrica).
+    """
+    rows = []
+    for name, base in baseline["metrics"].items():
+        if name not in current["metrics"]:
+            continue
+        cur = current["metrics"][name]
+        change = (cur["value"] - base["value"]) / base["value"] if base["value"] else 0.0
+        worse = change if base["better"] == "lower" else -change
+        rows.append(
+            {
+                "metric": name,
+                "baseline": base["value"],
+                "current": cur["value"],
+                "unit": base["unit"],
+                "change": change,
+                "regression": worse > threshold,
+            }
+        )
+    return rows
+
+
+def print_report(metrics):
+    for name, m in metrics.items():
+        print(f"  {name:34s} {m['value']:12.2f} {m['unit']}")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'métrica':34s} {'baseline':>12s} {'atual':>12s} {'variação':>9s}")
+    for row in rows:
+        flag = "  REGRESSÃO" if row["regression"] else ""
+        print(
+            f"{row['metric']:34s} {row['baseline']:12.2f} {row['current']:12.2f} "
+            f"{row['change']:+8.1%}{flag}"
+        )
+    n_reg = sum(row["regression"] for row in rows)
+    print(f"\n{n_reg} regressão(ões) acima de {threshold:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline e do serving")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="executa a suíte")
+    run_parser.add_argument("--output", type=pathlib.Path, help="grava os resultados em JSON")
+    run_parser.add_argument("--save-baseline", action="store_true", help="vira o novo baseline")
+    run_parser.add_argument("--rows", type=int, default=45_211)
+
+    cmp_parser = sub.add_parser("compare", help="compara resultados com o baseline")
+    cmp_parser.add_argument("current", type=pathlib.Path)
+    cmp_parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE_PATH)
+    cmp_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(n_rows=args.rows)
+        print_report(results["metrics"])
+        targets = [args.output] if args.output else []
+        if args.save_baseline:
+            targets.append(BASELINE_PATH)
+        for target in targets:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(json.dumps(results, indent=2), encoding="utf-8")
+            print(f"Resultados salvos em {target}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"Baseline não encontrado: {args.baseline}")
+        print("Gere um com `make bench-baseline` (ou informe --baseline).")
+        return 2
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    n_base, n_cur = baseline.get("n_rows"), current.get("n_rows")
+    if n_base != n_cur:
+        print(f"Aviso: baseline com {n_base} linhas, atual com {n_cur}")
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows, args.threshold)
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,42 +1,316 @@
+import argparse
+import json
+import os
 import pathlib
 
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 
+from src.features import (
+    REGISTRY_PATH,
+    apply_dtype_plan,
+    build_vocabulary,
+    dtype_plan,
+    encode_frame,
+    load_registry,
+    memory_report,
+    vocabulary_from_categories,
+)
+from src.processed_data import EXTENSIONS, FrameWriter, processed_format, write_frame
+from src.stage_cache import code_version, file_digests, lookup, record, stage_key
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 RAW_PATH = ROOT / "data" / "raw" / "bank-full.csv"
 PROCESSED_DIR = ROOT / "data" / "processed"
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
+# Tabela categoria → índice de coluna (vai junto com o modelo para o serving)
+ENCODING_FILE = "encoding.json"
+
+# Código que define o resultado do estágio (entra na chave do cache)
+CODE_FILES = [
+    pathlib.Path(__file__),
+    pathlib.Path(__file__).with_name("features.py"),
+    pathlib.Path(__file__).with_name("processed_data.py"),
+]
+
+TARGET_MAP = {"no": 0, "yes": 1}
+SPLITS = ("X_train", "X_test", "y_train", "y_test")
+
+# Estratégias de split treino/teste (PROCESSED_SPLIT)
+SPLIT_STRATEGIES = ("random", "stable")
+
+
+def save_vocabulary(vocabulary):
+    with open(PROCESSED_DIR / ENCODING_FILE, "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f, indent=2, ensure_ascii=False)
+
+
+def read_chunks(chunksize):
+    return pd.read_csv(RAW_PATH, sep=";", chunksize=chunksize)
+
+
+def scan_vocabulary(chunksize):
+    """
+    1ª passada do modo streaming: acumula as categorias de cada coluna e a
+    contagem de linhas por classe do target, chunk a chunk. O vocabulário
+    final é o mesmo do get_dummies sobre o arquivo inteiro, independente de
+    quais categorias aparecem em cada chunk.
+    """
+    columns = None
+    categories = {}
+    class_counts = {}
+
+    for chunk in read_chunks(chunksize):
+        X = chunk.drop(columns=["y"])
+        if columns is None:
+            columns = list(X.columns)
+        for col in X.select_dtypes(include=["object", "string", "category"]).columns:
+            categories.setdefault(col, set()).update(X[col].dropna().unique().tolist())
+        for cls, n in chunk["y"].map(TARGET_MAP).value_counts().items():
+            class_counts[int(cls)] = class_counts.get(int(cls), 0) + int(n)
+
+    # Mantém a ordem original das colunas categóricas
+    categories = {col: categories[col] for col in columns if col in categories}
+    numeric = [col for col in columns if col not in categories]
+    return vocabulary_from_categories(numeric, categories), class_counts
+
+
+def stratified_test_masks(class_counts, test_size, random_state):
+    """
+    Para cada classe, um vetor bool (1 byte por linha da classe) dizendo se a
+    i-ésima ocorrência daquela classe no arquivo vai para o teste. Mantém a
+    proporção das classes como o train_test_split(stratify=y).
+    """
+    rng = np.random.default_rng(random_state)
+    masks = {}
+    for cls in sorted(class_counts):
+        n = class_counts[cls]
+        mask = np.zeros(n, dtype=bool)
+        mask[rng.choice(n, int(round(test_size * n)), replace=False)] = True
+        masks[cls] = mask
+    return masks
+
+
+class MaskSplit:
+    """
+    Split aleatório do modo streaming: consome, chunk a chunk, as máscaras de
+    stratified_test_masks na ordem em que cada classe aparece no arquivo.
+    """
+
+    def __init__(self, masks):
+        self.masks = masks
+        self.seen = dict.fromkeys(masks, 0)
+
+    def assign(self, y_values):
+        y_values = np.asarray(y_values)
+        is_test = np.zeros(len(y_values), dtype=bool)
+        for cls, mask in self.masks.items():
+            rows = y_values == cls
+            k = int(rows.sum())
+            is_test[rows] = mask[self.seen[cls] : self.seen[cls] + k]
+            self.seen[cls] += k
+        return is_test
+
+
+class StableSplit:
+    """
+    Split treino/teste estratificado e estável a linhas novas no fim do CSV
+    (PROCESSED_SPLIT=stable, base do retreino incremental).
+
+    A k-ésima ocorrência de cada classe vai para o teste quando
+    floor((k + 1) * test_size + fase) > floor(k * test_size + fase), com uma
+    fase por classe sorteada a partir do random_state: amostragem sistemática
+    por classe, com a proporção do teste exata por classe (a menos de 1 linha).
+    A decisão de uma linha só depende das linhas anteriores do arquivo, então
+    acrescentar linhas ao CSV não muda o split (nem a ordem) das que já
+    existiam: X_train/y_train novos começam pelos antigos, como o retreino
+    incremental exige. O mesmo split sai em memória e em streaming.
 
-def main(test_size=0.2, random_state=42):
+    Não é o mesmo sorteio do train_test_split: trocar o split padrão por este
+    muda quais linhas são de teste e, com isso, as métricas reportadas.
+    """
+
+    def __init__(self, test_size, random_state):
+        self.test_size = test_size
+        self.random_state = random_state
+        self.seen = {}
+
+    def _phase(self, cls):
+        return np.random.default_rng([self.random_state, int(cls)]).random()
+
+    def assign(self, y_values):
+        """
+        Máscara is_test para o próximo bloco de linhas (na ordem do arquivo).
+        """
+        y_values = np.asarray(y_values)
+        is_test = np.zeros(len(y_values), dtype=bool)
+        for cls in np.unique(y_values):
+            rows = y_values == cls
+            start = self.seen.get(cls, 0)
+            k = start + np.arange(int(rows.sum()))
+            phase = self._phase(cls)
+            is_test[rows] = np.floor((k + 1) * self.test_size + phase) > np.floor(
+                k * self.test_size + phase
+            )
+            self.seen[cls] = start + int(rows.sum())
+        return is_test
+
+
+def main_streaming(test_size, random_state, fmt, export_csv, chunksize, split="random"):
+    """
+    Preparo out-of-core em duas passadas sobre o CSV, com memória constante
+    por chunk: (1) vocabulário + contagem por classe, (2) encoding e split
+    estratificado de cada chunk (máscaras sorteadas ou StableSplit), gravado
+    de forma incremental.
+    """
+    print(f"Modo streaming (chunks de {chunksize} linhas): 1ª passada...")
+    vocabulary, class_counts = scan_vocabulary(chunksize)
+    save_vocabulary(vocabulary)
+
+    if split == "stable":
+        splitter = StableSplit(test_size, random_state)
+    else:
+        splitter = MaskSplit(stratified_test_masks(class_counts, test_size, random_state))
+    plan = dtype_plan(load_registry())
+
+    formats = [fmt] + (["csv"] if export_csv and fmt != "csv" else [])
+    writers = [FrameWriter(PROCESSED_DIR, name, f) for f in formats for name in SPLITS]
+
+    print("2ª passada: encoding + split...")
+    try:
+        for chunk in read_chunks(chunksize):
+            y = chunk["y"].map(TARGET_MAP)
+            X = apply_dtype_plan(encode_frame(chunk.drop(columns=["y"]), vocabulary), plan)
+
+            is_test = splitter.assign(y.to_numpy())
+
+            parts = {
+                "X_train": X[~is_test],
+                "X_test": X[is_test],
+                "y_train": y[~is_test],
+                "y_test": y[is_test],
+            }
+            for writer in writers:
+                writer.write(parts[writer.path.stem])
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+def run_in_memory(test_size, random_state, fmt, export_csv, split="random"):
+    """
+    Preparo em memória (PROCESSED_CHUNKSIZE=0): lê o CSV inteiro, codifica e
+    separa treino/teste de uma vez. Mesmas colunas do main_streaming.
+    """
     print("Carregando dataset...")
     df = pd.read_csv(RAW_PATH, sep=";")
 
     # Converter target
-    df["y"] = df["y"].map({"no": 0, "yes": 1})
+    df["y"] = df["y"].map(TARGET_MAP)
 
     # Split features/target
     X = df.drop(columns=["y"])
     y = df["y"]
 
-    # Faz um one-hot encoding só com o get_dummies
-    X = pd.get_dummies(X, drop_first=True)
+    # One-hot encoding equivalente ao get_dummies(drop_first=True), mas a
+    # partir de um vocabulário explícito que o serving reaproveita
+    vocabulary = build_vocabulary(X)
+    X = encode_frame(X, vocabulary)
+
+    # Plano de tipos compacto do feature_registry.yaml (int32 / bool)
+    before = memory_report(X)
+    X = apply_dtype_plan(X, dtype_plan(load_registry()))
+    after = memory_report(X)
+    print(f"Matriz de features: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
 
-    # Split train/test
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=test_size, random_state=random_state, stratify=y
-    )
+    # Split train/test estratificado
+    if split == "stable":
+        # Estável a linhas novas no fim do CSV (mesma ordem do arquivo)
+        is_test = StableSplit(test_size, random_state).assign(y.to_numpy())
+        X_train, X_test = X[~is_test], X[is_test]
+        y_train, y_test = y[~is_test], y[is_test]
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, random_state=random_state, stratify=y
+        )
 
     # Salvar
-    print("Salvando arquivos processados...")
-    X_train.to_csv(PROCESSED_DIR / "X_train.csv", index=False)
-    X_test.to_csv(PROCESSED_DIR / "X_test.csv", index=False)
-    y_train.to_csv(PROCESSED_DIR / "y_train.csv", index=False)
-    y_test.to_csv(PROCESSED_DIR / "y_test.csv", index=False)
+    print(f"Salvando arquivos processados ({fmt})...")
+    frames = {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+    for name, frame in frames.items():
+        write_frame(frame, PROCESSED_DIR, name, fmt)
+        if export_csv and fmt != "csv":
+            write_frame(frame, PROCESSED_DIR, name, "csv")
+    save_vocabulary(vocabulary)
+
+
+def output_paths(fmt, export_csv):
+    formats = [fmt] + (["csv"] if export_csv and fmt != "csv" else [])
+    paths = [PROCESSED_DIR / f"{name}{EXTENSIONS[f]}" for f in formats for name in SPLITS]
+    return paths + [PROCESSED_DIR / ENCODING_FILE]
+
+
+def main(
+    test_size=0.2,
+    random_state=42,
+    fmt=None,
+    export_csv=None,
+    chunksize=None,
+    force=False,
+    split=None,
+):
+    """
+    fmt: formato dos arquivos processados (PROCESSED_FORMAT, padrão feather).
+    export_csv: grava também os CSVs para debug (PROCESSED_EXPORT_CSV=1).
+    chunksize: > 0 liga o modo streaming (PROCESSED_CHUNKSIZE), para arquivos
+    que não cabem em memória.
+    force: ignora o cache do estágio e reprocessa.
+    split: "random" (padrão, train_test_split estratificado) ou "stable"
+    (StableSplit, para acrescentar linhas ao CSV e usar o retreino
+    incremental) — PROCESSED_SPLIT.
+
+    O estágio é cacheado pelo hash do CSV bruto + parâmetros + código: com as
+    mesmas entradas (e os arquivos processados intactos) vira um no-op.
+    """
+    fmt = fmt or processed_format()
+    if export_csv is None:
+        export_csv = os.getenv("PROCESSED_EXPORT_CSV", "0") == "1"
+    if chunksize is None:
+        chunksize = int(os.getenv("PROCESSED_CHUNKSIZE", "0"))
+    split = split or os.getenv("PROCESSED_SPLIT", "random")
+    if split not in SPLIT_STRATEGIES:
+        raise ValueError(f"PROCESSED_SPLIT inválido: {split!r} (use {', '.join(SPLIT_STRATEGIES)})")
+
+    params = {
+        "test_size": test_size,
+        "random_state": random_state,
+        "fmt": fmt,
+        "export_csv": export_csv,
+        "chunksize": chunksize,
+        "split": split,
+    }
+    key = stage_key("data", params, files=[RAW_PATH, REGISTRY_PATH], code=code_version(*CODE_FILES))
+    outputs = output_paths(fmt, export_csv)
+
+    if not force:
+        cached = lookup("data", key)
+        if cached is not None and file_digests(outputs) == cached:
+            record("data", key, "hit")
+            print(f"Cache hit (data, {key[:12]}): arquivos processados reaproveitados.")
+            return
+
+    if chunksize > 0:
+        main_streaming(test_size, random_state, fmt, export_csv, chunksize, split)
+    else:
+        run_in_memory(test_size, random_state, fmt, export_csv, split)
 
+    record("data", key, "force" if force else "miss", outputs=file_digests(outputs))
     print("Processamento concluído com sucesso.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Preparo dos dados do Bank Marketing")
+    parser.add_argument("--force", action="store_true", help="ignora o cache do estágio")
+    main(force=parser.parse_args().force)
@@ -1,51 +1,209 @@
+import csv
+import io
 import json
 import os
+import threading
+from contextlib import contextmanager
 
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
+# Pool de conexões compartilhado pelo processo (criado sob demanda)
+_pool = None
+_pool_lock = threading.Lock()
 
-def get_conn():
+
+def connection_params():
     """
-    Conecta tanto localmente quanto dentro do Docker.
+    Parâmetros de conexão, tanto localmente quanto dentro do Docker.
     """
     host = os.getenv("POSTGRES_HOST", "localhost")
     if host == "localhost" and os.getenv("RUNNING_IN_DOCKER") == "1":
         host = "postgres"
 
-    return psycopg2.connect(
-        host=host,
-        port=os.getenv("POSTGRES_PORT", "5432"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD"),
-        dbname=os.getenv("POSTGRES_DB"),
-    )
+    return {
+        "host": host,
+        "port": os.getenv("POSTGRES_PORT", "5432"),
+        "user": os.getenv("POSTGRES_USER"),
+        "password": os.getenv("POSTGRES_PASSWORD"),
+        "dbname": os.getenv("POSTGRES_DB"),
+    }
+
+
+def get_conn():
+    """
+    Conecta tanto localmente quanto dentro do Docker.
+    Abre uma conexão nova e avulsa; prefira pooled_conn() no dia a dia.
+    """
+    return psycopg2.connect(**connection_params())
+
+
+def get_pool():
+    """
+    Retorna o pool de conexões do processo, criando-o na primeira chamada.
+    Tamanho configurável via POSTGRES_POOL_MIN / POSTGRES_POOL_MAX.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(
+                minconn=int(os.getenv("POSTGRES_POOL_MIN", "1")),
+                maxconn=int(os.getenv("POSTGRES_POOL_MAX", "10")),
+                **connection_params(),
+            )
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def pooled_conn():
+    """
+    Empresta uma conexão do pool: commita ao sair sem erro, faz rollback se
+    houver exceção e sempre devolve a conexão ao pool.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
 
 
 def save_training_row(run_id, model_version, features: dict, target: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO training_data (run_id, model_version, features, target)
-        VALUES (%s, %s, %s::jsonb, %s::jsonb)
-        """,
-        (run_id, model_version, json.dumps(features), json.dumps(target)),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    save_training_rows(run_id, model_version, rows=[features], targets=[target])
+
+
+def save_training_rows(run_id, model_version, rows: list[dict], targets: list[int]):
+    """
+    Versão em lote de save_training_row (um único INSERT multi-linha).
+    """
+    if not rows:
+        return
+
+    values = [
+        (run_id, model_version, json.dumps(features), json.dumps(target))
+        for features, target in zip(rows, targets, strict=True)
+    ]
+
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """
+            INSERT INTO training_data (run_id, model_version, features, target)
+            VALUES %s
+            """,
+            values,
+            template="(%s, %s, %s::jsonb, %s::jsonb)",
+            page_size=max(len(values), 100),
+        )
+        cur.close()
+
+
+def copy_training_rows(snapshot, X, y, chunk_size=50_000):
+    """
+    Materializa o conjunto de treino inteiro em training_rows via COPY, em
+    chunks de `chunk_size` linhas (features como JSONB, mesmo formato do
+    input de inference_logs).
+
+    As linhas são identificadas pelo snapshot do treino (hash de X/y, ver
+    train_bank_marketing.snapshot_tags), que fica em training_data.train_snapshot
+    de cada run. Idempotente: se o snapshot já está completo no banco, não
+    grava nada; se está parcial, é regravado. Tudo em uma transação, sob um
+    advisory lock por snapshot. Retorna o nº de linhas gravadas.
+    """
+    n_rows = len(X)
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (snapshot,))
+        cur.execute("SELECT count(*) FROM training_rows WHERE snapshot = %s", (snapshot,))
+        if cur.fetchone()[0] == n_rows:
+            cur.close()
+            return 0
+
+        cur.execute("DELETE FROM training_rows WHERE snapshot = %s", (snapshot,))
+        for start in range(0, n_rows, chunk_size):
+            chunk = X.iloc[start : start + chunk_size]
+            features = chunk.to_json(orient="records", lines=True).splitlines()
+            targets = y[start : start + chunk_size]
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for offset, (row, target) in enumerate(zip(features, targets, strict=True)):
+                writer.writerow((snapshot, start + offset, row, int(target)))
+            buffer.seek(0)
+
+            cur.copy_expert(
+                "COPY training_rows (snapshot, row_idx, features, target) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        cur.close()
+    return n_rows
 
 
 def save_inference_row(run_id, model_version, features: dict, prediction: float):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO inference_logs (run_id, model_version, input, prediction)
-        VALUES (%s, %s, %s::jsonb, %s)
-        """,
-        (run_id, model_version, json.dumps(features), prediction),
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO inference_logs (run_id, model_version, input, prediction)
+            VALUES (%s, %s, %s::jsonb, %s)
+            """,
+            (run_id, model_version, json.dumps(features), prediction),
+        )
+        cur.close()
+
+
+def save_inference_rows(run_id, model_version, rows: list[dict], predictions: list[float]):
+    """
+    Versão em lote de save_inference_row: grava todas as linhas com um único
+    INSERT multi-linha (execute_values) e um único commit.
+    """
+    save_inference_records(
+        [
+            (run_id, model_version, features, prediction)
+            for features, prediction in zip(rows, predictions, strict=True)
+        ]
     )
-    conn.commit()
-    cur.close()
-    conn.close()
+
+
+def save_inference_records(records: list[tuple]):
+    """
+    Grava registros (run_id, model_version, features, prediction) em
+    inference_logs com um único INSERT multi-linha. Cada registro carrega seu
+    próprio run_id/model_version (usado pelo logger assíncrono do serving).
+    """
+    if not records:
+        return
+
+    values = [
+        (run_id, model_version, json.dumps(features), float(prediction))
+        for run_id, model_version, features, prediction in records
+    ]
+
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """
+            INSERT INTO inference_logs (run_id, model_version, input, prediction)
+            VALUES %s
+            """,
+            values,
+            template="(%s, %s, %s::jsonb, %s)",
+            page_size=max(len(values), 100),
+        )
+        cur.close()
@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2
+
+# Nº de bins por quantil nos histogramas de referência do treino
+DEFAULT_BINS = 10
+
+# PSI > 0.2 costuma indicar mudança relevante de distribuição
+PSI_THRESHOLD = 0.20
+KS_THRESHOLD = 0.10
+
+# Piso das proporções no PSI (bins vazios não viram log(0))
+PSI_EPS = 1e-4
+
+# Grupos one-hot: distância de Jensen-Shannon (base 2, entre 0 e 1) e a
+# variação mínima de participação para listar uma categoria como alterada
+JS_THRESHOLD = 0.10
+CATEGORY_SHIFT = 0.05
+
+# Rótulo da categoria descartada pelo get_dummies(drop_first=True)
+BASE_CATEGORY = "(base)"
+
+
+def numeric_columns(X: pd.DataFrame):
+    # Flags/dummies booleanas ficam de fora (não são distribuições contínuas)
+    return [c for c in X.columns if pd.api.types.is_numeric_dtype(X[c]) and X[c].dtype != bool]
+
+
+def edge_matrix(edges_list):
+    """
+    Empilha as bordas internas de cada feature numa matriz (n_features,
+    max_bordas), completando com +inf: um bin extra sempre vazio, que não
+    altera PSI nem KS.
+    """
+    width = max((len(e) for e in edges_list), default=0)
+    edges = np.full((len(edges_list), width), np.inf)
+    for i, e in enumerate(edges_list):
+        edges[i, : len(e)] = e
+    return edges
+
+
+def bin_counts(values, edges):
+    """
+    Contagens por bin de todas as features de uma vez.
+
+    values: matriz (n_linhas, n_features), NaN = ausente.
+    edges:  matriz (n_features, n_bordas) de edge_matrix().
+    Um valor cai no bin k quando é >= que exatamente k bordas (como
+    np.searchsorted(..., side="right")). Retorna (n_features, n_bordas + 1).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_features, n_edges = edges.shape
+    n_valid = (~np.isnan(values)).sum(axis=0)
+
+    # ge[:, k] = nº de valores >= borda k em cada feature (NaN compara como False)
+    ge = np.zeros((n_features, n_edges), dtype=np.int64)
+    for k in range(n_edges):
+        ge[:, k] = (values >= edges[:, k]).sum(axis=0)
+
+    below = np.concatenate([n_valid[:, None], ge], axis=1)
+    above = np.concatenate([ge, np.zeros((n_features, 1), dtype=np.int64)], axis=1)
+    return below - above
+
+
+def fit_histograms(X: pd.DataFrame, bins=DEFAULT_BINS):
+    """
+    Histogramas de referência do treino para as features numéricas: bordas
+    internas nos quantis de X (repetidas são removidas, ex.: pdays) e as
+    contagens por bin. Formato JSON: {feat: {"edges": [...], "counts": [...]}}.
+    """
+    cols = numeric_columns(X)
+    if not cols:
+        return {}
+
+    values = X[cols].to_numpy(dtype=np.float64)
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    # (bins - 1, n_features), calculado para todas as colunas numa chamada
+    raw_edges = np.nanquantile(values, quantiles, axis=0)
+    edges_list = [np.unique(raw_edges[:, i][~np.isnan(raw_edges[:, i])]) for i in range(len(cols))]
+
+    counts = bin_counts(values, edge_matrix(edges_list))
+    return {
+        feat: {
+            "edges": edges_list[i].tolist(),
+            "counts": counts[i, : len(edges_list[i]) + 1].astype(int).tolist(),
+        }
+        for i, feat in enumerate(cols)
+    }
+
+
+def distribution_drift(histograms, df: pd.DataFrame):
+    """
+    PSI e KS de todas as features com histograma de referência presentes em
+    df (a janela de inferência), numa única passada vetorizada.
+
+    O KS é calculado nas bordas dos bins (maior distância entre as CDFs de
+    treino e inferência), o que basta para comparar com a referência salva.
+    Retorna {feat: {"psi", "ks", "count"}}; features sem valores ficam de fora.
+    """
+    feats = [f for f in histograms if f in df.columns]
+    if not feats:
+        return {}
+
+    values = np.column_stack(
+        [pd.to_numeric(df[f], errors="coerce").to_numpy(dtype=np.float64) for f in feats]
+    )
+    edges = edge_matrix([histograms[f]["edges"] for f in feats])
+    inf_counts = bin_counts(values, edges).astype(np.float64)
+
+    train_counts = np.zeros_like(inf_counts)
+    for i, f in enumerate(feats):
+        counts = histograms[f]["counts"]
+        train_counts[i, : len(counts)] = counts
+
+    n_inf = inf_counts.sum(axis=1, keepdims=True)
+    n_train = train_counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q = inf_counts / n_inf
+        p = train_counts / n_train
+
+    # PSI = Σ (q - p) · ln(q / p), com piso nas proporções
+    p_safe = np.clip(p, PSI_EPS, None)
+    q_safe = np.clip(q, PSI_EPS, None)
+    psi = ((q_safe - p_safe) * np.log(q_safe / p_safe)).sum(axis=1)
+    ks = np.abs(np.cumsum(q, axis=1) - np.cumsum(p, axis=1)).max(axis=1)
+
+    return {
+        f: {"psi": float(psi[i]), "ks": float(ks[i]), "count": int(n_inf[i, 0])}
+        for i, f in enumerate(feats)
+        if n_inf[i, 0] > 0 and n_train[i, 0] > 0
+    }
+
+
+def group_counts(df: pd.DataFrame, groups):
+    """
+    Frequência de cada categoria de todos os grupos one-hot de uma vez, a
+    partir das dummies. A categoria base (todas as dummies do grupo em 0)
+    é a primeira de cada grupo. Linhas com alguma dummy do grupo ausente não
+    contam para aquele grupo; grupos sem todas as colunas em df são ignorados.
+
+    Retorna (nomes dos grupos, matriz (n_grupos, 1 + max_dummies) de
+    contagens, nº de dummies por grupo).
+    """
+    names = [g for g, cols in groups.items() if cols and all(c in df.columns for c in cols)]
+    sizes = np.array([len(groups[g]) for g in names], dtype=np.int64)
+    counts = np.zeros((len(names), 1 + int(sizes.max(initial=0))), dtype=np.int64)
+    if not names:
+        return names, counts, sizes
+
+    cols = [c for g in names for c in groups[g]]
+    values = np.column_stack(
+        [pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64) for c in cols]
+    )
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    # (n_linhas, n_grupos): linha válida para o grupo = nenhuma dummy ausente
+    valid = ~np.logical_or.reduceat(np.isnan(values), starts, axis=1)
+    hot = (values == 1) & np.repeat(valid, sizes, axis=1)
+
+    dummy_counts = hot.sum(axis=0)
+    n_valid = valid.sum(axis=0)
+    per_group = np.add.reduceat(dummy_counts, starts)
+
+    counts[:, 0] = n_valid - per_group
+    rows = np.repeat(np.arange(len(names)), sizes)
+    offsets = np.arange(len(cols)) - np.repeat(starts, sizes) + 1
+    counts[rows, offsets] = dummy_counts
+    return names, counts, sizes
+
+
+def fit_group_counts(X: pd.DataFrame, groups):
+    """
+    Referência do treino para os grupos one-hot, compacta: só as contagens
+    por categoria. Formato JSON: {grupo: {"columns": [...], "counts": [...]}},
+    com counts[0] = categoria base e counts[i] = columns[i - 1].
+    """
+    names, counts, sizes = group_counts(X, groups)
+    return {
+        g: {"columns": list(groups[g]), "counts": counts[i, : sizes[i] + 1].tolist()}
+        for i, g in enumerate(names)
+    }
+
+
+def group_drift(reference, df: pd.DataFrame, category_shift=CATEGORY_SHIFT):
+    """
+    Drift de todos os grupos one-hot numa operação matricial: qui-quadrado
+    (frequências da inferência vs proporções do treino) e distância de
+    Jensen-Shannon entre as duas distribuições.
+
+    Retorna {grupo: {"js", "chi2", "p_value", "count", "shifted"}}, onde
+    shifted lista as categorias cuja participação mudou mais que
+    category_shift: [(categoria, p_treino, p_inferência), ...].
+    """
+    groups = {g: ref["columns"] for g, ref in reference.items()}
+    names, inf_counts, sizes = group_counts(df, groups)
+    if not names:
+        return {}
+
+    train_counts = np.zeros(inf_counts.shape, dtype=np.float64)
+    for i, g in enumerate(names):
+        counts = reference[g]["counts"]
+        train_counts[i, : len(counts)] = counts
+    inf_counts = inf_counts.astype(np.float64)
+
+    # Só as posições que são categorias de verdade (o resto é padding)
+    mask = np.arange(inf_counts.shape[1])[None, :] <= sizes[:, None]
+    n_inf = inf_counts.sum(axis=1, keepdims=True)
+    n_train = train_counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = train_counts / n_train
+        q = inf_counts / n_inf
+
+        # Jensen-Shannon (base 2), com 0 · log 0 = 0
+        m = (p + q) / 2
+        kl_p = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=1)
+        kl_q = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=1)
+        js = np.sqrt(np.clip((kl_p + kl_q) / 2, 0, None))
+
+        # Qui-quadrado: categoria nova (p = 0) usa um piso para não dividir por 0
+        expected = n_inf * np.clip(p, PSI_EPS, None)
+        stat = np.where(mask, (inf_counts - expected) ** 2 / expected, 0.0).sum(axis=1)
+    p_values = chi2.sf(stat, np.maximum(sizes, 1))
+
+    delta = np.where(mask, q - p, 0.0)
+    result = {}
+    for i, g in enumerate(names):
+        if n_inf[i, 0] == 0 or n_train[i, 0] == 0:
+            continue
+        labels = [BASE_CATEGORY, *groups[g]]
+        shifted = [
+            (labels[k], float(p[i, k]), float(q[i, k]))
+            for k in np.argsort(-np.abs(delta[i]))
+            if mask[i, k] and abs(delta[i, k]) > category_shift
+        ]
+        result[g] = {
+            "js": float(js[i]),
+            "chi2": float(stat[i]),
+            "p_value": float(p_values[i]),
+            "count": int(n_inf[i, 0]),
+            "shifted": shifted,
+        }
+    return result
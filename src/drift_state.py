@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+
+class RunningStats:
+    """
+    Estatísticas de uma série acumuladas em uma passada (Welford): count,
+    média, M2 (soma dos quadrados dos desvios), min e max.
+
+    Dois acumuladores se combinam com merge() (fórmula de Chan), então um
+    lote novo custa só o tamanho do lote, qualquer que seja o histórico.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min_value=None, max_value=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min_value
+        self.max = max_value
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return cls()
+        mean = float(values.mean())
+        return cls(
+            count=int(values.size),
+            mean=mean,
+            m2=float(((values - mean) ** 2).sum()),
+            min_value=float(values.min()),
+            max_value=float(values.max()),
+        )
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def update(self, values):
+        return self.merge(RunningStats.from_values(values))
+
+    @property
+    def std(self):
+        # Desvio padrão amostral (ddof=1), como o pandas
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float("nan")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["count"], data["mean"], data["m2"], data["min"], data["max"])
+
+
+class DriftState:
+    """
+    Estado do monitor incremental para um run_id: o watermark (último
+    inference_logs.id já processado) e os acumuladores por feature e das
+    predições. Serializável em JSON para ficar no Postgres (drift_state).
+    """
+
+    def __init__(self, run_id, watermark=0, features=None, prediction=None):
+        self.run_id = run_id
+        self.watermark = watermark
+        self.features = features or {}
+        self.prediction = prediction or RunningStats()
+
+    def update(self, ids, inputs, preds, feature_keys):
+        """
+        Incorpora um lote de inferências (ordenado por id) e avança o watermark.
+        Só entram as features do treino que forem numéricas no lote.
+        """
+        if not ids:
+            return
+        df = pd.DataFrame(inputs)
+        for feat in feature_keys:
+            if feat not in df.columns:
+                continue
+            values = pd.to_numeric(df[feat], errors="coerce").to_numpy(dtype=np.float64)
+            self.features.setdefault(feat, RunningStats()).update(values)
+
+        self.prediction.update(preds)
+        self.watermark = max(self.watermark, int(max(ids)))
+
+    def feature_summary(self):
+        """
+        Mesmo formato de compute_simple_stats: {feat: {mean, std, count}}.
+        """
+        return {
+            feat: {"mean": stats.mean, "std": stats.std, "count": stats.count}
+            for feat, stats in self.features.items()
+            if stats.count > 0
+        }
+
+    def to_dict(self):
+        return {
+            "watermark": self.watermark,
+            "features": {feat: stats.to_dict() for feat, stats in self.features.items()},
+            "prediction": self.prediction.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, run_id, data):
+        return cls(
+            run_id,
+            watermark=int(data.get("watermark", 0)),
+            features={
+                feat: RunningStats.from_dict(stats)
+                for feat, stats in data.get("features", {}).items()
+            },
+            prediction=RunningStats.from_dict(data["prediction"]) if "prediction" in data else None,
+        )
@@ -0,0 +1,279 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+import yaml
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+REGISTRY_PATH = ROOT / "feature_registry.yaml"
+
+
+def load_registry(path=REGISTRY_PATH):
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def numeric_columns(registry):
+    return list(registry["features"]["numeric"]["columns"])
+
+
+def boolean_columns(registry):
+    """
+    Colunas booleanas: flags binárias + dummies dos grupos categóricos.
+    """
+    features = registry["features"]
+    cols = list(features["binary_flags"]["columns"])
+    for group in features["categorical_one_hot"]["groups"].values():
+        cols.extend(group["columns"])
+    return cols
+
+
+def categorical_groups(registry):
+    """
+    Grupos one-hot do registry: {grupo: [dummies, na ordem do registry]}.
+    """
+    groups = registry["features"]["categorical_one_hot"]["groups"]
+    return {name: list(group["columns"]) for name, group in groups.items()}
+
+
+def feature_columns(registry):
+    """
+    Todas as colunas do contrato de features, na ordem do registry.
+    """
+    return numeric_columns(registry) + boolean_columns(registry)
+
+
+def dtype_plan(registry):
+    """
+    Plano de tipos compacto {coluna: dtype} a partir do campo `dtype` de cada
+    grupo do registry (int32 para as numéricas, bool para flags e dummies).
+    """
+    features = registry["features"]
+    numeric = features["numeric"]
+    flags = features["binary_flags"]
+    one_hot = features["categorical_one_hot"]
+
+    plan = dict.fromkeys(numeric["columns"], numeric.get("dtype", "int64"))
+    plan.update(dict.fromkeys(flags["columns"], flags.get("dtype", "bool")))
+    for group in one_hot["groups"].values():
+        group_dtype = group.get("dtype", one_hot.get("dtype", "bool"))
+        plan.update(dict.fromkeys(group["columns"], group_dtype))
+    return plan
+
+
+def apply_dtype_plan(df, plan):
+    """
+    Converte as colunas do DataFrame para os dtypes do plano (colunas fora do
+    plano ficam como estão). Levanta ValueError se um inteiro não couber no
+    tipo compacto, em vez de truncar em silêncio.
+    """
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        dtype = plan.get(col)
+        if dtype is not None:
+            dtype = np.dtype(dtype)
+            if dtype.kind in "iu" and len(values):
+                info = np.iinfo(dtype)
+                if values.min() < info.min or values.max() > info.max:
+                    raise ValueError(
+                        f"Coluna '{col}' fora do intervalo de {dtype} "
+                        f"({values.min()}..{values.max()})"
+                    )
+            values = values.astype(dtype)
+        out[col] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def memory_report(df):
+    """
+    Bytes ocupados pelas colunas do DataFrame (sem o índice).
+    """
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+class FeatureEncoder:
+    """
+    Encoder pré-compilado: transforma o dict da requisição direto em uma linha
+    NumPy contígua (float64), na ordem fixa de colunas esperada pelo modelo,
+    sem passar por DataFrame.
+
+    As colunas booleanas seguem a mesma regra de ensure_boolean_columns
+    (valor "truthy" vira 1.0, caso contrário 0.0).
+    """
+
+    def __init__(self, columns, bool_columns):
+        self.columns = tuple(columns)
+        self.n_features = len(self.columns)
+
+        bool_set = set(bool_columns)
+        self.bool_columns = frozenset(c for c in self.columns if c in bool_set)
+        self._bool_idx = np.array(
+            [i for i, c in enumerate(self.columns) if c in bool_set], dtype=np.intp
+        )
+
+    @classmethod
+    def from_registry(cls, registry=None, columns=None):
+        """
+        Monta o encoder a partir do feature_registry.yaml. Se `columns` for
+        informado (ex.: model.feature_names_in_), ele define a ordem final,
+        mas precisa bater exatamente com o conjunto do registry.
+        """
+        registry = registry if registry is not None else load_registry()
+        registry_cols = feature_columns(registry)
+
+        if columns is None:
+            columns = registry_cols
+        else:
+            columns = [str(c) for c in columns]
+            missing = set(registry_cols) - set(columns)
+            extra = set(columns) - set(registry_cols)
+            if missing or extra:
+                raise ValueError(
+                    "Colunas do modelo não batem com o feature_registry.yaml "
+                    f"(faltando: {sorted(missing)}, sobrando: {sorted(extra)})"
+                )
+
+        # Colunas booleanas segundo o mesmo plano de tipos do preparo/treino
+        plan = dtype_plan(registry)
+        return cls(columns, [c for c, dtype in plan.items() if np.dtype(dtype).kind == "b"])
+
+    @classmethod
+    def for_model(cls, model, registry=None):
+        return cls.from_registry(registry, columns=getattr(model, "feature_names_in_", None))
+
+    def missing(self, record: dict):
+        return [c for c in self.columns if c not in record]
+
+    def encode(self, record: dict):
+        """
+        Retorna um array (1, n_features) pronto para predict_proba.
+        Levanta KeyError se faltar alguma coluna.
+        """
+        row = np.array([record[c] for c in self.columns], dtype=np.float64)
+        if len(self._bool_idx):
+            row[self._bool_idx] = row[self._bool_idx] != 0
+        return row.reshape(1, -1)
+
+    def encode_many(self, records: list[dict]):
+        X = np.array([[r[c] for c in self.columns] for r in records], dtype=np.float64)
+        if len(self._bool_idx):
+            X[:, self._bool_idx] = X[:, self._bool_idx] != 0
+        return X
+
+    def to_record(self, row):
+        """
+        Converte uma linha codificada de volta em dict tipado (bool/número),
+        no mesmo formato que era gravado em inference_logs.
+        """
+        record = {}
+        for col, value in zip(self.columns, row.tolist(), strict=True):
+            if col in self.bool_columns:
+                record[col] = bool(value)
+            elif float(value).is_integer():
+                record[col] = int(value)
+            else:
+                record[col] = value
+        return record
+
+
+# ----------------------------------------------------------------------
+# Vocabulário categórico (registros "crus" do bank-full.csv)
+# ----------------------------------------------------------------------
+
+
+def build_vocabulary(X_raw):
+    """
+    Monta a tabela categoria → índice de coluna reproduzindo exatamente o
+    pd.get_dummies(drop_first=True): numéricas primeiro (ordem original),
+    depois as dummies de cada coluna categórica, com categorias ordenadas e a
+    primeira descartada (fica mapeada para None).
+    """
+    categorical = list(X_raw.select_dtypes(include=["object", "string", "category"]).columns)
+    numeric = [col for col in X_raw.columns if col not in categorical]
+    categories = {col: X_raw[col].dropna().unique().tolist() for col in categorical}
+    return vocabulary_from_categories(numeric, categories)
+
+
+def vocabulary_from_categories(numeric, categories):
+    """
+    Monta o vocabulário a partir das colunas numéricas (na ordem original) e
+    do conjunto de categorias vistas em cada coluna categórica. Usado tanto
+    com o DataFrame inteiro quanto na leitura em chunks (categorias acumuladas).
+    """
+    columns = list(numeric)
+    tables = {}
+    for col, seen in categories.items():
+        categories_sorted = sorted(seen)
+        table = {}
+        for i, cat in enumerate(categories_sorted):
+            if i == 0:
+                table[cat] = None
+            else:
+                table[cat] = len(columns)
+                columns.append(f"{col}_{cat}")
+        tables[col] = table
+
+    return {
+        "version": 1,
+        "columns": columns,
+        "numeric": {col: columns.index(col) for col in numeric},
+        "categorical": tables,
+    }
+
+
+def encode_frame(X_raw, vocabulary):
+    """
+    Aplica o vocabulário a um DataFrame cru (mesmo resultado do get_dummies).
+    """
+    columns = vocabulary["columns"]
+    out = {col: X_raw[col] for col in vocabulary["numeric"]}
+    for col, table in vocabulary["categorical"].items():
+        values = X_raw[col]
+        for cat, idx in table.items():
+            if idx is not None:
+                out[columns[idx]] = values == cat
+    return pd.DataFrame(out, index=X_raw.index)[columns]
+
+
+class RawRecordEncoder:
+    """
+    Codifica um registro cru (job, marital, ..., age, balance, ...) direto na
+    linha de features do modelo usando o vocabulário gerado no preparo dos
+    dados. Custo O(nº de campos): um lookup por campo categórico.
+    """
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.columns = tuple(vocabulary["columns"])
+        self.n_features = len(self.columns)
+        self.numeric = tuple(vocabulary["numeric"].items())
+        self.categorical = tuple(vocabulary["categorical"].items())
+        self.fields = tuple(name for name, _ in self.numeric + self.categorical)
+
+    def missing(self, record: dict):
+        return [f for f in self.fields if f not in record]
+
+    def encode(self, record: dict):
+        """
+        Retorna um array (1, n_features). Levanta KeyError para campo ausente
+        e ValueError para categoria desconhecida ou que não seja string
+        (ex.: lista/dict, que nem dá para procurar na tabela).
+        """
+        row = np.zeros(self.n_features, dtype=np.float64)
+        for col, idx in self.numeric:
+            row[idx] = record[col]
+        for col, table in self.categorical:
+            value = record[col]
+            if not isinstance(value, str):
+                raise ValueError(f"Categoria inválida para '{col}': {value!r}")
+            try:
+                idx = table[value]
+            except KeyError:
+                raise ValueError(f"Categoria desconhecida para '{col}': {value!r}") from None
+            if idx is not None:
+                row[idx] = 1.0
+        return row.reshape(1, -1)
+
+    def encode_many(self, records: list[dict]):
+        return np.vstack([self.encode(r) for r in records])
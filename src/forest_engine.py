@@ -0,0 +1,131 @@
+import numpy as np
+
+# Nome do artefato logado no MLflow ao lado do modelo sklearn
+ARTIFACT_NAME = "packed_forest.npz"
+
+
+class PackedForest:
+    """
+    RandomForestClassifier "compilado" em arrays NumPy planos.
+
+    Os nós de todas as árvores ficam concatenados em vetores únicos (feature,
+    threshold, filhos esquerdo/direito e probabilidades por classe), com
+    `roots` apontando para a raiz de cada árvore. Folhas apontam para si
+    mesmas, então a travessia é só repetir `max_depth` passos vetorizados sobre
+    a matriz (n_árvores, n_linhas) de nós correntes — todas as árvores e todas
+    as linhas de uma vez, sem o overhead por estimador do sklearn.
+
+    Expõe predict_proba/classes_/feature_names_in_ para ser usado no lugar do
+    modelo sklearn no serving.
+    """
+
+    def __init__(
+        self, feature, threshold, left, right, value, roots, max_depth, classes, feature_names
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = len(feature_names)
+
+    @classmethod
+    def from_estimator(cls, forest):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for est in forest.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(n)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, own, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, own, tree.children_right) + offset)
+
+            # Probabilidades por classe em cada nó (igual a tree.predict_proba)
+            v = tree.value[:, 0, :]
+            values.append(v / v.sum(axis=1, keepdims=True))
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        if hasattr(forest, "feature_names_in_"):
+            feature_names = np.asarray(forest.feature_names_in_, dtype=object)
+        else:
+            feature_names = np.array([f"x{i}" for i in range(forest.n_features_in_)], dtype=object)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(forest.classes_),
+            feature_names=feature_names,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """
+        Índice (global) da folha alcançada em cada árvore: (n_árvores, n_linhas).
+        """
+        # O sklearn compara os valores em float32 contra thresholds float64
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[None, :]
+        node = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].mean(axis=0)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            max_depth=np.array(self.max_depth),
+            classes=self.classes_,
+            feature_names=self.feature_names_in_.astype(str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                feature=data["feature"].astype(np.intp),
+                threshold=data["threshold"],
+                left=data["left"].astype(np.intp),
+                right=data["right"].astype(np.intp),
+                value=data["value"],
+                roots=data["roots"].astype(np.intp),
+                max_depth=int(data["max_depth"]),
+                classes=data["classes"],
+                feature_names=data["feature_names"].astype(object),
+            )
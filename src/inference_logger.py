@@ -0,0 +1,214 @@
+import json
+import os
+import pathlib
+import queue
+import threading
+import time
+
+from src.db import save_inference_records
+
+POLICIES = ("block", "drop", "spill")
+
+
+class InferenceLogger:
+    """
+    Logger write-behind das inferências do serving.
+
+    As requisições só enfileiram o registro numa fila em memória limitada;
+    uma thread em background agrupa os registros e grava no Postgres com um
+    único INSERT multi-linha, disparado por tamanho (batch_size) ou por tempo
+    (flush_interval). Assim a latência da requisição não depende do banco.
+
+    Política quando a fila está cheia:
+      - "block": segura a requisição por até block_timeout segundos no total
+        (um prazo só para o lote inteiro, backpressure) e descarta o que
+        ainda não tiver espaço
+      - "drop": descarta o registro na hora
+      - "spill": escreve o registro em um arquivo JSONL local (spill_path)
+
+    Com spill_path configurado, lotes que falham ao gravar no banco também vão
+    para o arquivo em vez de serem perdidos.
+    """
+
+    def __init__(
+        self,
+        flush_fn=save_inference_records,
+        max_queue=10_000,
+        batch_size=500,
+        flush_interval=1.0,
+        policy="drop",
+        block_timeout=0.05,
+        spill_path=None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Política inválida: {policy}. Use uma de {POLICIES}")
+        if policy == "spill" and not spill_path:
+            raise ValueError("A política 'spill' exige spill_path")
+
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = pathlib.Path(spill_path) if spill_path else None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._counters = {"enqueued": 0, "written": 0, "dropped": 0, "spilled": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_queue=int(os.getenv("INFERENCE_LOG_QUEUE_SIZE", "10000")),
+            batch_size=int(os.getenv("INFERENCE_LOG_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("INFERENCE_LOG_FLUSH_INTERVAL", "1.0")),
+            policy=os.getenv("INFERENCE_LOG_POLICY", "drop"),
+            block_timeout=float(os.getenv("INFERENCE_LOG_BLOCK_TIMEOUT", "0.05")),
+            spill_path=os.getenv("INFERENCE_LOG_SPILL_PATH") or None,
+        )
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="inference-logger", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """
+        Para a thread depois de drenar tudo o que estiver na fila.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Se a thread nunca subiu (ou travou), drena aqui mesmo
+        remaining = self._drain_nowait()
+        if remaining:
+            self._flush(remaining)
+
+    # ------------------------------------------------------------------
+    # Produtor (caminho da requisição)
+    # ------------------------------------------------------------------
+
+    def submit(self, run_id, model_version, features: dict, prediction: float):
+        return self.submit_many([(run_id, model_version, features, prediction)])
+
+    def submit_many(self, records: list[tuple]):
+        """
+        Enfileira registros (run_id, model_version, features, prediction).
+        Retorna quantos foram aceitos na fila. Com "block", a espera do lote
+        inteiro é limitada a block_timeout (não block_timeout por registro).
+        """
+        self.start()
+
+        deadline = time.monotonic() + self.block_timeout
+        accepted = 0
+        for record in records:
+            try:
+                remaining = deadline - time.monotonic()
+                if self.policy == "block" and remaining > 0:
+                    self._queue.put(record, timeout=remaining)
+                else:
+                    self._queue.put_nowait(record)
+                accepted += 1
+            except queue.Full:
+                if self.policy == "spill":
+                    self._spill([record])
+                else:
+                    self._count("dropped", 1)
+
+        self._count("enqueued", accepted)
+        return accepted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Consumidor (thread de flush)
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stop.is_set():
+                return
+
+    def _collect_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            if self._stop.is_set():
+                # Encerrando: pega só o que já está na fila, sem esperar
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # Espera em fatias curtas para reagir rápido ao stop()
+                batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                continue
+
+        return batch
+
+    def _drain_nowait(self):
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _flush(self, batch):
+        try:
+            self.flush_fn(batch)
+            self._count("written", len(batch))
+        except Exception as e:
+            print("Erro ao gravar lote de inferências no Postgres:", e)
+            self._count("failed", len(batch))
+            if self.spill_path is not None:
+                self._spill(batch)
+            else:
+                self._count("dropped", len(batch))
+
+    def _spill(self, records):
+        with self._spill_lock:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for run_id, model_version, features, prediction in records:
+                    f.write(
+                        json.dumps(
+                            {
+                                "run_id": run_id,
+                                "model_version": model_version,
+                                "input": features,
+                                "prediction": float(prediction),
+                            }
+                        )
+                        + "\n"
+                    )
+        self._count("spilled", len(records))
+
+    def _count(self, key, n):
+        if n:
+            with self._lock:
+                self._counters[key] += n
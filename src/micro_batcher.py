@@ -0,0 +1,155 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Agrupa predições de uma linha vindas de requisições concorrentes.
+
+    Cada requisição entrega (modelo, linha) e espera um Future; uma thread
+    despachante junta o que chegar em até max_wait segundos (ou max_batch
+    linhas), roda um único predict_proba por modelo e devolve a probabilidade
+    de cada linha ao seu Future.
+
+    A janela é adaptativa: com tráfego baixo (média móvel do tamanho dos lotes
+    perto de 1) o despachante não espera — pega só o que já está na fila —,
+    então uma requisição isolada não paga a janela em latência. Sob carga os
+    lotes crescem sozinhos e a espera volta a valer a pena.
+    """
+
+    def __init__(self, max_batch=64, max_wait=0.002, adaptive=True):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.adaptive = adaptive
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._avg_batch = 1.0
+        self._counters = {"requests": 0, "batches": 0, "max_batch_seen": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_batch=int(os.getenv("MICRO_BATCH_MAX_SIZE", "0")),
+            max_wait=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2")) / 1000,
+            adaptive=os.getenv("MICRO_BATCH_ADAPTIVE", "1") == "1",
+        )
+
+    @property
+    def enabled(self):
+        return self.max_batch > 1
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Para o despachante depois de atender o que já estiver na fila.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # Caminho da requisição
+    # ------------------------------------------------------------------
+
+    def submit(self, model, row):
+        """
+        Enfileira uma linha (array de n_features) e retorna um Future com a
+        probabilidade da classe positiva.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((model, np.asarray(row, dtype=np.float64).ravel(), future))
+        return future
+
+    def predict(self, model, row, timeout=None):
+        return self.submit(model, row).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["avg_batch"] = round(self._avg_batch, 2)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    # ------------------------------------------------------------------
+    # Despachante
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect_batch()
+            if batch:
+                self._dispatch(batch)
+            if stopping:
+                return
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+
+        wait = self.max_wait
+        if self.adaptive and self._avg_batch < 1.5:
+            wait = 0.0
+        deadline = time.monotonic() + wait
+
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _dispatch(self, batch):
+        with self._lock:
+            self._avg_batch = 0.8 * self._avg_batch + 0.2 * len(batch)
+            self._counters["requests"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["max_batch_seen"] = max(self._counters["max_batch_seen"], len(batch))
+
+        # Um hot-reload no meio da janela pode misturar modelos no mesmo lote
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for items in groups.values():
+            model = items[0][0]
+            try:
+                probas = model.predict_proba(np.vstack([row for _, row, _ in items]))[:, 1]
+            except Exception as e:
+                for _, _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), proba in zip(items, probas.tolist(), strict=True):
+                future.set_result(proba)
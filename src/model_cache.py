@@ -0,0 +1,256 @@
+import fcntl
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import mlflow
+import mlflow.artifacts
+import mlflow.sklearn
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+CACHE_DIR = pathlib.Path(os.getenv("MODEL_CACHE_DIR", str(ROOT / ".model_cache")))
+MAX_BYTES = int(float(os.getenv("MODEL_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+INDEX_FILE = "index.json"
+INDEX_LOCK = ".index.lock"
+
+# Threads do processo; entre processos (serve_bank, predict_bank) vale o flock
+_lock = threading.Lock()
+
+
+@contextmanager
+def _flock(path, mode):
+    """
+    Lock de arquivo (fcntl.flock) que vale entre processos. Com LOCK_NB,
+    levanta BlockingIOError se o lock estiver ocupado.
+    """
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _object_lock(cache_dir, sha):
+    # Fora de objects/: lá dentro só ficam os artefatos
+    return cache_dir / "locks" / f"{sha}.lock"
+
+
+def dir_checksum(path):
+    """
+    SHA-256 do conteúdo de um arquivo ou diretório (caminhos relativos +
+    bytes de cada arquivo, em ordem estável).
+    """
+    path = pathlib.Path(path)
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+
+    h = hashlib.sha256()
+    for f in files:
+        rel = f.name if f == path else f.relative_to(path).as_posix()
+        h.update(rel.encode("utf-8") + b"\0")
+        with open(f, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def dir_size(path):
+    path = pathlib.Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _read_index(cache_dir):
+    try:
+        with open(cache_dir / INDEX_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    # Escrita atômica: outro processo nunca lê um índice pela metade
+    tmp = cache_dir / f".{INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, cache_dir / INDEX_FILE)
+
+
+def _evict(cache_dir, index, max_bytes, keep):
+    """
+    Remove entradas menos usadas recentemente (LRU) até caber em max_bytes.
+    Objetos compartilhados por mais de uma entrada só saem com a última.
+    Objetos sendo carregados por outro processo (lock compartilhado ocupado)
+    ficam para uma próxima vez, mesmo que o cache passe do limite.
+    """
+    objects = {}
+    for entry in index.values():
+        objects[entry["sha256"]] = entry["size"]
+    total = sum(objects.values())
+
+    for key in sorted(index, key=lambda k: index[k]["last_used"]):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        sha = index[key]["sha256"]
+        if any(e["sha256"] == sha for k, e in index.items() if k != key):
+            index.pop(key)
+            continue
+        try:
+            with _flock(_object_lock(cache_dir, sha), fcntl.LOCK_EX | fcntl.LOCK_NB):
+                shutil.rmtree(cache_dir / "objects" / sha, ignore_errors=True)
+        except BlockingIOError:
+            continue
+        index.pop(key)
+        total -= objects[sha]
+        print(f"Cache de modelos: removido {key} ({sha[:12]})")
+
+
+@contextmanager
+def open_artifact(run_id, artifact_path="model", cache_dir=None, max_bytes=None, tracking_uri=None):
+    """
+    Context manager com o caminho local de um artefato do run, baixando do
+    MLflow/S3 só quando ele ainda não está no cache.
+
+    O cache é endereçado por conteúdo: o índice mapeia "run_id/artifact_path"
+    para o SHA-256 do artefato, guardado em objects/<sha256>. Num hit o
+    checksum é conferido antes de usar (artefato corrompido vira miss).
+
+    O cache é compartilhado entre processos: o índice só é lido/alterado sob
+    um flock exclusivo, e o objeto fica com um flock compartilhado enquanto
+    o bloco with roda, para nenhum outro processo removê-lo no meio da carga.
+    O download e o checksum de um miss rodam sem o lock do índice (num
+    .download-* próprio), então um download lento não segura os hits dos
+    outros processos; o lock só volta para mover o objeto e gravar o índice.
+    """
+    cache_dir = pathlib.Path(cache_dir or CACHE_DIR)
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    key = f"{run_id}/{artifact_path}"
+
+    with ExitStack() as stack:
+        with _index_locked(cache_dir):
+            local = _lookup_locked(key, cache_dir)
+            if local is not None:
+                stack.enter_context(_read_lock(cache_dir, local))
+
+        if local is None:
+            tmp_dir = pathlib.Path(tempfile.mkdtemp(prefix=".download-", dir=cache_dir))
+            try:
+                downloaded, sha = _download(run_id, artifact_path, tmp_dir, tracking_uri)
+                with _index_locked(cache_dir):
+                    local = _install_locked(key, cache_dir, max_bytes, downloaded, sha)
+                    stack.enter_context(_read_lock(cache_dir, local))
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        yield local
+
+
+def fetch_artifact(run_id, artifact_path="model", **kwargs):
+    """
+    Caminho local do artefato (via cache). Não segura o lock de leitura:
+    para carregar o conteúdo, prefira open_artifact().
+    """
+    with open_artifact(run_id, artifact_path, **kwargs) as local:
+        return local
+
+
+@contextmanager
+def _index_locked(cache_dir):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with _lock, _flock(cache_dir / INDEX_LOCK, fcntl.LOCK_EX):
+        yield
+
+
+def _read_lock(cache_dir, local):
+    # Pego antes de soltar o índice: a remoção exige o índice e este lock
+    return _flock(_object_lock(cache_dir, local.parent.name), fcntl.LOCK_SH)
+
+
+def _lookup_locked(key, cache_dir):
+    """
+    Hit válido: atualiza o last_used e retorna o caminho local. Entrada
+    inválida (objeto ausente ou corrompido) é removida e vira miss (None).
+    """
+    index = _read_index(cache_dir)
+    entry = index.get(key)
+    if entry is None:
+        return None
+
+    local = cache_dir / "objects" / entry["sha256"] / entry["name"]
+    if local.exists() and dir_checksum(local) == entry["sha256"]:
+        entry["last_used"] = time.time()
+        _write_index(cache_dir, index)
+        return local
+
+    print(f"Cache de modelos: entrada inválida para {key}, baixando de novo")
+    with _flock(_object_lock(cache_dir, entry["sha256"]), fcntl.LOCK_EX):
+        shutil.rmtree(cache_dir / "objects" / entry["sha256"], ignore_errors=True)
+    index.pop(key)
+    _write_index(cache_dir, index)
+    return None
+
+
+def _download(run_id, artifact_path, tmp_dir, tracking_uri):
+    """
+    Baixa o artefato para tmp_dir (sem lock nenhum). Retorna (caminho, sha256).
+    """
+    downloaded = pathlib.Path(
+        mlflow.artifacts.download_artifacts(
+            run_id=run_id,
+            artifact_path=artifact_path,
+            dst_path=str(tmp_dir),
+            tracking_uri=tracking_uri,
+        )
+    )
+    return downloaded, dir_checksum(downloaded)
+
+
+def _install_locked(key, cache_dir, max_bytes, downloaded, sha):
+    """
+    Move o download para objects/<sha256> (se outro processo ainda não o
+    tiver colocado lá), registra no índice e aplica o limite de tamanho.
+    """
+    object_dir = cache_dir / "objects" / sha
+    if not object_dir.exists():
+        object_dir.parent.mkdir(parents=True, exist_ok=True)
+        staged = downloaded.parent / ".staged"
+        staged.mkdir()
+        shutil.move(str(downloaded), staged / downloaded.name)
+        os.replace(staged, object_dir)
+
+    # Relido sob o lock: outros processos podem ter mexido durante o download
+    index = _read_index(cache_dir)
+    index[key] = {
+        "sha256": sha,
+        "name": downloaded.name,
+        "size": dir_size(object_dir),
+        "last_used": time.time(),
+    }
+    _evict(cache_dir, index, max_bytes, keep=key)
+    _write_index(cache_dir, index)
+
+    return object_dir / downloaded.name
+
+
+def load_cached_model(run_id, **kwargs):
+    """
+    Equivalente a mlflow.sklearn.load_model("runs:/<run_id>/model"), via cache.
+    """
+    with open_artifact(run_id, "model", **kwargs) as local:
+        return mlflow.sklearn.load_model(str(local))
+
+
+def load_cached_dict(run_id, artifact_path, **kwargs):
+    with open_artifact(run_id, artifact_path, **kwargs) as local:
+        with open(local, encoding="utf-8") as f:
+            return json.load(f)
@@ -1,10 +1,21 @@
+import argparse
 import json
+import os
 import pathlib
+import re
 
 import pandas as pd
 from dotenv import load_dotenv
 
-from db import get_conn
+from src.db import close_pool, pooled_conn
+from src.drift_engine import (
+    JS_THRESHOLD,
+    KS_THRESHOLD,
+    PSI_THRESHOLD,
+    distribution_drift,
+    group_drift,
+)
+from src.drift_state import DriftState
 
 # Carregar infra/.env (para rodar direto via python -m)
 ROOT = pathlib.Path(__file__).resolve().parents[1]
@@ -17,39 +28,53 @@ def fetch_latest_training_snapshot():
     """
     Busca o último registro de treino na tabela training_data.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT
-            run_id,
-            model_version,
-            metric_name,
-            metric_value,
-            n_train,
-            n_test,
-            n_features,
-            feature_stats
-        FROM training_data
-        ORDER BY timestamp DESC
-        LIMIT 1;
-        """
-    )
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT
+                run_id,
+                model_version,
+                metric_name,
+                metric_value,
+                n_train,
+                n_test,
+                n_features,
+                feature_stats,
+                feature_histograms,
+                category_counts
+            FROM training_data
+            ORDER BY timestamp DESC
+            LIMIT 1;
+            """
+        )
+        row = cur.fetchone()
+        cur.close()
 
     if not row:
         raise RuntimeError("Nenhum registro encontrado em training_data.")
 
-    run_id, model_version, metric_name, metric_value, n_train, n_test, n_features, feature_stats = (
-        row
-    )
+    (
+        run_id,
+        model_version,
+        metric_name,
+        metric_value,
+        n_train,
+        n_test,
+        n_features,
+        feature_stats,
+        feature_histograms,
+        category_counts,
+    ) = row
 
     # feature_stats vem como dict ou string (json)
     if isinstance(feature_stats, str):
         feature_stats = json.loads(feature_stats)
+    # Runs antigos não têm histogramas nem contagens (colunas NULL)
+    if isinstance(feature_histograms, str):
+        feature_histograms = json.loads(feature_histograms)
+    if isinstance(category_counts, str):
+        category_counts = json.loads(category_counts)
 
     return {
         "run_id": run_id,
@@ -60,6 +85,8 @@ def fetch_latest_training_snapshot():
         "n_test": int(n_test),
         "n_features": int(n_features),
         "feature_stats": feature_stats,
+        "feature_histograms": feature_histograms or {},
+        "category_counts": category_counts or {},
     }
 
 
@@ -68,23 +95,20 @@ def fetch_recent_inferences(run_id: str, limit: int = 500):
     Busca as últimas N inferências para um dado run_id,
     retornando lista de inputs (dict) e lista de predições.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT input, prediction
-        FROM inference_logs
-        WHERE run_id = %s
-        ORDER BY id DESC
-        LIMIT %s;
-        """,
-        (run_id, limit),
-    )
-
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT input, prediction
+            FROM inference_logs
+            WHERE run_id = %s
+            ORDER BY id DESC
+            LIMIT %s;
+            """,
+            (run_id, limit),
+        )
+        rows = cur.fetchall()
+        cur.close()
 
     inputs = []
     preds = []
@@ -95,6 +119,314 @@ def fetch_recent_inferences(run_id: str, limit: int = 500):
     return inputs, preds
 
 
+# Atraso de segurança do modo incremental: linhas mais recentes que isso
+# ainda podem ter vizinhas com id menor em transações não commitadas
+COMMIT_LAG = "60s"
+
+
+def fetch_inferences_since(run_id: str, watermark: int, limit: int = 5000, commit_lag=COMMIT_LAG):
+    """
+    Próximo lote de inferências do run_id com id > watermark, em ordem de id
+    (paginação por chave: o custo não depende de quanto já foi lido).
+    Retorna listas de ids, inputs (dict) e predições.
+
+    Com vários writers, um id menor pode ser commitado depois de um maior;
+    avançar o watermark por cima dele o perderia para sempre. Por isso só
+    entra o prefixo de ids anterior à primeira linha com timestamp dentro de
+    `commit_lag` (o timestamp é o início da transação do writer): o
+    intervalo precisa ser bem maior que a transação mais longa dos writers.
+    """
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH horizon AS (
+                SELECT MIN(id) AS first_recent
+                FROM inference_logs
+                WHERE run_id = %s AND id > %s AND timestamp >= NOW() - %s::interval
+            )
+            SELECT id, input, prediction
+            FROM inference_logs, horizon
+            WHERE run_id = %s AND id > %s
+              AND timestamp < NOW() - %s::interval
+              AND (first_recent IS NULL OR id < first_recent)
+            ORDER BY id
+            LIMIT %s;
+            """,
+            (run_id, watermark, commit_lag, run_id, watermark, commit_lag, limit),
+        )
+        rows = cur.fetchall()
+        cur.close()
+
+    ids = [int(row_id) for row_id, _, _ in rows]
+    inputs = [inp or {} for _, inp, _ in rows]
+    preds = [float(pred) for _, _, pred in rows]
+    return ids, inputs, preds
+
+
+def load_drift_state(run_id: str):
+    """
+    Estado do monitor incremental salvo para o run_id (ou um estado vazio).
+    """
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT state FROM drift_state WHERE run_id = %s;", (run_id,))
+        row = cur.fetchone()
+        cur.close()
+
+    if not row:
+        return DriftState(run_id)
+    state = row[0]
+    if isinstance(state, str):
+        state = json.loads(state)
+    return DriftState.from_dict(run_id, state)
+
+
+def save_drift_state(state: DriftState):
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO drift_state (run_id, watermark, state, updated_at)
+            VALUES (%s, %s, %s::jsonb, NOW())
+            ON CONFLICT (run_id) DO UPDATE
+            SET watermark = EXCLUDED.watermark,
+                state = EXCLUDED.state,
+                updated_at = EXCLUDED.updated_at;
+            """,
+            (state.run_id, state.watermark, json.dumps(state.to_dict())),
+        )
+        cur.close()
+
+
+def update_drift_state(run_id: str, feature_keys, batch_size: int = 5000, commit_lag=COMMIT_LAG):
+    """
+    Modo incremental: processa só as inferências depois do watermark (e mais
+    antigas que `commit_lag`), em lotes, somando nos acumuladores (Welford)
+    já persistidos. O estado é salvo uma vez no fim. Retorna (estado, nº de
+    inferências novas).
+    """
+    state = load_drift_state(run_id)
+    n_new = 0
+    while True:
+        ids, inputs, preds = fetch_inferences_since(
+            run_id, state.watermark, limit=batch_size, commit_lag=commit_lag
+        )
+        if not ids:
+            break
+        state.update(ids, inputs, preds, feature_keys)
+        n_new += len(ids)
+
+    if n_new:
+        save_drift_state(state)
+    return state, n_new
+
+
+# Estatísticas que o Postgres devolve por série (feature ou predição)
+SUMMARY_AGGREGATES = ("count", "mean", "std", "min", "max")
+
+# Período padrão do modo por buckets de tempo
+LOOKBACK = "30 days"
+
+# Unidades aceitas em --bucket: o date_bin rejeita intervalos com meses/anos
+BUCKET_UNITS = ("week", "day", "hour", "minute", "second")
+BUCKET_PATTERN = re.compile(rf"^\s*(\d+)\s*({'|'.join(BUCKET_UNITS)})s?\s*$", re.IGNORECASE)
+
+
+def validate_bucket(bucket):
+    """
+    Confere o tamanho do bucket antes de ir ao banco: "<n> <unidade>", com n
+    > 0 e unidade de tamanho fixo (semana, dia, hora, minuto, segundo).
+    Meses e anos não têm tamanho fixo e o date_bin não aceita. Retorna o
+    intervalo normalizado ("1 hour", "15 minutes"...) ou levanta ValueError.
+    """
+    match = BUCKET_PATTERN.match(str(bucket))
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(
+            f"Bucket inválido: {bucket!r}. Use '<n> <unidade>' com n > 0 e unidade em "
+            f"{', '.join(BUCKET_UNITS)} (ex.: '1 hour', '15 minutes'); meses e anos não "
+            "são suportados pelo date_bin"
+        )
+    n, unit = int(match.group(1)), match.group(2).lower()
+    return f"{n} {unit}{'s' if n > 1 else ''}"
+
+
+def jsonb_feature_columns(feature_keys):
+    """
+    Colunas SQL que extraem cada feature do JSONB como double precision
+    (f0, f1, ...). Retorna (colunas, params).
+    """
+    columns = []
+    params = []
+    for i, feat in enumerate(feature_keys):
+        # Só valores numéricos entram (strings/bools ficam NULL), como no pandas
+        columns.append(
+            f"CASE WHEN jsonb_typeof(input -> %s) = 'number' "
+            f"THEN (input ->> %s)::double precision END AS f{i}"
+        )
+        params.extend([feat, feat])
+    return columns, params
+
+
+def summary_aggregates(n_features):
+    series = ["prediction"] + [f"f{i}" for i in range(n_features)]
+    return ", ".join(f"count({c}), avg({c}), stddev_samp({c}), min({c}), max({c})" for c in series)
+
+
+def build_summary_query(run_id, feature_keys, since=None, until=None, limit=None):
+    """
+    Monta a query de agregação no Postgres: uma única varredura da janela
+    (run_id + intervalo de timestamp e/ou últimas `limit` linhas) que extrai
+    cada feature do JSONB e devolve count/avg/stddev_samp/min/max por feature
+    e das predições. Os nomes das features vão como parâmetros, nunca no SQL.
+    Retorna (sql, params).
+    """
+    columns, params = jsonb_feature_columns(feature_keys)
+
+    where = ["run_id = %s"]
+    params.append(run_id)
+    if since is not None:
+        where.append("timestamp >= %s")
+        params.append(since)
+    if until is not None:
+        where.append("timestamp < %s")
+        params.append(until)
+
+    window = f"SELECT prediction{''.join(', ' + c for c in columns)} FROM inference_logs"
+    window += f" WHERE {' AND '.join(where)}"
+    if limit is not None:
+        window += " ORDER BY id DESC LIMIT %s"
+        params.append(limit)
+
+    aggregates = summary_aggregates(len(feature_keys))
+    return f"WITH w AS ({window}) SELECT {aggregates} FROM w;", params
+
+
+def parse_summary_row(row, feature_keys):
+    """
+    Converte a linha de agregados (na ordem de summary_aggregates) no formato
+    {"prediction": {...}, "features": {feat: {...}}}, cada série com
+    count/mean/std/min/max (features sem valores ficam de fora).
+    """
+    width = len(SUMMARY_AGGREGATES)
+
+    def series(offset):
+        values = row[offset : offset + width]
+        stats = dict(zip(SUMMARY_AGGREGATES, values, strict=True))
+        stats["count"] = int(stats["count"] or 0)
+        for key in ("mean", "std", "min", "max"):
+            stats[key] = float(stats[key]) if stats[key] is not None else float("nan")
+        return stats
+
+    features = {}
+    for i, feat in enumerate(feature_keys):
+        stats = series(width * (i + 1))
+        if stats["count"]:
+            features[feat] = stats
+    return {"prediction": series(0), "features": features}
+
+
+def fetch_window_summary(run_id: str, feature_keys, since=None, until=None, limit=None):
+    """
+    Resumo da janela de inferências calculado no Postgres: só os agregados
+    voltam pela rede. Formato: {"prediction": {...}, "features": {feat: {...}}},
+    cada série com count/mean/std/min/max (features sem valores ficam de fora).
+    """
+    feature_keys = list(feature_keys)
+    sql, params = build_summary_query(run_id, feature_keys, since=since, until=until, limit=limit)
+
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        cur.close()
+
+    return parse_summary_row(row, feature_keys)
+
+
+def build_bucket_query(run_id, feature_keys, bucket="1 day", since=None, until=None):
+    """
+    Versão por buckets de tempo de build_summary_query: uma única varredura
+    do período, agrupada por date_bin(bucket, timestamp), devolve os mesmos
+    agregados para cada bucket (em ordem). Sem `since`, o período é o último
+    LOOKBACK. Retorna (sql, params).
+    """
+    columns, feature_params = jsonb_feature_columns(feature_keys)
+    params = [validate_bucket(bucket), *feature_params, run_id]
+
+    where = ["run_id = %s"]
+    if since is not None:
+        where.append("timestamp >= %s")
+        params.append(since)
+    else:
+        where.append("timestamp >= NOW() - %s::interval")
+        params.append(LOOKBACK)
+    if until is not None:
+        where.append("timestamp < %s")
+        params.append(until)
+
+    window = (
+        "SELECT date_bin(%s::interval, timestamp, TIMESTAMP '2000-01-01') AS bucket, "
+        f"prediction{''.join(', ' + c for c in columns)} FROM inference_logs"
+        f" WHERE {' AND '.join(where)}"
+    )
+    aggregates = summary_aggregates(len(feature_keys))
+    sql = (
+        f"WITH w AS ({window}) SELECT bucket, {aggregates} FROM w GROUP BY bucket ORDER BY bucket;"
+    )
+    return sql, params
+
+
+def fetch_bucket_summaries(run_id: str, feature_keys, bucket="1 day", since=None, until=None):
+    """
+    Resumos por bucket de tempo calculados no Postgres numa só query.
+    Retorna [(início do bucket, resumo)], com o resumo no formato de
+    fetch_window_summary; buckets sem inferências não aparecem.
+    """
+    feature_keys = list(feature_keys)
+    sql, params = build_bucket_query(run_id, feature_keys, bucket=bucket, since=since, until=until)
+
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+
+    return [(row[0], parse_summary_row(row[1:], feature_keys)) for row in rows]
+
+
+def drift_timeseries(buckets, feature_stats_train, threshold=0.20):
+    """
+    Tabela compacta de drift no tempo, uma linha por bucket: nº de
+    inferências, média/std das predições, a variação relativa da média de
+    cada feature vs treino e quantas features passaram do threshold.
+    """
+    # Como em report_drift: sem média de treino (ou média 0) não há Δ relativo
+    feats = [f for f, stats in feature_stats_train.items() if stats.get("mean")]
+    records = []
+    for start, summary in buckets:
+        pred = summary["prediction"]
+        record = {
+            "bucket": start,
+            "n": pred["count"],
+            "pred_mean": pred["mean"],
+            "pred_std": pred["std"],
+        }
+        for feat in feats:
+            inf = summary["features"].get(feat)
+            train_mean = feature_stats_train[feat]["mean"]
+            record[feat] = (
+                (inf["mean"] - train_mean) / abs(train_mean) if inf is not None else float("nan")
+            )
+        records.append(record)
+
+    table = pd.DataFrame.from_records(
+        records, columns=["bucket", "n", "pred_mean", "pred_std", *feats]
+    ).set_index("bucket")
+    table["n_drift"] = (table[feats].abs() > threshold).sum(axis=1)
+    return table
+
+
 def compute_simple_stats(df: pd.DataFrame, feature_keys):
     """
     Calcula estatísticas simples (mean, std, count) para as
@@ -119,7 +451,87 @@ def compute_simple_stats(df: pd.DataFrame, feature_keys):
     return stats
 
 
-def main():
+def print_prediction_stats(mean, std, min_value, max_value):
+    print(f"  mean={mean:.4f}  " f"std={std:.4f}  " f"min={min_value:.4f}  " f"max={max_value:.4f}")
+
+
+def report_drift(feature_stats_train, inf_stats, threshold=0.20):
+    """
+    Compara a média de cada feature na inferência com a do treino e
+    sinaliza drift quando a variação relativa passa do threshold.
+    """
+    print("\n[Comparação de features numéricas - treino vs inferência]")
+    print(f"  Threshold para DRIFT: |Δmédia relativa| > {threshold:.0%}\n")
+
+    for feat, train_stats in feature_stats_train.items():
+        if feat not in inf_stats:
+            continue
+
+        train_mean = train_stats.get("mean")
+        inf_mean = inf_stats[feat]["mean"]
+
+        if train_mean is None:
+            continue
+
+        # Evita divisão por zero
+        if train_mean == 0:
+            rel_delta = None
+        else:
+            rel_delta = (inf_mean - train_mean) / abs(train_mean)
+
+        status = "[OK]"
+        extra = ""
+
+        if rel_delta is not None and abs(rel_delta) > threshold:
+            status = "[DRIFT]"
+            extra = f" | Δrel={rel_delta * 100:.1f}%"
+
+        print(
+            f"{status} {feat:10s}  "
+            f"mean_train={train_mean:8.3f}  "
+            f"mean_infer={inf_mean:8.3f}{extra}"
+        )
+
+
+def report_distribution_drift(drift, psi_threshold=PSI_THRESHOLD, ks_threshold=KS_THRESHOLD):
+    """
+    Relatório do PSI/KS por feature (saída de drift_engine.distribution_drift):
+    sinaliza drift quando qualquer um dos dois passa do threshold.
+    """
+    print("\n[Distribuição das features numéricas - PSI/KS vs histogramas do treino]")
+    print(f"  Threshold para DRIFT: PSI > {psi_threshold:.2f} ou KS > {ks_threshold:.2f}\n")
+
+    for feat, stats in drift.items():
+        status = "[OK]"
+        if stats["psi"] > psi_threshold or stats["ks"] > ks_threshold:
+            status = "[DRIFT]"
+        print(f"{status} {feat:10s}  psi={stats['psi']:7.4f}  ks={stats['ks']:6.4f}")
+
+
+def report_group_drift(drift, threshold=JS_THRESHOLD):
+    """
+    Relatório dos grupos one-hot (saída de drift_engine.group_drift): drift
+    quando a distância de Jensen-Shannon passa do threshold, listando as
+    categorias cuja participação mais mudou.
+    """
+    print("\n[Grupos categóricos (one-hot) - frequências treino vs inferência]")
+    print(f"  Threshold para DRIFT: distância JS > {threshold:.2f}\n")
+
+    for group, stats in drift.items():
+        status = "[DRIFT]" if stats["js"] > threshold else "[OK]"
+        print(
+            f"{status} {group:10s}  js={stats['js']:6.4f}  "
+            f"chi2={stats['chi2']:10.2f}  p={stats['p_value']:.4g}"
+        )
+        if status == "[DRIFT]":
+            for category, p_train, p_infer in stats["shifted"]:
+                print(f"      {category:22s} {p_train:6.1%} -> {p_infer:6.1%}")
+
+
+def main(incremental=False, sql=False, since=None, bucket=None, output=None):
+    if bucket is not None:
+        bucket = validate_bucket(bucket)
+
     print("\n=== Monitor de Drift - Bank Marketing ===\n")
 
     # 1) Buscar snapshot de treino
@@ -135,6 +547,82 @@ def main():
     print(f"  n_test        : {train['n_test']}")
     print(f"  n_features    : {train['n_features']}")
 
+    if bucket is not None:
+        # 2) Série temporal: todos os buckets do período numa só query
+        period = f"desde {since}" if since is not None else f"últimos {LOOKBACK}"
+        print(f"\nAgregando inferências no Postgres por bucket de {bucket} ({period})...")
+        buckets = fetch_bucket_summaries(
+            train["run_id"], feature_stats_train.keys(), bucket=bucket, since=since
+        )
+        close_pool()
+
+        if not buckets:
+            print("⚠ Nenhuma inferência encontrada no período para esse run_id.")
+            return
+
+        table = drift_timeseries(buckets, feature_stats_train)
+        print(f"  Buckets com inferências: {len(table)}  (total: {table['n'].sum()})")
+        print("\n[Drift por bucket - Δ relativo da média vs treino; n_drift: |Δ| > 20%]\n")
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(table.to_string(float_format=lambda v: f"{v:.3f}"))
+
+        if output:
+            table.to_csv(output)
+            print(f"\nSérie temporal salva em {output}")
+        print("\n=== Fim do relatório de monitoramento ===\n")
+        return
+
+    if incremental:
+        # 2) Só as inferências depois do watermark, somadas ao histórico
+        print("\nProcessando inferências novas desde o último watermark...")
+        batch_size = int(os.getenv("MONITOR_BATCH_SIZE", "5000"))
+        commit_lag = os.getenv("MONITOR_COMMIT_LAG", COMMIT_LAG)
+        state, n_new = update_drift_state(
+            train["run_id"], feature_stats_train.keys(), batch_size, commit_lag
+        )
+
+        if state.prediction.count == 0:
+            print("⚠ Nenhuma inferência encontrada ainda para esse run_id.")
+            close_pool()
+            return
+
+        print(f"  Inferências novas: {n_new}  (histórico: {state.prediction.count})")
+        print(f"  Watermark: inference_logs.id = {state.watermark}")
+        print("\n[Estatísticas das predições - histórico completo]")
+        pred = state.prediction
+        print_prediction_stats(pred.mean, pred.std, pred.min, pred.max)
+
+        report_drift(feature_stats_train, state.feature_summary())
+        close_pool()
+        print("\n=== Fim do relatório de monitoramento ===\n")
+        return
+
+    if sql or since is not None:
+        # 2) Agregação no Postgres: só o resumo da janela volta pela rede
+        window = f"desde {since}" if since is not None else "últimas 500"
+        print(f"\nAgregando inferências no Postgres ({window})...")
+        summary = fetch_window_summary(
+            train["run_id"],
+            feature_stats_train.keys(),
+            since=since,
+            limit=None if since is not None else 500,
+        )
+        pred = summary["prediction"]
+
+        if pred["count"] == 0:
+            print("⚠ Nenhuma inferência encontrada ainda para esse run_id.")
+            close_pool()
+            return
+
+        print(f"  Inferências agregadas: {pred['count']}")
+        print("\n[Estatísticas das predições recentes]")
+        print_prediction_stats(pred["mean"], pred["std"], pred["min"], pred["max"])
+
+        report_drift(feature_stats_train, summary["features"])
+        close_pool()
+        print("\n=== Fim do relatório de monitoramento ===\n")
+        return
+
     # 2) Buscar últimas inferências para esse run_id
     print("\nBuscando últimas inferências para esse run_id...")
     inputs, preds = fetch_recent_inferences(train["run_id"], limit=500)
@@ -148,51 +636,57 @@ def main():
 
     print(f"  Inferências carregadas: {len(df_inf)}")
     print("\n[Estatísticas das predições recentes]")
-    print(
-        f"  mean={pred_series.mean():.4f}  "
-        f"std={pred_series.std():.4f}  "
-        f"min={pred_series.min():.4f}  "
-        f"max={pred_series.max():.4f}"
+    print_prediction_stats(
+        pred_series.mean(), pred_series.std(), pred_series.min(), pred_series.max()
     )
 
     # 3) Comparar estatísticas de features numéricas
-    print("\n[Comparação de features numéricas - treino vs inferência]")
-    print("  Threshold para DRIFT: |Δmédia relativa| > 20%\n")
-
     inf_stats = compute_simple_stats(df_inf, feature_stats_train.keys())
-    threshold = 0.20  # 20%
+    report_drift(feature_stats_train, inf_stats)
 
-    for feat, train_stats in feature_stats_train.items():
-        if feat not in inf_stats:
-            continue
+    # 4) Forma da distribuição: PSI/KS de todas as features de uma vez
+    if train["feature_histograms"]:
+        report_distribution_drift(distribution_drift(train["feature_histograms"], df_inf))
 
-        train_mean = train_stats.get("mean")
-        inf_mean = inf_stats[feat]["mean"]
-
-        if train_mean is None:
-            continue
-
-        # Evita divisão por zero
-        if train_mean == 0:
-            rel_delta = None
-        else:
-            rel_delta = (inf_mean - train_mean) / abs(train_mean)
-
-        status = "[OK]"
-        extra = ""
-
-        if rel_delta is not None and abs(rel_delta) > threshold:
-            status = "[DRIFT]"
-            extra = f" | Δrel={rel_delta * 100:.1f}%"
-
-        print(
-            f"{status} {feat:10s}  "
-            f"mean_train={train_mean:8.3f}  "
-            f"mean_infer={inf_mean:8.3f}{extra}"
-        )
+    # 5) Grupos one-hot (job, month, poutcome, ...) pelas frequências
+    if train["category_counts"]:
+        report_group_drift(group_drift(train["category_counts"], df_inf))
 
+    close_pool()
     print("\n=== Fim do relatório de monitoramento ===\n")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Monitor de drift do Bank Marketing")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="processa só as inferências novas desde o último watermark",
+    )
+    parser.add_argument(
+        "--sql",
+        action="store_true",
+        help="agrega as últimas inferências no Postgres (só o resumo volta)",
+    )
+    parser.add_argument(
+        "--since",
+        help="janela por timestamp (ex.: 2024-06-01 ou '2024-06-01 12:00'); implica --sql",
+    )
+    parser.add_argument(
+        "--bucket",
+        help=f"série temporal por bucket (ex.: '1 hour', '1 day'); período: --since ou {LOOKBACK}",
+    )
+    parser.add_argument("--output", help="CSV para salvar a série temporal de --bucket")
+    args = parser.parse_args()
+    if args.bucket is not None:
+        try:
+            validate_bucket(args.bucket)
+        except ValueError as e:
+            parser.error(str(e))
+    main(
+        incremental=args.incremental,
+        sql=args.sql,
+        since=args.since,
+        bucket=args.bucket,
+        output=args.output,
+    )
@@ -3,11 +3,12 @@ import os
 import pathlib
 
 import mlflow
-import pandas as pd
 from dotenv import load_dotenv
 from mlflow.tracking import MlflowClient
 
-from src.db import save_inference_row
+from src.db import close_pool, save_inference_rows
+from src.model_cache import load_cached_model
+from src.processed_data import read_frame
 
 # Carregar variáveis de ambiente
 ROOT = pathlib.Path(__file__).resolve().parents[1]
@@ -30,7 +31,7 @@ PROCESSED = ROOT / "data" / "processed"
 
 
 def load_input():
-    df = pd.read_csv(PROCESSED / "X_test.csv")
+    df = read_frame(PROCESSED, "X_test")
     return df.sample(20, random_state=42)
 
 
@@ -45,7 +46,8 @@ def load_production_model(model_name, stage="Production"):
     run_id = version.run_id
     model_uri = f"runs:/{run_id}/model"
 
-    model = mlflow.sklearn.load_model(model_uri)
+    # Cache local de artefatos compartilhado com o serving
+    model = load_cached_model(run_id)
     return model, run_id, model_uri
 
 
@@ -61,13 +63,14 @@ def main():
         preds = model.predict(df)
         proba = preds.astype(float)
 
-    for i in range(len(df)):
-        save_inference_row(
-            run_id=run_id,
-            model_version="production",
-            features=df.iloc[i].to_dict(),
-            prediction=float(proba[i]),
-        )
+    # Um único INSERT multi-linha para o lote inteiro
+    save_inference_rows(
+        run_id=run_id,
+        model_version="production",
+        rows=df.to_dict(orient="records"),
+        predictions=proba.tolist(),
+    )
+    close_pool()
 
     print(
         json.dumps(
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def entry_nbytes(key, value, expires_at):
+    """
+    Tamanho medido de uma entrada: objetos da chave, do valor, do timestamp
+    de expiração e da tupla que os guarda (o nó do OrderedDict fica de fora).
+    """
+    entry = (value, expires_at, 0)
+    return (
+        sys.getsizeof(key) + sys.getsizeof(value) + sys.getsizeof(expires_at) + sys.getsizeof(entry)
+    )
+
+
+def row_key(model_version, row):
+    """
+    Hash canônico de uma linha codificada + versão do modelo.
+
+    A linha é normalizada para float64 contíguo (e -0.0 vira 0.0), então o
+    mesmo cliente chega na mesma chave vindo de "encoded" ou de "raw".
+    """
+    row = np.ascontiguousarray(row, dtype=np.float64).ravel() + 0.0
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(model_version).encode("utf-8") + b"\0")
+    h.update(row.tobytes())
+    return h.digest()
+
+
+class PredictionCache:
+    """
+    Cache em memória de probabilidades já calculadas pelo serving.
+
+    Limitado por número de entradas e por bytes (despejo LRU; o tamanho de
+    cada entrada é medido com sys.getsizeof ao inserir) e com TTL por
+    entrada. A chave inclui a versão do modelo, e clear() é chamado na troca
+    de modelo, então uma predição nunca sobrevive ao modelo que a gerou.
+    Com max_entries=0 o cache fica desligado (get sempre é miss).
+    """
+
+    def __init__(self, max_entries=10_000, max_bytes=None, ttl=60.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+
+        self._data = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    @classmethod
+    def from_env(cls):
+        max_mb = float(os.getenv("PREDICTION_CACHE_MAX_MB", "0"))
+        return cls(
+            max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "0")),
+            max_bytes=int(max_mb * 1024 * 1024) or None,
+            ttl=float(os.getenv("PREDICTION_CACHE_TTL", "60")),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, key):
+        """
+        Retorna a probabilidade em cache ou None (miss ou expirada).
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+
+            value, expires_at, size = entry
+            if self.clock() >= expires_at:
+                del self._data[key]
+                self._nbytes -= size
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+
+        expires_at = self.clock() + self.ttl
+        size = entry_nbytes(key, value, expires_at)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[2]
+            self._data[key] = (value, expires_at, size)
+            self._nbytes += size
+
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._nbytes > self.max_bytes
+            ):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self._nbytes -= evicted
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+            self._counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._data),
+                "bytes": self.nbytes,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                "enabled": self.enabled,
+            }
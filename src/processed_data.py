@@ -0,0 +1,139 @@
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# "feather": Arrow IPC sem compressão (tipado e mapeável em memória)
+# "csv": formato antigo, útil para inspecionar os dados na mão
+FORMATS = ("feather", "csv")
+EXTENSIONS = {"feather": ".feather", "csv": ".csv"}
+
+
+def processed_format():
+    fmt = os.getenv("PROCESSED_FORMAT", "feather")
+    if fmt not in FORMATS:
+        raise ValueError(f"PROCESSED_FORMAT inválido: {fmt}. Use um de {FORMATS}")
+    return fmt
+
+
+def write_frame(df, directory, name, fmt="feather"):
+    """
+    Salva um DataFrame (ou Series) do estágio processado como <name>.<ext>.
+    Em Feather os dtypes (bool, int64...) são preservados.
+    """
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    df = df.reset_index(drop=True)
+    path = pathlib.Path(directory) / f"{name}{EXTENSIONS[fmt]}"
+
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        # Sem compressão: o leitor consegue mapear os buffers direto do disco
+        feather.write_feather(df, path, compression="uncompressed")
+    return path
+
+
+def read_frame(directory, name, columns=None):
+    """
+    Lê <name>.feather com memory-map; se só existir o CSV (dados gerados
+    antes do formato colunar ou exportados para debug), cai no read_csv.
+    """
+    directory = pathlib.Path(directory)
+    path = directory / f"{name}.feather"
+    if path.exists():
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas()
+
+    return pd.read_csv(directory / f"{name}.csv", usecols=columns)
+
+
+def read_target(directory, name):
+    return read_frame(directory, name).iloc[:, 0].to_numpy()
+
+
+class FrameWriter:
+    """
+    Escrita incremental de um arquivo processado, chunk a chunk (modo
+    streaming do preparo dos dados). O schema é fixado pelo primeiro chunk;
+    os seguintes são convertidos para ele.
+    """
+
+    def __init__(self, directory, name, fmt="feather"):
+        self.path = pathlib.Path(directory) / f"{name}{EXTENSIONS[fmt]}"
+        self.fmt = fmt
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._sink = None
+
+    def write(self, df):
+        if isinstance(df, pd.Series):
+            df = df.to_frame()
+        df = df.reset_index(drop=True)
+
+        if self.fmt == "csv":
+            first = self.rows == 0
+            df.to_csv(self.path, mode="w" if first else "a", header=first, index=False)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._sink = pa.OSFile(str(self.path), "wb")
+                self._writer = pa.ipc.new_file(self._sink, self._schema)
+            self._writer.write_table(table)
+
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def share_frame(data, directory, name):
+    """
+    Grava um DataFrame/Series/array como arquivos .npy (um por coluna) para
+    ser aberto com memory-map por outros processos, sem pickle por worker.
+    Retorna a "spec" (pequena e picklable) usada por open_shared_frame.
+    """
+    target = pathlib.Path(directory) / name
+    target.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(data, pd.DataFrame):
+        columns = [str(c) for c in data.columns]
+        for i, col in enumerate(data.columns):
+            np.save(target / f"{i}.npy", data[col].to_numpy())
+        return {"path": str(target), "columns": columns}
+
+    np.save(target / "values.npy", np.asarray(data))
+    return {"path": str(target), "columns": None}
+
+
+def open_shared_frame(spec):
+    """
+    Abre o que share_frame gravou: as colunas do DataFrame apontam direto
+    para os arquivos mapeados (copy=False), então N workers dividem as mesmas
+    páginas do page cache.
+    """
+    target = pathlib.Path(spec["path"])
+    if spec["columns"] is None:
+        return np.load(target / "values.npy", mmap_mode="r")
+
+    data = {
+        col: np.load(target / f"{i}.npy", mmap_mode="r") for i, col in enumerate(spec["columns"])
+    }
+    return pd.DataFrame(data, copy=False)
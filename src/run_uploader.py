@@ -0,0 +1,111 @@
+import os
+import pathlib
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+
+def log_run_data(client, run_id, params=None, metrics=None, tags=None):
+    """
+    Params, métricas e tags de um run em uma única chamada (log_batch):
+    um round-trip ao tracking server em vez de um por chamada.
+    """
+    timestamp = int(time.time() * 1000)
+    client.log_batch(
+        run_id,
+        metrics=[Metric(k, float(v), timestamp, 0) for k, v in (metrics or {}).items()],
+        params=[Param(k, str(v)) for k, v in (params or {}).items()],
+        tags=[RunTag(k, str(v)) for k, v in (tags or {}).items()],
+    )
+
+
+def upload_run(client, run_id, local_dir):
+    """
+    Envia o diretório de artefatos do run, confere que tudo chegou no
+    artifact store e só então finaliza o run (FINISHED). Em qualquer falha o
+    run vira FAILED. O diretório local é removido no fim.
+    """
+    local_dir = pathlib.Path(local_dir)
+    try:
+        expected = {p.name for p in local_dir.iterdir()}
+        client.log_artifacts(run_id, str(local_dir))
+
+        found = {pathlib.PurePosixPath(a.path).name for a in client.list_artifacts(run_id)}
+        missing = expected - found
+        if missing:
+            raise RuntimeError(f"Artefatos não confirmados no run {run_id}: {sorted(missing)}")
+
+        client.set_terminated(run_id, "FINISHED")
+    except Exception:
+        client.set_terminated(run_id, "FAILED")
+        raise
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
+
+
+class RunUploader:
+    """
+    Upload de artefatos em segundo plano: o treino do próximo candidato não
+    espera o S3. Cada submit() devolve um Future que só resolve depois de o
+    upload ser confirmado e o run finalizado; wait()/close() bloqueiam até
+    todos os uploads pendentes terminarem e propagam a primeira falha.
+    """
+
+    def __init__(self, client=None, max_workers=2):
+        self.client = client or MlflowClient()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mlflow-upload")
+        self._pending = []
+        self._lock = threading.Lock()
+        self._counters = {"uploads": 0, "failed": 0, "bytes": 0, "upload_s": 0.0}
+
+    @classmethod
+    def from_env(cls, client=None):
+        return cls(client, max_workers=max(1, int(os.getenv("TRAIN_UPLOAD_WORKERS", "2"))))
+
+    def submit(self, run_id, local_dir):
+        nbytes = sum(p.stat().st_size for p in pathlib.Path(local_dir).rglob("*") if p.is_file())
+        future = self._pool.submit(self._upload, run_id, local_dir, nbytes)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def _upload(self, run_id, local_dir, nbytes):
+        t0 = time.perf_counter()
+        try:
+            upload_run(self.client, run_id, local_dir)
+        except Exception:
+            with self._lock:
+                self._counters["failed"] += 1
+            raise
+        with self._lock:
+            self._counters["uploads"] += 1
+            self._counters["bytes"] += nbytes
+            self._counters["upload_s"] += time.perf_counter() - t0
+
+    def wait(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        errors = [f.exception() for f in pending]
+        errors = [e for e in errors if e is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
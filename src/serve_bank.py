@@ -1,13 +1,25 @@
 import os
+import threading
+import time
+import warnings
+from contextlib import asynccontextmanager
+from typing import Literal, NamedTuple
 
 import mlflow
-import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from mlflow.tracking import MlflowClient
 from pydantic import BaseModel
 
-from src.db import save_inference_row
+from src.db import close_pool
+from src.features import FeatureEncoder, RawRecordEncoder, load_registry
+from src.forest_engine import ARTIFACT_NAME as PACKED_FOREST_ARTIFACT
+from src.forest_engine import PackedForest
+from src.inference_logger import InferenceLogger
+from src.micro_batcher import MicroBatcher
+from src.model_cache import load_cached_dict, load_cached_model, open_artifact
+from src.prediction_cache import PredictionCache, row_key
 
 # Carregar envs
 load_dotenv("infra/.env")
@@ -21,80 +33,199 @@ os.environ["AWS_EC2_METADATA_DISABLED"] = "true"
 
 mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5050"))
 
-# Colunas booleanas
-BOOLEAN_COLS = [
-    "job_blue-collar",
-    "job_entrepreneur",
-    "job_housemaid",
-    "job_management",
-    "job_retired",
-    "job_self-employed",
-    "job_services",
-    "job_student",
-    "job_technician",
-    "job_unemployed",
-    "job_unknown",
-    "marital_married",
-    "marital_single",
-    "education_secondary",
-    "education_tertiary",
-    "education_unknown",
-    "default_yes",
-    "housing_yes",
-    "loan_yes",
-    "contact_telephone",
-    "contact_unknown",
-    "month_aug",
-    "month_dec",
-    "month_feb",
-    "month_jan",
-    "month_jul",
-    "month_jun",
-    "month_mar",
-    "month_may",
-    "month_nov",
-    "month_oct",
-    "month_sep",
-    "poutcome_other",
-    "poutcome_success",
-    "poutcome_unknown",
-]
-
-
-def ensure_boolean_columns(df):
-    for col in BOOLEAN_COLS:
-        if col in df.columns:
-            df[col] = df[col].astype(bool)
-    return df
+# O modelo recebe arrays NumPy já na ordem de colunas do treino
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
+# Contrato de features (feature_registry.yaml), carregado uma única vez
+REGISTRY = load_registry()
+
+
+MODEL_NAME = os.getenv("MODEL_NAME", "bank-model")
+
+# Intervalo (s) de checagem do registry para hot-reload; 0 desliga o watcher
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "30"))
+
+# Usa o Random Forest compilado em arrays (forest_engine) quando disponível
+USE_PACKED_FOREST = os.getenv("USE_PACKED_FOREST", "0") == "1"
+
+# Hits do cache de predições também vão para inference_logs (padrão: sim).
+# Com 0, entradas repetidas ficam sub-representadas e o drift fica enviesado
+PREDICTION_CACHE_LOG_HITS = os.getenv("PREDICTION_CACHE_LOG_HITS", "1") == "1"
+
+
+class ServingState(NamedTuple):
+    """
+    Tudo o que uma requisição precisa sobre o modelo em produção. É trocado
+    inteiro (uma única atribuição) no hot-reload, então cada requisição lê uma
+    referência só e usa modelo/encoders/versão sempre consistentes entre si.
+    """
+
+    model: object
+    run_id: str
+    version: str
+    encoder: FeatureEncoder
+    raw_encoder: RawRecordEncoder | None
+    loaded_at: float
 
-# Carregamento do modelo
-def load_model():
-    model_name = os.getenv("MODEL_NAME", "bank-model")
 
+# Carregamento do modelo
+def get_production_version():
     client = MlflowClient()
-    versions = client.get_latest_versions(model_name, stages=["Production"])
+    versions = client.get_latest_versions(MODEL_NAME, stages=["Production"])
 
     if not versions:
-        raise RuntimeError(f"Nenhum modelo em Production para {model_name}")
+        raise RuntimeError(f"Nenhum modelo em Production para {MODEL_NAME}")
+
+    return versions[0]
+
+
+def load_raw_encoder(run_id, columns):
+    """
+    Carrega o vocabulário categórico logado junto com o modelo. Modelos antigos
+    (sem encoding.json) continuam funcionando, só sem o modo "raw".
+    """
+    try:
+        vocabulary = load_cached_dict(run_id, "encoding.json")
+    except Exception as e:
+        print("Vocabulário categórico indisponível; modo raw desabilitado:", e)
+        return None
+
+    raw = RawRecordEncoder(vocabulary)
+    if raw.columns != tuple(columns):
+        print("Vocabulário categórico não bate com as colunas do modelo; modo raw desabilitado.")
+        return None
+    return raw
+
+
+def load_packed_forest(run_id):
+    """
+    Carrega o artefato packed_forest.npz do run, se existir (só runs de RF).
+    """
+    try:
+        with open_artifact(run_id, PACKED_FOREST_ARTIFACT) as path:
+            return PackedForest.load(path)
+    except Exception as e:
+        print("Motor de floresta compilada indisponível; usando o modelo sklearn:", e)
+        return None
+
+
+def load_state(v):
+    """
+    Carrega e aquece uma versão do registry, fora do caminho das requisições.
+    """
+    # Carregar modelo sklearn diretamente (para ter predict_proba), via cache
+    # local: restart com a mesma versão em Production não toca no S3
+    model = load_packed_forest(v.run_id) if USE_PACKED_FOREST else None
+    if model is None:
+        model = load_cached_model(v.run_id)
+
+    # Encoder pré-compilado: dict → linha NumPy na ordem de colunas do modelo
+    encoder = FeatureEncoder.for_model(model, REGISTRY)
+
+    # Encoder dos registros crus (job, marital, ...) via tabela categoria → índice
+    raw_encoder = load_raw_encoder(v.run_id, encoder.columns)
+
+    # Aquecimento: a primeira predict_proba paga custos de inicialização
+    model.predict_proba(np.zeros((1, encoder.n_features)))
+
+    return ServingState(model, v.run_id, str(v.version), encoder, raw_encoder, time.time())
+
+
+state = load_state(get_production_version())
+
+# Status do watcher de hot-reload (exposto em /admin/model)
+reload_status = {"last_check": None, "last_error": None, "reloads": 0}
+_reload_lock = threading.Lock()
+
+
+def refresh_model():
+    """
+    Checa a versão em Production no registry e, se mudou, carrega/aquece a nova
+    e troca o estado atomicamente. Requisições em andamento terminam com o
+    estado que já tinham lido. Retorna True se houve troca.
+    """
+    global state
+    with _reload_lock:
+        reload_status["last_check"] = time.time()
+        try:
+            v = get_production_version()
+            if str(v.version) == state.version:
+                reload_status["last_error"] = None
+                return False
+
+            new_state = load_state(v)
+        except Exception as e:
+            reload_status["last_error"] = str(e)
+            raise
+
+        previous = state.version
+        state = new_state
+        # Predições do modelo anterior não valem mais
+        prediction_cache.clear()
+        reload_status["last_error"] = None
+        reload_status["reloads"] += 1
+        print(f"Modelo {MODEL_NAME} trocado: v{previous} -> v{new_state.version}")
+        return True
+
+
+def watch_registry(stop_event, interval):
+    while not stop_event.wait(interval):
+        try:
+            refresh_model()
+        except Exception as e:
+            print("Erro ao checar/recarregar modelo do registry:", e)
+
+
+# Logs de inferência gravados em background (write-behind)
+inference_log = InferenceLogger.from_env()
+
+# Cache de probabilidades por (versão do modelo, linha codificada)
+prediction_cache = PredictionCache.from_env()
 
-    v = versions[0]
-    model_uri = f"runs:/{v.run_id}/model"
+# Agrupa /predict concorrentes em um único predict_proba (MICRO_BATCH_*)
+micro_batcher = MicroBatcher.from_env()
 
-    # Carregar modelo sklearn diretamente (para ter predict_proba)
-    model = mlflow.sklearn.load_model(model_uri)
 
-    return model, v.run_id, v.version
+@asynccontextmanager
+async def lifespan(app):
+    inference_log.start()
+    if micro_batcher.enabled:
+        micro_batcher.start()
 
+    stop_watcher = threading.Event()
+    if MODEL_POLL_INTERVAL > 0:
+        threading.Thread(
+            target=watch_registry,
+            args=(stop_watcher, MODEL_POLL_INTERVAL),
+            name="model-watcher",
+            daemon=True,
+        ).start()
+
+    yield
+
+    stop_watcher.set()
+    micro_batcher.stop()
+    # Drena a fila antes de derrubar o processo
+    inference_log.stop()
+    close_pool()
 
-model, model_run_id, model_version = load_model()
 
 # API
-app = FastAPI(title="Bank Marketing Model API")
+app = FastAPI(title="Bank Marketing Model API", lifespan=lifespan)
+
+
+InputFormat = Literal["encoded", "raw"]
 
 
 class PredictRequest(BaseModel):
     input: dict
+    # "encoded": 42 colunas do get_dummies | "raw": campos originais do CSV
+    input_format: InputFormat = "encoded"
+
+
+class PredictBatchRequest(BaseModel):
+    inputs: list[dict]
+    input_format: InputFormat = "encoded"
 
 
 @app.get("/health")
@@ -102,27 +233,151 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/admin/model")
+def admin_model():
+    current = state
+    return {
+        "model_name": MODEL_NAME,
+        "version": current.version,
+        "run_id": current.run_id,
+        "loaded_at": current.loaded_at,
+        "raw_input": current.raw_encoder is not None,
+        "engine": type(current.model).__name__,
+        "poll_interval": MODEL_POLL_INTERVAL,
+        **reload_status,
+        "prediction_cache": prediction_cache.stats(),
+        "micro_batch": micro_batcher.stats() if micro_batcher.enabled else None,
+    }
+
+
+@app.post("/admin/model/reload")
+def admin_model_reload():
+    try:
+        reloaded = refresh_model()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Falha ao recarregar modelo: {e}") from e
+    return {"reloaded": reloaded, "version": state.version, "run_id": state.run_id}
+
+
+def encode_records(current, records, input_format):
+    """
+    Valida e codifica os registros conforme o formato de entrada.
+    """
+    if input_format == "raw":
+        if current.raw_encoder is None:
+            raise HTTPException(
+                status_code=400, detail="Modelo em produção não suporta input_format='raw'"
+            )
+        selected = current.raw_encoder
+    else:
+        selected = current.encoder
+
+    for record in records:
+        missing = selected.missing(record)
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Features ausentes: {missing}")
+
+    try:
+        if len(records) == 1:
+            return selected.encode(records[0])
+        return selected.encode_many(records)
+    except (TypeError, ValueError) as e:
+        # TypeError: valor não escalar (ex.: dict/lista) numa feature numérica
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+
+def predict_positive(model, X):
+    """
+    predict_proba(X)[:, 1]. Linhas avulsas passam pelo micro-batcher (quando
+    ligado), que junta requisições concorrentes numa única chamada.
+    """
+    if micro_batcher.enabled and len(X) == 1:
+        return np.array([micro_batcher.predict(model, X[0])])
+    return model.predict_proba(X)[:, 1]
+
+
+def score(current, X):
+    """
+    Probabilidade da classe positiva para cada linha de X. Linhas já vistas
+    (mesma versão do modelo, dentro do TTL) vêm do cache, sem predict_proba;
+    o resto é pontuado numa única chamada vetorizada.
+
+    Retorna (probas, hits), onde hits marca as linhas que vieram do cache.
+    """
+    if not prediction_cache.enabled:
+        return predict_positive(current.model, X), np.zeros(len(X), dtype=bool)
+
+    keys = [row_key(current.version, row) for row in X]
+    probas = np.empty(len(X), dtype=np.float64)
+    hits = np.zeros(len(X), dtype=bool)
+    for i, key in enumerate(keys):
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            probas[i] = cached
+            hits[i] = True
+
+    misses = np.flatnonzero(~hits)
+    if len(misses):
+        probas[misses] = predict_positive(current.model, X[misses])
+        for i in misses:
+            prediction_cache.put(keys[i], float(probas[i]))
+
+    return probas, hits
+
+
 @app.post("/predict")
 def predict(payload: PredictRequest):
-    df = pd.DataFrame([payload.input])
-    df = ensure_boolean_columns(df)
+    # Uma única leitura do estado: o hot-reload não afeta esta requisição
+    current = state
+    X = encode_records(current, [payload.input], payload.input_format)
 
     # Calcular probabilidade e classe
-    proba = float(model.predict_proba(df)[0, 1])
+    probas, hits = score(current, X)
+    proba = float(probas[0])
     pred_class = int(proba >= 0.5)
 
-    # Salvar no Postgres
-    save_inference_row(
-        run_id=model_run_id,
-        model_version=str(model_version),
-        features=df.iloc[0].to_dict(),
-        prediction=proba,
-    )
+    # Enfileira o log; a gravação no Postgres acontece em background
+    if PREDICTION_CACHE_LOG_HITS or not hits[0]:
+        inference_log.submit(
+            run_id=current.run_id,
+            model_version=current.version,
+            features=current.encoder.to_record(X[0]),
+            prediction=proba,
+        )
 
     return {
         "class": pred_class,
         "probability": proba,
-        "n_features": df.shape[1],
+        "n_features": current.encoder.n_features,
+    }
+
+
+@app.post("/predict_batch")
+def predict_batch(payload: PredictBatchRequest):
+    if not payload.inputs:
+        return {"predictions": [], "n_rows": 0, "n_features": 0}
+
+    current = state
+    X = encode_records(current, payload.inputs, payload.input_format)
+
+    # Uma única chamada vetorizada para as linhas que não estão em cache
+    probas, hits = score(current, X)
+
+    # Enfileira todos os logs de uma vez (gravados em lote em background)
+    inference_log.submit_many(
+        [
+            (current.run_id, current.version, current.encoder.to_record(row), proba)
+            for row, proba, hit in zip(X, probas.tolist(), hits, strict=True)
+            if PREDICTION_CACHE_LOG_HITS or not hit
+        ]
+    )
+
+    return {
+        "predictions": [
+            {"class": int(proba >= 0.5), "probability": float(proba)} for proba in probas
+        ],
+        "n_rows": len(X),
+        "n_features": current.encoder.n_features,
     }
 
 
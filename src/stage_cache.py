@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import pathlib
+import time
+
+from src.model_cache import dir_checksum
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+STAGE_CACHE_DIR = pathlib.Path(os.getenv("STAGE_CACHE_DIR", str(ROOT / ".stage_cache")))
+MANIFEST_FILE = "manifest.json"
+
+# Quantos eventos (hit/miss/force) ficam no histórico do manifesto
+HISTORY_SIZE = 200
+
+
+def code_version(*paths):
+    """
+    Hash do código-fonte do estágio: mudou o código, muda a chave.
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        path = pathlib.Path(path)
+        h.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return h.hexdigest()
+
+
+def file_digests(paths):
+    """
+    {nome: sha256} dos arquivos/diretórios de entrada (os que existirem).
+    """
+    return {pathlib.Path(p).name: dir_checksum(p) for p in paths if pathlib.Path(p).exists()}
+
+
+def stage_key(stage, params, files=(), code=""):
+    """
+    Chave do estágio: hash canônico dos parâmetros, do conteúdo dos arquivos
+    de entrada e da versão do código.
+    """
+    payload = {
+        "stage": stage,
+        "params": params,
+        "files": file_digests(files),
+        "code": code,
+    }
+    raw = json.dumps(payload, sort_keys=True, default=repr).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def load_manifest(cache_dir=None):
+    cache_dir = pathlib.Path(cache_dir or STAGE_CACHE_DIR)
+    try:
+        with open(cache_dir / MANIFEST_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"stages": {}, "history": []}
+
+
+def _save_manifest(manifest, cache_dir):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / f".{MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, cache_dir / MANIFEST_FILE)
+
+
+def lookup(stage, key, cache_dir=None):
+    """
+    Retorna os outputs registrados para (stage, key), ou None se a chave não
+    bate com a última execução do estágio.
+    """
+    entry = load_manifest(cache_dir)["stages"].get(stage)
+    if entry is None or entry["key"] != key:
+        return None
+    return entry["outputs"]
+
+
+def record(stage, key, event, outputs=None, cache_dir=None):
+    """
+    Registra um evento do estágio no manifesto ("hit", "miss" ou "force").
+    Em miss/force, `outputs` passa a ser o resultado cacheado para a chave.
+    """
+    cache_dir = pathlib.Path(cache_dir or STAGE_CACHE_DIR)
+    manifest = load_manifest(cache_dir)
+    now = time.time()
+
+    entry = manifest["stages"].get(stage)
+    if event == "hit":
+        entry["hits"] += 1
+        entry["last_hit_at"] = now
+    else:
+        manifest["stages"][stage] = {
+            "key": key,
+            "outputs": outputs,
+            "created_at": now,
+            "hits": 0,
+            "last_hit_at": None,
+        }
+
+    manifest["history"].append({"stage": stage, "key": key[:16], "event": event, "at": now})
+    manifest["history"] = manifest["history"][-HISTORY_SIZE:]
+    _save_manifest(manifest, cache_dir)
@@ -1,17 +1,53 @@
+import argparse
+import hashlib
 import json
+import multiprocessing
 import os
 import pathlib
+import tempfile
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import mlflow
 import mlflow.sklearn
+import numpy as np
 import pandas as pd
-import psycopg2
+from mlflow.models import Model
 from mlflow.models.signature import infer_signature
+from mlflow.tracking import MlflowClient
+from mlflow.tracking.context import registry as context_registry
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.exceptions import ConvergenceWarning
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import HalvingRandomSearchCV
+from threadpoolctl import threadpool_limits
+
+from src.db import close_pool, copy_training_rows, pooled_conn
+from src.drift_engine import fit_group_counts, fit_histograms
+from src.features import (
+    REGISTRY_PATH,
+    apply_dtype_plan,
+    categorical_groups,
+    dtype_plan,
+    load_registry,
+    memory_report,
+)
+from src.forest_engine import ARTIFACT_NAME as PACKED_FOREST_ARTIFACT
+from src.forest_engine import PackedForest
+from src.model_cache import load_cached_model
+from src.processed_data import (
+    EXTENSIONS,
+    open_shared_frame,
+    read_frame,
+    read_target,
+    share_frame,
+)
+from src.run_uploader import RunUploader, log_run_data, upload_run
+from src.stage_cache import code_version, lookup, record, stage_key
 
 # Limpar warnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -36,39 +72,553 @@ mlflow.set_experiment("bank-marketing")
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 PROCESSED = ROOT / "data" / "processed"
 
+# Código que define o resultado do estágio (entra na chave do cache)
+CODE_FILES = [
+    pathlib.Path(__file__),
+    pathlib.Path(__file__).with_name("drift_engine.py"),
+    pathlib.Path(__file__).with_name("features.py"),
+    pathlib.Path(__file__).with_name("forest_engine.py"),
+    pathlib.Path(__file__).with_name("processed_data.py"),
+    pathlib.Path(__file__).with_name("run_uploader.py"),
+]
+
+
+def processed_inputs():
+    """
+    Arquivos processados que alimentam o treino (os que existirem entram no
+    hash do estágio).
+    """
+    names = ["X_train", "X_test", "y_train", "y_test"]
+    paths = [PROCESSED / f"{name}{ext}" for name in names for ext in EXTENSIONS.values()]
+    return paths + [PROCESSED / "encoding.json", REGISTRY_PATH]
+
+
+def candidate_models():
+    return {
+        "log_reg": LogisticRegression(max_iter=500),
+        "rf": RandomForestClassifier(
+            n_estimators=200,
+            max_depth=10,
+            random_state=42,
+            n_jobs=-1,
+        ),
+    }
+
+
+def search_config():
+    """
+    Busca de hiperparâmetros (TRAIN_SEARCH=1): nº de configurações sorteadas,
+    fator de eliminação do successive halving, folds de validação cruzada e
+    o orçamento de tempo por candidato em segundos (0 = sem orçamento).
+    """
+    if os.getenv("TRAIN_SEARCH", "0") != "1":
+        return None
+    return {
+        "n_candidates": int(os.getenv("TRAIN_SEARCH_CANDIDATES", "24")),
+        "factor": int(os.getenv("TRAIN_SEARCH_FACTOR", "3")),
+        "cv": int(os.getenv("TRAIN_SEARCH_CV", "3")),
+        "budget_s": float(os.getenv("TRAIN_SEARCH_BUDGET_S", "0")),
+    }
+
+
+def search_spaces():
+    """
+    Espaço de busca de cada candidato e o recurso que o successive halving
+    aumenta a cada rodada: nº de linhas (log_reg) ou nº de árvores (rf).
+    """
+    return {
+        "log_reg": {
+            "params": {
+                "C": [0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0],
+                "class_weight": [None, "balanced"],
+            },
+            "resource": "n_samples",
+            "max_resources": "auto",
+        },
+        "rf": {
+            "params": {
+                "max_depth": [4, 6, 8, 10, 14, 20, None],
+                "min_samples_leaf": [1, 2, 5, 10, 20],
+                "max_features": ["sqrt", 0.2, 0.35, 0.5],
+                "class_weight": [None, "balanced_subsample"],
+            },
+            "resource": "n_estimators",
+            "max_resources": 400,
+        },
+    }
+
+
+def probe_fit_seconds(estimator, space, X_train, y_train):
+    """
+    Tempo de um fit com o recurso máximo (todas as linhas / todas as
+    árvores): o custo de um trial da última rodada do halving.
+    """
+    probe = clone(estimator)
+    if space["resource"] != "n_samples":
+        probe.set_params(**{space["resource"]: space["max_resources"]})
+    started = time.perf_counter()
+    probe.fit(X_train, y_train)
+    return time.perf_counter() - started
+
+
+def candidates_for_budget(budget_s, fit_s, config, n_jobs):
+    """
+    Quantas configurações cabem no orçamento. Com min_resources="exhaust",
+    nº de configurações x recurso fica ~constante entre rodadas, então cada
+    rodada custa no máximo factor x cv fits com recurso máximo (divididos
+    pelos n_jobs). Com r rodadas cabem factor^(r-1) configurações.
+    Retorna 0 quando não cabe nem uma comparação (ao menos 2 configurações).
+    """
+    factor = config["factor"]
+    per_round = factor * config["cv"] * fit_s / max(1, n_jobs)
+    if per_round <= 0:
+        return config["n_candidates"]
+    rounds = int(budget_s // per_round)
+    if rounds < 2:
+        return 0
+    return min(config["n_candidates"], factor ** (rounds - 1))
+
+
+def search_candidate(name, model, space, X_train, y_train, metric_name, config, n_jobs):
+    """
+    Successive halving sobre o espaço do candidato: muitas configurações com
+    pouco recurso na 1ª rodada, só as melhores 1/factor sobem para a próxima.
+    Cada trial vira um run aninhado no MLflow, sob um run "search:<nome>".
+
+    O paralelismo fica com a busca (n_jobs fits ao mesmo tempo) e cada fit
+    usa 1 núcleo, respeitando workers x n_jobs <= núcleos. Com budget_s, um
+    fit cronometrado define quantas configurações cabem no orçamento.
+
+    Retorna um clone não treinado do estimador com os melhores parâmetros
+    (ou o próprio modelo, sem busca, se o orçamento não comportar uma).
+    """
+    estimator = clone(model)
+    if "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=1)
+
+    n_candidates = config["n_candidates"]
+    if config.get("budget_s"):
+        fit_s = probe_fit_seconds(estimator, space, X_train, y_train)
+        n_candidates = candidates_for_budget(config["budget_s"] - fit_s, fit_s, config, n_jobs)
+        print(
+            f"Orçamento {name}: {config['budget_s']:.0f}s, fit com recurso máximo "
+            f"{fit_s:.2f}s -> {n_candidates} configurações"
+        )
+        if n_candidates == 0:
+            print(f"Busca {name}: orçamento insuficiente, mantendo os parâmetros padrão")
+            return clone(model)
+
+    search = HalvingRandomSearchCV(
+        estimator,
+        space["params"],
+        n_candidates=n_candidates,
+        factor=config["factor"],
+        resource=space["resource"],
+        max_resources=space["max_resources"],
+        # A última rodada usa o recurso máximo (todas as linhas / árvores)
+        min_resources="exhaust",
+        cv=config["cv"],
+        scoring="f1" if metric_name == "f1" else "roc_auc",
+        refit=False,
+        random_state=42,
+        n_jobs=n_jobs,
+    )
+    search.fit(X_train, y_train)
+    results = search.cv_results_
+
+    client = MlflowClient()
+    with mlflow.start_run(run_name=f"search:{name}") as parent:
+        for i, params in enumerate(results["params"]):
+            with mlflow.start_run(run_name=f"{name}-trial-{i}", nested=True) as trial:
+                params = {
+                    **params,
+                    "iter": int(results["iter"][i]),
+                    "n_resources": int(results["n_resources"][i]),
+                }
+                metrics = {f"cv_{metric_name}": float(results["mean_test_score"][i])}
+                log_run_data(client, trial.info.run_id, params, metrics)
+
+        params = {f"search_{k}": v for k, v in config.items()}
+        # Com orçamento, vale o nº de configurações que coube nele
+        params["search_n_candidates"] = n_candidates
+        params["search_resource"] = space["resource"]
+        params.update({f"best_{k}": v for k, v in search.best_params_.items()})
+        metrics = {f"best_cv_{metric_name}": float(search.best_score_)}
+        log_run_data(client, parent.info.run_id, params, metrics)
+
+    print(
+        f"Busca {name}: {len(results['params'])} trials em {search.n_iterations_} rodadas, "
+        f"melhor cv_{metric_name}={search.best_score_:.4f} com {search.best_params_}"
+    )
+
+    best = clone(model).set_params(**search.best_params_)
+    # O recurso do halving vira o valor final do estimador vencedor
+    if space["resource"] != "n_samples":
+        best.set_params(**{space["resource"]: int(search.n_resources_[-1])})
+    return best
+
+
+def search_candidates(models, X_train, y_train, metric_name, config):
+    spaces = search_spaces()
+    searched = {}
+    for name, model in models.items():
+        if name not in spaces:
+            searched[name] = model
+            continue
+        print(f"\nBuscando hiperparâmetros: {name}")
+        searched[name] = search_candidate(
+            name, model, spaces[name], X_train, y_train, metric_name, config, core_budget()
+        )
+    return searched
+
+
+def cached_run_available(outputs, model_name):
+    """
+    O run e a versão registrada de uma execução cacheada ainda existem?
+    """
+    try:
+        client = MlflowClient()
+        run = client.get_run(outputs["best"]["run_id"])
+        version = client.get_model_version(model_name, outputs["model_version"])
+    except Exception:
+        return False
+    return run.info.lifecycle_stage == "active" and version.run_id == run.info.run_id
+
 
 def load_data():
-    X_train = pd.read_csv(PROCESSED / "X_train.csv")
-    X_test = pd.read_csv(PROCESSED / "X_test.csv")
-    y_train = pd.read_csv(PROCESSED / "y_train.csv").values.ravel()
-    y_test = pd.read_csv(PROCESSED / "y_test.csv").values.ravel()
+    # Feather mapeado em memória (dtypes preservados); CSV só como fallback
+    X_train = read_frame(PROCESSED, "X_train")
+    X_test = read_frame(PROCESSED, "X_test")
+
+    # Mesmo plano de tipos do preparo (cobre também arquivos CSV antigos)
+    plan = dtype_plan(load_registry())
+    before = memory_report(X_train) + memory_report(X_test)
+    X_train = apply_dtype_plan(X_train, plan)
+    X_test = apply_dtype_plan(X_test, plan)
+    after = memory_report(X_train) + memory_report(X_test)
+    print(f"Matrizes de treino/teste: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+
+    y_train = read_target(PROCESSED, "y_train")
+    y_test = read_target(PROCESSED, "y_test")
     return X_train, X_test, y_train, y_test
 
 
+def load_encoding():
+    """
+    Vocabulário categórico gerado no preparo dos dados (se existir).
+    """
+    path = PROCESSED / "encoding.json"
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
 def compute_metric(y_true, y_pred, metric_name):
     if metric_name == "f1":
         return f1_score(y_true, (y_pred > 0.5).astype(int))
     return roc_auc_score(y_true, y_pred)
 
 
-def train_and_log(model_name, model, X_train, y_train, X_test, y_test, metric_name):
-    with mlflow.start_run(run_name=model_name):
+def experiment_id():
+    return mlflow.get_experiment_by_name("bank-marketing").experiment_id
+
+
+def train_and_log(
+    model_name,
+    model,
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    metric_name,
+    encoding=None,
+    tags=None,
+    uploader=None,
+):
+    """
+    Treina, avalia e loga um candidato. Params, métrica e tags vão em um
+    único log_batch; os artefatos são montados em disco local e enviados pelo
+    `uploader` em segundo plano (o run só é finalizado depois do upload
+    confirmado). Sem uploader, o upload é feito aqui mesmo, antes de retornar.
+    """
+    client = MlflowClient()
+    # Mesmas tags de contexto do mlflow.start_run (usuário, fonte, commit do git)
+    run_id = client.create_run(
+        experiment_id(), run_name=model_name, tags=context_registry.resolve_tags()
+    ).info.run_id
+
+    try:
         model.fit(X_train, y_train)
 
         y_pred_proba = model.predict_proba(X_test)[:, 1]
         metric_value = compute_metric(y_test, y_pred_proba, metric_name)
 
-        mlflow.log_params(model.get_params())
-        mlflow.log_metric(metric_name, metric_value)
+        log_run_data(client, run_id, model.get_params(), {metric_name: metric_value}, tags)
+
+        staging = pathlib.Path(tempfile.mkdtemp(prefix=f"run-{run_id[:8]}-"))
+        mlmodel = stage_artifacts(
+            staging, model, infer_signature(X_train, y_pred_proba), encoding, run_id=run_id
+        )
+        # Tag mlflow.log-model.history, como o log_model faria
+        client._record_logged_model(run_id, mlmodel)
+    except Exception:
+        client.set_terminated(run_id, "FAILED")
+        raise
+
+    if uploader is None:
+        upload_run(client, run_id, staging)
+    else:
+        uploader.submit(run_id, staging)
+
+    return {
+        "model_name": model_name,
+        "metric": metric_value,
+        "run_id": run_id,
+    }
+
+
+def stage_artifacts(directory, model, signature, encoding=None, run_id=None):
+    """
+    Monta no disco a árvore de artefatos do run (model/, encoding.json,
+    packed_forest.npz), pronta para um único log_artifacts. O MLmodel leva
+    run_id/artifact_path, como no log_model. Retorna o Model salvo.
+    """
+    directory = pathlib.Path(directory)
+    model_dir = directory / "model"
+    mlflow.sklearn.save_model(model, str(model_dir), signature=signature)
+    mlmodel = Model.load(str(model_dir))
+    mlmodel.run_id = run_id
+    mlmodel.artifact_path = "model"
+    mlmodel.save(str(model_dir / "MLmodel"))
+
+    # Vocabulário categórico versionado junto com o modelo (serving "raw")
+    if encoding is not None:
+        with open(directory / "encoding.json", "w", encoding="utf-8") as f:
+            json.dump(encoding, f, indent=2)
+
+    # Random Forest também vai compilado em arrays planos (artefato alternativo
+    # para o motor de inferência vetorizado do serving)
+    if isinstance(model, RandomForestClassifier):
+        PackedForest.from_estimator(model).save(directory / PACKED_FOREST_ARTIFACT)
+
+    return mlmodel
+
+
+# Treino paralelo dos candidatos
+def core_budget():
+    """
+    Núcleos disponíveis para o treino inteiro (TRAIN_N_JOBS, padrão: todos).
+    """
+    return int(os.getenv("TRAIN_N_JOBS", "0")) or os.cpu_count() or 1
+
+
+def plan_parallelism(models, cores, max_workers=None):
+    """
+    Divide o orçamento de núcleos entre processos e o n_jobs de cada
+    estimador (workers x n_jobs <= cores), para não haver oversubscription.
+    Retorna (n_workers, núcleos por worker).
+    """
+    n_workers = max(1, min(len(models), cores, max_workers or cores))
+    per_worker = max(1, cores // n_workers)
+    for model in models.values():
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=per_worker)
+    return n_workers, per_worker
+
+
+def _train_candidate(
+    name, model, shared, metric_name, encoding, n_threads, tracking_uri, exp_id, tags=None
+):
+    """
+    Executado em um processo do pool: abre a matriz compartilhada via
+    memory-map e loga o próprio run no MLflow.
+    """
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment_id=exp_id)
+    data = {key: open_shared_frame(spec) for key, spec in shared.items()}
+
+    # BLAS/OpenMP também respeitam a fatia de núcleos do worker
+    with threadpool_limits(limits=n_threads):
+        return train_and_log(
+            name,
+            model,
+            data["X_train"],
+            data["y_train"],
+            data["X_test"],
+            data["y_test"],
+            metric_name,
+            encoding=encoding,
+            tags=tags,
+        )
+
 
-        signature = infer_signature(X_train, y_pred_proba)
-        mlflow.sklearn.log_model(model, artifact_path="model", signature=signature)
+def train_candidates(
+    models, X_train, y_train, X_test, y_test, metric_name, encoding=None, tags=None
+):
+    """
+    Treina todos os candidatos, em paralelo quando há mais de um núcleo
+    (TRAIN_MAX_WORKERS limita os processos). Os resultados voltam na ordem
+    de `models`, então a escolha do melhor é determinística.
+    """
+    n_workers, per_worker = plan_parallelism(
+        models, core_budget(), int(os.getenv("TRAIN_MAX_WORKERS", "0")) or None
+    )
 
-        return {
-            "model_name": model_name,
-            "metric": metric_value,
-            "run_id": mlflow.active_run().info.run_id,
-        }
+    if n_workers == 1:
+        results = []
+        # O upload dos artefatos de um candidato corre enquanto o próximo treina;
+        # sair do bloco espera todos os runs serem confirmados
+        with RunUploader.from_env() as uploader:
+            for name, model in models.items():
+                print(f"\nTreinando modelo: {name}")
+                res = train_and_log(
+                    name,
+                    model,
+                    X_train,
+                    y_train,
+                    X_test,
+                    y_test,
+                    metric_name,
+                    encoding=encoding,
+                    tags=tags,
+                    uploader=uploader,
+                )
+                results.append(res)
+        return results
+
+    print(f"\nTreinando {len(models)} modelos em {n_workers} processos ({per_worker} núcleo(s))")
+    exp_id = experiment_id()
+
+    with tempfile.TemporaryDirectory(prefix="train-shared-") as tmp:
+        frames = {"X_train": X_train, "y_train": y_train, "X_test": X_test, "y_test": y_test}
+        shared = {key: share_frame(frame, tmp, key) for key, frame in frames.items()}
+
+        # spawn: cada worker sobe limpo (sem herdar threads/conexões do pai)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    _train_candidate,
+                    name,
+                    model,
+                    shared,
+                    metric_name,
+                    encoding,
+                    per_worker,
+                    mlflow.get_tracking_uri(),
+                    exp_id,
+                    tags,
+                )
+                for name, model in models.items()
+            ]
+            return [future.result() for future in futures]
+
+
+# Snapshot dos dados de treino (retreino incremental)
+def data_fingerprint(X, y):
+    """
+    Hash do conteúdo (linhas, na ordem) de X e y: identifica exatamente o
+    conjunto de treino que um modelo viu.
+    """
+    h = hashlib.sha256()
+    h.update(",".join(map(str, X.columns)).encode("utf-8") + b"\0")
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def snapshot_tags(X_train, y_train):
+    """
+    Tags do run com o tamanho e o hash do treino. O treino incremental usa
+    essas tags para achar as linhas novas no X_train/y_train processados.
+    """
+    return {
+        "train_rows": str(len(X_train)),
+        "train_fingerprint": data_fingerprint(X_train, y_train),
+    }
+
+
+def new_rows_since(snapshot, X_train, y_train):
+    """
+    Linhas adicionadas ao treino depois do snapshot de um modelo.
+
+    O histórico processado é tratado como append-only: as primeiras
+    `train_rows` linhas precisam ser exatamente as que o modelo viu. Se não
+    forem (dados reprocessados, novo split...), não há como saber o que é
+    novo e o retreino precisa ser completo.
+    """
+    if "train_rows" not in snapshot or "train_fingerprint" not in snapshot:
+        raise ValueError("Modelo sem snapshot de treino (train_rows/train_fingerprint)")
+
+    n_seen = int(snapshot["train_rows"])
+    if len(X_train) < n_seen or (
+        data_fingerprint(X_train.iloc[:n_seen], y_train[:n_seen]) != snapshot["train_fingerprint"]
+    ):
+        raise ValueError(
+            "Os dados de treino não começam pelo snapshot do modelo; rode o treino completo "
+            "(o retreino incremental exige o preparo com PROCESSED_SPLIT=stable)"
+        )
+    return X_train.iloc[n_seen:], y_train[n_seen:]
+
+
+def warm_start_model(model, extra_trees):
+    """
+    Prepara um modelo já treinado para continuar o treino no próximo fit():
+    RF ganha `extra_trees` árvores novas (as antigas ficam intactas) e a
+    regressão logística parte dos coeficientes atuais.
+
+    O warm_start do lbfgs só reaproveita o ponto de partida, não o histórico:
+    um fit só nas linhas novas esqueceria o treino anterior. Por isso a
+    regressão logística é reajustada no treino inteiro (incremental_fit_rows),
+    convergindo em menos iterações; só o RF treina de fato só no que é novo.
+    """
+    if isinstance(model, RandomForestClassifier):
+        return model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees)
+    if isinstance(model, LogisticRegression):
+        return model.set_params(warm_start=True)
+    raise ValueError(f"Retreino incremental não suportado para {type(model).__name__}")
+
+
+def incremental_fit_rows(model, X_train, y_train, X_new, y_new):
+    """
+    Linhas do fit incremental: só as novas para o RF (árvores novas somam às
+    antigas); o treino inteiro para a regressão logística (ver
+    warm_start_model).
+    """
+    if isinstance(model, LogisticRegression):
+        return X_train, y_train
+    return X_new, y_new
+
+
+# Cópia exata do treino no Postgres (training_rows)
+def start_training_rows_copy(snapshot, X_train, y_train):
+    """
+    Com TRAIN_MATERIALIZE_ROWS=1, dispara em uma thread o COPY do X_train/
+    y_train para training_rows, em paralelo ao fit dos candidatos (que roda
+    em processos ou em código nativo, fora do GIL). Retorna o Future ou None.
+    """
+    if os.getenv("TRAIN_MATERIALIZE_ROWS", "0") != "1":
+        return None
+    chunk_size = int(os.getenv("TRAIN_ROWS_CHUNK", "50000"))
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training-rows")
+    future = executor.submit(copy_training_rows, snapshot, X_train, y_train, chunk_size)
+    executor.shutdown(wait=False)
+    return future
+
+
+def finish_training_rows_copy(future):
+    if future is None:
+        return
+    try:
+        written = future.result()
+    except Exception as e:
+        print("Erro ao materializar linhas de treino no Postgres:", e)
+        return
+    if written:
+        print(f"{written} linhas de treino materializadas em training_rows.")
+    else:
+        print("Linhas de treino já estavam em training_rows (mesmo snapshot).")
 
 
 # Persistência no Postgres — agora com feature_stats
@@ -81,59 +631,54 @@ def log_training_metadata_to_db(
     model_version,
     metric_name,
     metric_value,
+    train_snapshot=None,
 ):
-    host = os.getenv("POSTGRES_HOST", "localhost")
-    user = os.getenv("POSTGRES_USER")
-    pwd = os.getenv("POSTGRES_PASSWORD")
-    db = os.getenv("POSTGRES_DB")
-    port = os.getenv("POSTGRES_PORT", "5432")
-
     n_train = len(X_train)
     n_test = len(X_test)
     n_features = X_train.shape[1]
 
     # Estatísticas de drift — super simples e super úteis
     feature_stats = X_train.describe().to_dict()
+    # Histogramas por quantil: referência do PSI/KS no monitor
+    feature_histograms = fit_histograms(X_train)
+    # Grupos one-hot: só as contagens por categoria (drift categórico)
+    category_counts = fit_group_counts(X_train, categorical_groups(load_registry()))
 
     try:
-        conn = psycopg2.connect(
-            host=host,
-            user=user,
-            password=pwd,
-            dbname=db,
-            port=port,
-        )
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            INSERT INTO training_data (
-                run_id,
-                model_version,
-                metric_name,
-                metric_value,
-                n_train,
-                n_test,
-                n_features,
-                feature_stats
+        with pooled_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                INSERT INTO training_data (
+                    run_id,
+                    model_version,
+                    metric_name,
+                    metric_value,
+                    n_train,
+                    n_test,
+                    n_features,
+                    feature_stats,
+                    train_snapshot,
+                    feature_histograms,
+                    category_counts
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s::jsonb, %s::jsonb)
+                """,
+                (
+                    run_id,
+                    str(model_version),
+                    metric_name,
+                    float(metric_value),
+                    int(n_train),
+                    int(n_test),
+                    int(n_features),
+                    json.dumps(feature_stats),
+                    train_snapshot,
+                    json.dumps(feature_histograms),
+                    json.dumps(category_counts),
+                ),
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb)
-            """,
-            (
-                run_id,
-                str(model_version),
-                metric_name,
-                float(metric_value),
-                int(n_train),
-                int(n_test),
-                int(n_features),
-                json.dumps(feature_stats),
-            ),
-        )
-
-        conn.commit()
-        cur.close()
-        conn.close()
+            cur.close()
 
         print("Metadados + feature_stats persistidos no Postgres.")
 
@@ -142,30 +687,50 @@ def log_training_metadata_to_db(
 
 
 # Pipeline principal
-def main():
+def main(force=False):
     metric_name = os.getenv("METRIC", "roc_auc")
     model_registry_name = os.getenv("MODEL_NAME", "bank-model")
 
     print(f"Usando métrica: {metric_name}")
     print(f"Registrando melhor modelo como: {model_registry_name}")
 
-    X_train, X_test, y_train, y_test = load_data()
+    models = candidate_models()
 
-    models = {
-        "log_reg": LogisticRegression(max_iter=500),
-        "rf": RandomForestClassifier(
-            n_estimators=200,
-            max_depth=10,
-            random_state=42,
-            n_jobs=-1,
-        ),
+    # Cache do estágio: mesmos dados processados + parâmetros + código
+    # reaproveitam o run/modelo registrado da execução anterior
+    params = {
+        "metric": metric_name,
+        "model_name": model_registry_name,
+        "models": {name: model.get_params() for name, model in models.items()},
+        "search": search_config(),
+        "search_spaces": search_spaces() if search_config() else None,
     }
+    key = stage_key("train", params, files=processed_inputs(), code=code_version(*CODE_FILES))
+    if not force:
+        cached = lookup("train", key)
+        if cached is not None and cached_run_available(cached, model_registry_name):
+            record("train", key, "hit")
+            print(f"\nCache hit (train, {key[:12]}): reaproveitando v{cached['model_version']}")
+            print(json.dumps(cached["best"], indent=2))
+            return cached["best"]
 
-    results = []
-    for name, model in models.items():
-        print(f"\nTreinando modelo: {name}")
-        res = train_and_log(name, model, X_train, y_train, X_test, y_test, metric_name)
-        results.append(res)
+    X_train, X_test, y_train, y_test = load_data()
+    encoding = load_encoding()
+
+    # Busca (opcional) troca os candidatos fixos pelos vencedores do halving;
+    # eles seguem o mesmo caminho de treino/registro abaixo
+    config = search_config()
+    if config is not None:
+        models = search_candidates(models, X_train, y_train, metric_name, config)
+
+    # Snapshot dos dados de treino: base para o retreino incremental e chave
+    # das linhas copiadas para training_rows enquanto os candidatos treinam
+    tags = snapshot_tags(X_train, y_train)
+    rows_copy = start_training_rows_copy(tags["train_fingerprint"], X_train, y_train)
+
+    results = train_candidates(
+        models, X_train, y_train, X_test, y_test, metric_name, encoding=encoding, tags=tags
+    )
 
     best = max(results, key=lambda r: r["metric"])
     print("\nMelhor modelo:", best)
@@ -185,11 +750,108 @@ def main():
         model_version=version_number,
         metric_name=metric_name,
         metric_value=best["metric"],
+        train_snapshot=tags["train_fingerprint"],
+    )
+    finish_training_rows_copy(rows_copy)
+    close_pool()
+
+    record(
+        "train",
+        key,
+        "force" if force else "miss",
+        outputs={"best": best, "model_version": str(version_number)},
     )
 
     print("\nModelo registrado no MLflow:")
     print(json.dumps(best, indent=2))
+    return best
+
+
+def main_incremental():
+    """
+    Retreino incremental: parte do modelo em Production e treina só nas
+    linhas adicionadas desde o snapshot dele. O custo do fit do RF cresce com
+    os dados novos, não com o histórico; a regressão logística é reajustada
+    no treino inteiro a partir dos coeficientes atuais (warm_start_model).
+    O resultado vira uma nova versão registrada (a promoção continua manual).
+    """
+    metric_name = os.getenv("METRIC", "roc_auc")
+    model_registry_name = os.getenv("MODEL_NAME", "bank-model")
+    extra_trees = int(os.getenv("INCREMENTAL_RF_TREES", "50"))
+
+    client = MlflowClient()
+    versions = client.get_latest_versions(model_registry_name, stages=["Production"])
+    if not versions:
+        raise ValueError(f"Nenhuma versão em Production para o modelo {model_registry_name}")
+    version = versions[0]
+    base_run = client.get_run(version.run_id)
+    print(f"Retreino incremental a partir de {model_registry_name} v{version.version}")
+
+    X_train, X_test, y_train, y_test = load_data()
+    X_new, y_new = new_rows_since(base_run.data.tags, X_train, y_train)
+    if len(X_new) == 0:
+        print("Nenhuma linha nova desde o snapshot do modelo; nada a fazer.")
+        return None
+    if len(np.unique(y_new)) < 2:
+        raise ValueError("As linhas novas precisam ter as duas classes para o retreino")
+    print(f"Linhas novas: {len(X_new)} (histórico: {len(X_train)})")
+
+    model = warm_start_model(load_cached_model(version.run_id), extra_trees)
+    X_fit, y_fit = incremental_fit_rows(model, X_train, y_train, X_new, y_new)
+    tags = {
+        **snapshot_tags(X_train, y_train),
+        "incremental_from_version": str(version.version),
+        "incremental_rows": str(len(X_new)),
+    }
+    rows_copy = start_training_rows_copy(tags["train_fingerprint"], X_train, y_train)
+    result = train_and_log(
+        f"{base_run.info.run_name}-incremental",
+        model,
+        X_fit,
+        y_fit,
+        X_test,
+        y_test,
+        metric_name,
+        encoding=load_encoding(),
+        tags=tags,
+    )
+    print(
+        f"{metric_name}: v{version.version}={base_run.data.metrics.get(metric_name)} -> "
+        f"{result['metric']}"
+    )
+
+    registered = mlflow.register_model(f"runs:/{result['run_id']}/model", model_registry_name)
+
+    # feature_stats do histórico inteiro: é a referência de drift do modelo
+    log_training_metadata_to_db(
+        X_train=X_train,
+        X_test=X_test,
+        y_train=y_train,
+        y_test=y_test,
+        run_id=result["run_id"],
+        model_version=registered.version,
+        metric_name=metric_name,
+        metric_value=result["metric"],
+        train_snapshot=tags["train_fingerprint"],
+    )
+    finish_training_rows_copy(rows_copy)
+    close_pool()
+
+    print("\nModelo incremental registrado no MLflow:")
+    print(json.dumps(result, indent=2))
+    return result
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Treino dos modelos do Bank Marketing")
+    parser.add_argument("--force", action="store_true", help="ignora o cache do estágio")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="continua o modelo em Production só com as linhas novas",
+    )
+    args = parser.parse_args()
+    if args.incremental:
+        main_incremental()
+    else:
+        main(force=args.force)
@@ -1,6 +1,12 @@
 # tests/conftest.py
 import sys
+from contextlib import contextmanager
 from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from benchmarks.data import make_raw_bank_frame
 
 # Garante que o diretório src/ esteja no sys.path
 ROOT = Path(__file__).resolve().parents[1]
@@ -8,3 +14,63 @@ SRC = ROOT / "src"
 
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+
+
+@pytest.fixture(autouse=True)
+def isolated_stage_cache(tmp_path, monkeypatch):
+    """
+    Manifesto do cache de estágios em diretório temporário (nunca no repo).
+    """
+    monkeypatch.setattr("src.stage_cache.STAGE_CACHE_DIR", tmp_path / "stage_cache")
+    return tmp_path / "stage_cache"
+
+
+@pytest.fixture
+def fake_pooled_conn(monkeypatch):
+    """
+    Substitui pooled_conn() de um módulo por um context manager que entrega
+    uma conexão fake. Uso: conn, cur = fake_pooled_conn("src.monitor_bank")
+    """
+
+    def _install(module_path):
+        fake_conn = MagicMock()
+        fake_cursor = MagicMock()
+        fake_conn.cursor.return_value = fake_cursor
+
+        @contextmanager
+        def _pooled_conn():
+            yield fake_conn
+
+        monkeypatch.setattr(f"{module_path}.pooled_conn", _pooled_conn)
+        return fake_conn, fake_cursor
+
+    return _install
+
+
+@pytest.fixture
+def postgres_conn():
+    """
+    Conexão com um Postgres de verdade (variáveis POSTGRES_* do ambiente,
+    ex.: make up + infra/.env). Sem banco disponível, o teste é pulado.
+    """
+    import psycopg2
+
+    from src.db import close_pool, connection_params
+
+    params = connection_params()
+    if not params["user"]:
+        pytest.skip("POSTGRES_USER não definido: sem Postgres para o teste")
+    try:
+        conn = psycopg2.connect(connect_timeout=2, **params)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres indisponível: {e}")
+
+    conn.autocommit = True
+    yield conn
+    conn.close()
+    close_pool()
+
+
+@pytest.fixture
+def raw_bank_df():
+    return make_raw_bank_frame()
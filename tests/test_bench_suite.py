@@ -0,0 +1,50 @@
+# tests/test_bench_suite.py
+import json
+
+from benchmarks.suite import compare, main, metric
+
+
+def make_results(**values):
+    units = {"rows_per_s": ("rows/s", "higher")}
+    metrics = {}
+    for name, value in values.items():
+        unit, better = units.get(name, ("ms", "lower"))
+        metrics[name] = metric(value, unit, better)
+    return {"metrics": metrics}
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = make_results(latency=10.0, rows_per_s=1000.0, load=5.0)
+    current = make_results(latency=12.5, rows_per_s=700.0, load=4.0)
+
+    rows = {row["metric"]: row for row in compare(baseline, current, threshold=0.2)}
+
+    assert rows["latency"]["regression"] is True  # +25% de latência
+    assert rows["rows_per_s"]["regression"] is True  # -30% de vazão
+    assert rows["load"]["regression"] is False  # ficou mais rápido
+    assert abs(rows["latency"]["change"] - 0.25) < 1e-9
+
+
+def test_compare_ignores_metrics_missing_on_one_side():
+    rows = compare(make_results(a=1.0, b=2.0), make_results(b=2.1, c=3.0), threshold=0.2)
+    assert [row["metric"] for row in rows] == ["b"]
+
+
+def test_compare_command_exit_code(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    ok = tmp_path / "ok.json"
+    slow = tmp_path / "slow.json"
+    baseline.write_text(json.dumps(make_results(latency=10.0)))
+    ok.write_text(json.dumps(make_results(latency=10.5)))
+    slow.write_text(json.dumps(make_results(latency=20.0)))
+
+    assert main(["compare", str(ok), "--baseline", str(baseline)]) == 0
+    assert main(["compare", str(slow), "--baseline", str(baseline), "--threshold", "0.5"]) == 1
+
+
+def test_compare_without_baseline_points_to_bench_baseline(tmp_path, capsys):
+    current = tmp_path / "current.json"
+    current.write_text(json.dumps(make_results(latency=10.0)))
+
+    assert main(["compare", str(current), "--baseline", str(tmp_path / "missing.json")]) == 2
+    assert "make bench-baseline" in capsys.readouterr().out
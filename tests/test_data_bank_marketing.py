@@ -1,7 +1,14 @@
 # tests/test_data_bank_marketing.py
+import json
+
 import pandas as pd
+import pytest
 
 import src.data_bank_marketing as dbm
+from benchmarks.data import make_raw_bank_frame
+from src.features import apply_dtype_plan, dtype_plan, load_registry
+from src.processed_data import read_frame
+from src.stage_cache import load_manifest
 
 
 def test_main_creates_processed_files(tmp_path, monkeypatch):
@@ -48,10 +55,10 @@ def test_main_creates_processed_files(tmp_path, monkeypatch):
     dbm.main(test_size=0.2, random_state=42)
 
     # ----- 4) Verifica se os arquivos foram criados -----
-    x_train_path = processed_dir / "X_train.csv"
-    x_test_path = processed_dir / "X_test.csv"
-    y_train_path = processed_dir / "y_train.csv"
-    y_test_path = processed_dir / "y_test.csv"
+    x_train_path = processed_dir / "X_train.feather"
+    x_test_path = processed_dir / "X_test.feather"
+    y_train_path = processed_dir / "y_train.feather"
+    y_test_path = processed_dir / "y_test.feather"
 
     assert x_train_path.exists()
     assert x_test_path.exists()
@@ -59,10 +66,10 @@ def test_main_creates_processed_files(tmp_path, monkeypatch):
     assert y_test_path.exists()
 
     # ----- 5) Verificações básicas de consistência -----
-    X_train = pd.read_csv(x_train_path)
-    X_test = pd.read_csv(x_test_path)
-    y_train = pd.read_csv(y_train_path).iloc[:, 0]
-    y_test = pd.read_csv(y_test_path).iloc[:, 0]
+    X_train = pd.read_feather(x_train_path)
+    X_test = pd.read_feather(x_test_path)
+    y_train = pd.read_feather(y_train_path).iloc[:, 0]
+    y_test = pd.read_feather(y_test_path).iloc[:, 0]
 
     # Mesmas colunas em X_train e X_test (depois do get_dummies)
     assert list(X_train.columns) == list(X_test.columns)
@@ -75,3 +82,206 @@ def test_main_creates_processed_files(tmp_path, monkeypatch):
     # Target só com 0 e 1
     assert set(y_train.unique()).issubset({0, 1})
     assert set(y_test.unique()).issubset({0, 1})
+
+
+def test_main_persists_vocabulary_matching_get_dummies(tmp_path, monkeypatch, raw_bank_df):
+    """
+    O preparo dos dados salva encoding.json (categoria → índice de coluna) e
+    as colunas processadas são exatamente as do get_dummies(drop_first=True).
+    """
+    raw_csv_path = tmp_path / "bank-full.csv"
+    raw_bank_df.to_csv(raw_csv_path, sep=";", index=False)
+
+    processed_dir = tmp_path / "processed"
+    processed_dir.mkdir()
+    monkeypatch.setattr(dbm, "RAW_PATH", raw_csv_path)
+    monkeypatch.setattr(dbm, "PROCESSED_DIR", processed_dir)
+
+    dbm.main(test_size=0.2, random_state=42)
+
+    vocabulary = json.loads((processed_dir / "encoding.json").read_text())
+    expected_cols = list(pd.get_dummies(raw_bank_df.drop(columns=["y"]), drop_first=True).columns)
+
+    assert vocabulary["columns"] == expected_cols
+    assert len(vocabulary["columns"]) == 42
+    assert list(pd.read_feather(processed_dir / "X_train.feather").columns) == expected_cols
+
+
+def test_main_keeps_dtypes_and_optional_csv_export(tmp_path, monkeypatch, raw_bank_df):
+    """
+    Os dummies continuam bool depois de salvar/ler (sem ensure_boolean_columns)
+    e export_csv grava também os CSVs para debug, com o mesmo conteúdo.
+    """
+    raw_csv_path = tmp_path / "bank-full.csv"
+    raw_bank_df.to_csv(raw_csv_path, sep=";", index=False)
+
+    processed_dir = tmp_path / "processed"
+    processed_dir.mkdir()
+    monkeypatch.setattr(dbm, "RAW_PATH", raw_csv_path)
+    monkeypatch.setattr(dbm, "PROCESSED_DIR", processed_dir)
+
+    dbm.main(test_size=0.2, random_state=42, export_csv=True)
+
+    X_train = read_frame(processed_dir, "X_train")
+    assert X_train["job_student"].dtype == bool
+    # Plano de tipos do feature_registry.yaml: numéricas em int32
+    assert X_train["age"].dtype == "int32"
+
+    # O CSV não guarda o int32 (volta como int64), mas o conteúdo é o mesmo
+    from_csv = pd.read_csv(processed_dir / "X_train.csv")
+    pd.testing.assert_frame_equal(from_csv, X_train, check_dtype=False)
+
+
+def test_streaming_mode_matches_in_memory_columns_and_split(tmp_path, monkeypatch, raw_bank_df):
+    """
+    O modo streaming (chunks pequenos, com categorias faltando em vários
+    chunks) gera as mesmas 42 colunas, as mesmas linhas e um split
+    estratificado com os mesmos tamanhos do modo em memória.
+    """
+    raw_csv_path = tmp_path / "bank-full.csv"
+    raw_bank_df.to_csv(raw_csv_path, sep=";", index=False)
+    monkeypatch.setattr(dbm, "RAW_PATH", raw_csv_path)
+
+    in_memory_dir = tmp_path / "in_memory"
+    streaming_dir = tmp_path / "streaming"
+    in_memory_dir.mkdir()
+    streaming_dir.mkdir()
+
+    monkeypatch.setattr(dbm, "PROCESSED_DIR", in_memory_dir)
+    dbm.main(test_size=0.2, random_state=42, chunksize=0)
+    monkeypatch.setattr(dbm, "PROCESSED_DIR", streaming_dir)
+    dbm.main(test_size=0.2, random_state=42, chunksize=7)
+
+    for name in ("X_train", "X_test"):
+        expected = read_frame(in_memory_dir, name)
+        got = read_frame(streaming_dir, name)
+        assert list(got.columns) == list(expected.columns)
+        assert (got.dtypes == expected.dtypes).all()
+        assert abs(len(got) - len(expected)) <= 1
+
+    assert json.loads((streaming_dir / "encoding.json").read_text()) == json.loads(
+        (in_memory_dir / "encoding.json").read_text()
+    )
+
+    # Todas as linhas aparecem exatamente uma vez
+    X_all = pd.concat([read_frame(streaming_dir, "X_train"), read_frame(streaming_dir, "X_test")])
+    expected_all = apply_dtype_plan(
+        pd.get_dummies(raw_bank_df.drop(columns=["y"]), drop_first=True),
+        dtype_plan(load_registry()),
+    )
+    pd.testing.assert_frame_equal(
+        X_all.sort_values(list(X_all.columns)).reset_index(drop=True),
+        expected_all.sort_values(list(X_all.columns)).reset_index(drop=True),
+    )
+
+    # Proporção das classes preservada no teste
+    y = raw_bank_df["y"].map({"no": 0, "yes": 1})
+    y_test = read_frame(streaming_dir, "y_test").iloc[:, 0]
+    assert abs(y_test.mean() - y.mean()) < 0.01
+
+
+def test_stable_split_is_identical_in_streaming_and_in_memory(tmp_path, monkeypatch, raw_bank_df):
+    """
+    Com split="stable" os dois modos geram exatamente os mesmos arquivos
+    (mesmas linhas, na mesma ordem).
+    """
+    raw_csv_path = tmp_path / "bank-full.csv"
+    raw_bank_df.to_csv(raw_csv_path, sep=";", index=False)
+    monkeypatch.setattr(dbm, "RAW_PATH", raw_csv_path)
+
+    dirs = {0: tmp_path / "in_memory", 7: tmp_path / "streaming"}
+    for chunksize, directory in dirs.items():
+        directory.mkdir()
+        monkeypatch.setattr(dbm, "PROCESSED_DIR", directory)
+        dbm.main(test_size=0.2, random_state=42, chunksize=chunksize, split="stable")
+
+    for name in dbm.SPLITS:
+        pd.testing.assert_frame_equal(read_frame(dirs[7], name), read_frame(dirs[0], name))
+
+
+@pytest.mark.parametrize("chunksize", [0, 100])
+def test_appended_raw_rows_keep_train_prefix(tmp_path, monkeypatch, chunksize):
+    """
+    Com split="stable", linhas novas no fim do CSV bruto só acrescentam
+    linhas ao fim do X_train/y_train: o snapshot do modelo anterior continua
+    valendo e o retreino incremental acha exatamente as linhas novas.
+    """
+    from src.train_bank_marketing import new_rows_since, snapshot_tags
+
+    raw = make_raw_bank_frame(n=400)
+    raw_csv_path = tmp_path / "bank-full.csv"
+    monkeypatch.setattr(dbm, "RAW_PATH", raw_csv_path)
+    monkeypatch.setattr(dbm, "PROCESSED_DIR", tmp_path)
+
+    raw.iloc[:300].to_csv(raw_csv_path, sep=";", index=False)
+    dbm.main(test_size=0.2, random_state=42, chunksize=chunksize, split="stable")
+    X_old = read_frame(tmp_path, "X_train")
+    snapshot = snapshot_tags(X_old, read_frame(tmp_path, "y_train").iloc[:, 0].to_numpy())
+    n_test_old = len(read_frame(tmp_path, "X_test"))
+
+    raw.to_csv(raw_csv_path, sep=";", index=False)
+    dbm.main(test_size=0.2, random_state=42, chunksize=chunksize, split="stable")
+    X_train = read_frame(tmp_path, "X_train")
+    y_train = read_frame(tmp_path, "y_train").iloc[:, 0].to_numpy()
+
+    X_new, y_new = new_rows_since(snapshot, X_train, y_train)
+    assert len(X_new) + len(read_frame(tmp_path, "X_test")) - n_test_old == 100
+    assert len(X_train) == len(X_old) + len(X_new)
+
+
+def test_stable_split_is_stratified_and_chunk_independent():
+    """
+    A proporção de teste é exata por classe (a menos de 1 linha) e dividir
+    y em blocos não muda a máscara.
+    """
+    y = make_raw_bank_frame(n=1000)["y"].map(dbm.TARGET_MAP).to_numpy()
+
+    whole = dbm.StableSplit(0.2, 42).assign(y)
+    split = dbm.StableSplit(0.2, 42)
+    chunked = [split.assign(y[i : i + 37]) for i in range(0, len(y), 37)]
+
+    assert (pd.Series(whole) == pd.Series([m for c in chunked for m in c])).all()
+    for cls in (0, 1):
+        assert abs(whole[y == cls].sum() - 0.2 * (y == cls).sum()) <= 1
+
+
+def test_main_is_cached_by_input_hash(tmp_path, monkeypatch, raw_bank_df):
+    """
+    Com as mesmas entradas a segunda execução é um no-op; --force, outro
+    parâmetro ou um arquivo processado alterado reprocessam.
+    """
+    raw_csv_path = tmp_path / "bank-full.csv"
+    raw_bank_df.to_csv(raw_csv_path, sep=";", index=False)
+    processed_dir = tmp_path / "processed"
+    processed_dir.mkdir()
+    monkeypatch.setattr(dbm, "RAW_PATH", raw_csv_path)
+    monkeypatch.setattr(dbm, "PROCESSED_DIR", processed_dir)
+
+    runs = []
+    original = dbm.run_in_memory
+
+    def counting_run(*args):
+        runs.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(dbm, "run_in_memory", counting_run)
+
+    dbm.main(chunksize=0)
+    dbm.main(chunksize=0)
+    assert len(runs) == 1
+
+    dbm.main(chunksize=0, force=True)
+    assert len(runs) == 2
+
+    dbm.main(test_size=0.3, chunksize=0)
+    assert len(runs) == 3
+
+    dbm.main(test_size=0.3, chunksize=0, split="stable")
+    assert len(runs) == 4
+
+    (processed_dir / "y_test.feather").write_bytes(b"corrompido")
+    dbm.main(test_size=0.3, chunksize=0, split="stable")
+    assert len(runs) == 5
+
+    events = [e["event"] for e in load_manifest()["history"]]
+    assert events == ["miss", "hit", "force", "miss", "miss", "miss"]
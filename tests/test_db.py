@@ -32,18 +32,78 @@ def test_get_conn_uses_env_vars(monkeypatch):
     )
 
 
-def test_save_inference_row_inserts_and_closes(monkeypatch):
+def _fake_pool():
+    fake_pool = MagicMock()
+    fake_conn = MagicMock()
+    fake_cursor = MagicMock()
+    fake_pool.getconn.return_value = fake_conn
+    fake_conn.cursor.return_value = fake_cursor
+    return fake_pool, fake_conn, fake_cursor
+
+
+def test_get_pool_uses_env_sizes_and_is_reused(monkeypatch):
+    """
+    Garante que get_pool cria um único pool com min/max vindos do ambiente
+    e os mesmos parâmetros de conexão de get_conn.
+    """
+    monkeypatch.setenv("POSTGRES_HOST", "fake-host")
+    monkeypatch.setenv("POSTGRES_POOL_MIN", "2")
+    monkeypatch.setenv("POSTGRES_POOL_MAX", "7")
+    monkeypatch.setattr(db, "_pool", None)
+
+    fake_pool_cls = MagicMock()
+    fake_pool_cls.return_value.closed = False
+
+    with patch("src.db.ThreadedConnectionPool", fake_pool_cls):
+        first = db.get_pool()
+        second = db.get_pool()
+
+    assert first is second
+    fake_pool_cls.assert_called_once()
+    kwargs = fake_pool_cls.call_args.kwargs
+    assert kwargs["minconn"] == 2
+    assert kwargs["maxconn"] == 7
+    assert kwargs["host"] == "fake-host"
+
+    monkeypatch.setattr(db, "_pool", None)
+
+
+def test_pooled_conn_commits_and_returns_conn():
+    fake_pool, fake_conn, _ = _fake_pool()
+
+    with patch("src.db.get_pool", return_value=fake_pool):
+        with db.pooled_conn() as conn:
+            assert conn is fake_conn
+
+    fake_conn.commit.assert_called_once()
+    fake_conn.rollback.assert_not_called()
+    fake_pool.putconn.assert_called_once_with(fake_conn)
+
+
+def test_pooled_conn_rolls_back_on_error():
+    fake_pool, fake_conn, _ = _fake_pool()
+
+    with patch("src.db.get_pool", return_value=fake_pool):
+        try:
+            with db.pooled_conn():
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+
+    fake_conn.commit.assert_not_called()
+    fake_conn.rollback.assert_called_once()
+    fake_pool.putconn.assert_called_once_with(fake_conn)
+
+
+def test_save_inference_row_inserts_via_pool(monkeypatch):
     """
     Garante que save_inference_row:
       - chama INSERT na tabela inference_logs
-      - commita e fecha cursor/conn
+      - usa uma conexão do pool, commita e a devolve
     """
-    fake_conn = MagicMock()
-    fake_cursor = MagicMock()
-    fake_conn.cursor.return_value = fake_cursor
+    fake_pool, fake_conn, fake_cursor = _fake_pool()
 
-    # get_conn vai devolver nossa conexão fake
-    with patch("src.db.get_conn", return_value=fake_conn):
+    with patch("src.db.get_pool", return_value=fake_pool):
         db.save_inference_row(
             run_id="run-123",
             model_version="1",
@@ -64,7 +124,131 @@ def test_save_inference_row_inserts_and_closes(monkeypatch):
     assert json.loads(params[2]) == {"age": 40, "balance": 1000}
     assert params[3] == 0.73
 
-    # Verifica commit e fechamento
+    # Verifica commit, fechamento do cursor e devolução ao pool
+    fake_conn.commit.assert_called_once()
+    fake_cursor.close.assert_called_once()
+    fake_pool.putconn.assert_called_once_with(fake_conn)
+    fake_conn.close.assert_not_called()
+
+
+def test_save_inference_rows_uses_single_insert(monkeypatch):
+    """
+    Garante que save_inference_rows:
+      - grava todas as linhas com um único execute_values (uma página só)
+      - commita uma única vez e devolve a conexão ao pool
+    """
+    fake_pool, fake_conn, fake_cursor = _fake_pool()
+    fake_execute_values = MagicMock()
+
+    with (
+        patch("src.db.get_pool", return_value=fake_pool),
+        patch("src.db.execute_values", fake_execute_values),
+    ):
+        db.save_inference_rows(
+            run_id="run-123",
+            model_version="1",
+            rows=[{"age": 40}, {"age": 50}],
+            predictions=[0.1, 0.9],
+        )
+
+    fake_execute_values.assert_called_once()
+    _, sql, values = fake_execute_values.call_args[0]
+
+    assert "INSERT INTO inference_logs" in sql
+    assert len(values) == 2
+    assert values[0][:2] == ("run-123", "1")
+    assert json.loads(values[1][2]) == {"age": 50}
+    assert values[1][3] == 0.9
+    assert fake_execute_values.call_args.kwargs["page_size"] >= len(values)
+
     fake_conn.commit.assert_called_once()
     fake_cursor.close.assert_called_once()
-    fake_conn.close.assert_called_once()
+    fake_pool.putconn.assert_called_once_with(fake_conn)
+
+
+def test_save_training_rows_uses_single_insert():
+    fake_pool, fake_conn, _ = _fake_pool()
+    fake_execute_values = MagicMock()
+
+    with (
+        patch("src.db.get_pool", return_value=fake_pool),
+        patch("src.db.execute_values", fake_execute_values),
+    ):
+        db.save_training_rows(
+            run_id="run-123",
+            model_version="1",
+            rows=[{"age": 40}, {"age": 50}, {"age": 60}],
+            targets=[0, 1, 0],
+        )
+
+    fake_execute_values.assert_called_once()
+    _, sql, values = fake_execute_values.call_args[0]
+    assert "INSERT INTO training_data" in sql
+    assert [json.loads(v[3]) for v in values] == [0, 1, 0]
+    fake_conn.commit.assert_called_once()
+
+
+def test_copy_training_rows_streams_chunks_with_copy():
+    """
+    X/y vão para training_rows via COPY, em chunks, dentro de uma única
+    transação (DELETE de uma cópia parcial antes).
+    """
+    import csv
+    import io
+
+    import numpy as np
+    import pandas as pd
+
+    fake_pool, fake_conn, fake_cursor = _fake_pool()
+    fake_cursor.fetchone.return_value = (2,)
+    buffers = []
+    fake_cursor.copy_expert.side_effect = lambda sql, buf: buffers.append(buf.getvalue())
+
+    X = pd.DataFrame({"age": [30, 40, 50, 60, 70], "job_admin": [True, False, True, False, True]})
+    y = np.array([0, 1, 0, 1, 1])
+
+    with patch("src.db.get_pool", return_value=fake_pool):
+        written = db.copy_training_rows("SNAP", X, y, chunk_size=2)
+
+    assert written == 5
+    assert len(buffers) == 3
+    sql = fake_cursor.copy_expert.call_args[0][0]
+    assert "COPY training_rows" in sql
+    executed = [c[0][0] for c in fake_cursor.execute.call_args_list]
+    assert any("DELETE FROM training_rows" in q for q in executed)
+
+    rows = [row for buf in buffers for row in csv.reader(io.StringIO(buf))]
+    assert [r[0] for r in rows] == ["SNAP"] * 5
+    assert [int(r[1]) for r in rows] == [0, 1, 2, 3, 4]
+    assert json.loads(rows[1][2]) == {"age": 40, "job_admin": False}
+    assert [int(r[3]) for r in rows] == [0, 1, 0, 1, 1]
+    fake_conn.commit.assert_called_once()
+
+
+def test_copy_training_rows_is_idempotent_per_snapshot():
+    import numpy as np
+    import pandas as pd
+
+    fake_pool, fake_conn, fake_cursor = _fake_pool()
+    fake_cursor.fetchone.return_value = (3,)
+
+    X = pd.DataFrame({"age": [30, 40, 50]})
+    with patch("src.db.get_pool", return_value=fake_pool):
+        written = db.copy_training_rows("SNAP", X, np.array([0, 1, 0]))
+
+    assert written == 0
+    fake_cursor.copy_expert.assert_not_called()
+    executed = [c[0][0] for c in fake_cursor.execute.call_args_list]
+    assert not any("DELETE" in q for q in executed)
+
+
+def test_save_inference_rows_empty_is_noop():
+    """
+    Lista vazia não deve nem tocar no pool.
+    """
+    fake_get_pool = MagicMock()
+
+    with patch("src.db.get_pool", fake_get_pool):
+        db.save_inference_rows("run-123", "1", rows=[], predictions=[])
+
+    fake_get_pool.assert_not_called()
@@ -0,0 +1,141 @@
+# tests/test_drift_engine.py
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.drift_engine import (
+    bin_counts,
+    distribution_drift,
+    edge_matrix,
+    fit_group_counts,
+    fit_histograms,
+    group_counts,
+    group_drift,
+)
+
+
+def test_bin_counts_matches_searchsorted_per_feature():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 20, size=(500, 3)).astype(float)
+    values[::7, 1] = np.nan
+    edges_list = [np.array([5.0, 10.0, 15.0]), np.array([2.0]), np.array([])]
+
+    counts = bin_counts(values, edge_matrix(edges_list))
+
+    assert counts.shape == (3, 4)
+    for i, edges in enumerate(edges_list):
+        col = values[:, i][~np.isnan(values[:, i])]
+        expected = np.bincount(np.searchsorted(edges, col, side="right"), minlength=4)
+        assert counts[i].tolist() == expected.tolist()
+
+
+def test_fit_histograms_skips_bool_and_dedupes_edges():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(
+        {
+            "age": rng.integers(18, 90, 1_000).astype("int32"),
+            "pdays": np.where(rng.random(1_000) < 0.8, -1, rng.integers(1, 400, 1_000)),
+            "loan_yes": rng.random(1_000) < 0.3,
+        }
+    )
+
+    hist = fit_histograms(X, bins=10)
+
+    assert set(hist) == {"age", "pdays"}
+    assert len(hist["age"]["counts"]) == len(hist["age"]["edges"]) + 1
+    assert sum(hist["age"]["counts"]) == 1_000
+    # 80% em -1: os quantis repetidos viram uma borda só
+    assert len(hist["pdays"]["edges"]) < 9
+    assert hist["pdays"]["edges"] == sorted(set(hist["pdays"]["edges"]))
+    # Cabe no JSONB (sem inf/NaN)
+    json.loads(json.dumps(hist, allow_nan=False))
+
+
+def test_distribution_drift_flags_shape_change_only_where_it_happened():
+    rng = np.random.default_rng(2)
+    train = pd.DataFrame({"a": rng.normal(0, 1, 5_000), "b": rng.exponential(1, 5_000)})
+    hist = fit_histograms(train)
+
+    same = pd.DataFrame({"a": rng.normal(0, 1, 2_000), "b": rng.exponential(1, 2_000)})
+    shifted = pd.DataFrame({"a": rng.normal(0, 1, 2_000), "b": rng.exponential(3, 2_000)})
+
+    baseline = distribution_drift(hist, same)
+    drifted = distribution_drift(hist, shifted)
+
+    assert baseline["a"]["psi"] < 0.05 and baseline["b"]["psi"] < 0.05
+    assert drifted["a"]["psi"] < 0.05
+    assert drifted["b"]["psi"] > 0.2
+    assert drifted["b"]["ks"] > 0.2
+    assert drifted["b"]["count"] == 2_000
+
+
+def test_distribution_drift_ks_matches_cdf_at_edges():
+    hist = {"x": {"edges": [1.0, 2.0], "counts": [5, 5, 0]}}
+    df = pd.DataFrame({"x": [0.0, 1.5, 2.5, 2.5], "other": ["a", "b", "c", "d"]})
+
+    result = distribution_drift(hist, df)
+
+    # CDF treino: 0.5, 1.0 ; inferência: 0.25, 0.5
+    assert result["x"]["ks"] == pytest.approx(0.5)
+    assert result["x"]["count"] == 4
+    assert distribution_drift(hist, pd.DataFrame({"y": [1]})) == {}
+
+
+GROUPS = {"marital": ["marital_married", "marital_single"], "loan": ["loan_yes"]}
+
+
+def test_group_counts_rebuilds_base_category_and_skips_missing():
+    df = pd.DataFrame(
+        {
+            "marital_married": [True, False, False, True, np.nan],
+            "marital_single": [False, True, False, False, 0.0],
+            "loan_yes": [1, 0, 0, 0, 1],
+        }
+    )
+
+    names, counts, sizes = group_counts(df, {**GROUPS, "job": ["job_student"]})
+
+    # job não está em df; a última linha não conta para marital (dummy ausente)
+    assert names == ["marital", "loan"]
+    assert sizes.tolist() == [2, 1]
+    assert counts.tolist() == [[1, 2, 1], [3, 2, 0]]
+
+    reference = fit_group_counts(df, GROUPS)
+    assert reference["marital"] == {
+        "columns": ["marital_married", "marital_single"],
+        "counts": [1, 2, 1],
+    }
+    assert reference["loan"]["counts"] == [3, 2]
+
+
+def test_group_drift_js_chi2_and_shifted_categories():
+    rng = np.random.default_rng(3)
+
+    def sample(p_marital, p_loan, n):
+        marital = rng.choice(3, n, p=p_marital)
+        return pd.DataFrame(
+            {
+                "marital_married": marital == 1,
+                "marital_single": marital == 2,
+                "loan_yes": rng.random(n) < p_loan,
+            }
+        )
+
+    reference = fit_group_counts(sample([0.2, 0.6, 0.2], 0.2, 10_000), GROUPS)
+    drift = group_drift(reference, sample([0.1, 0.3, 0.6], 0.2, 2_000))
+
+    assert drift["marital"]["js"] > 0.1
+    assert drift["marital"]["p_value"] < 1e-6
+    shifted = [category for category, _, _ in drift["marital"]["shifted"]]
+    assert shifted == ["marital_single", "marital_married", "(base)"]
+
+    assert drift["loan"]["js"] < 0.05
+    assert drift["loan"]["shifted"] == []
+    assert drift["loan"]["count"] == 2_000
+
+    # Mesma distribuição: JS ~ 0 e qui-quadrado não rejeita
+    same = group_drift(reference, sample([0.2, 0.6, 0.2], 0.2, 2_000))
+    assert same["marital"]["js"] < 0.05
+    assert same["marital"]["p_value"] > 1e-3
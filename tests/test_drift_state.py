@@ -0,0 +1,59 @@
+# tests/test_drift_state.py
+import json
+
+import numpy as np
+import pytest
+
+from src.drift_state import DriftState, RunningStats
+
+
+def test_running_stats_merge_matches_full_pass():
+    """
+    Acumular em lotes de tamanhos variados dá o mesmo resultado que
+    calcular sobre a série inteira de uma vez.
+    """
+    rng = np.random.default_rng(0)
+    values = rng.normal(loc=40, scale=12, size=1_000)
+
+    stats = RunningStats()
+    for chunk in np.array_split(values, [1, 7, 300, 301, 950]):
+        stats.update(chunk)
+
+    assert stats.count == 1_000
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std == pytest.approx(values.std(ddof=1))
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+
+
+def test_running_stats_ignores_nan_and_serializes():
+    stats = RunningStats().update([1.0, np.nan, 3.0])
+    assert stats.count == 2
+    assert stats.mean == 2.0
+
+    restored = RunningStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert restored.to_dict() == stats.to_dict()
+    assert np.isnan(RunningStats().update([5.0]).std)
+
+
+def test_drift_state_update_advances_watermark():
+    state = DriftState("RUN")
+    state.update(
+        ids=[10, 11],
+        inputs=[{"age": 30, "job": "admin."}, {"age": 50, "job": "services"}],
+        preds=[0.2, 0.4],
+        feature_keys=["age", "job", "balance"],
+    )
+    state.update(ids=[15], inputs=[{"age": 40}], preds=[0.6], feature_keys=["age", "job"])
+
+    assert state.watermark == 15
+    summary = state.feature_summary()
+    # Features categóricas (não numéricas) e ausentes ficam de fora
+    assert set(summary) == {"age"}
+    assert summary["age"]["mean"] == pytest.approx(40.0)
+    assert summary["age"]["count"] == 3
+    assert state.prediction.mean == pytest.approx(0.4)
+
+    restored = DriftState.from_dict("RUN", json.loads(json.dumps(state.to_dict())))
+    assert restored.watermark == 15
+    assert restored.feature_summary() == summary
@@ -0,0 +1,201 @@
+# tests/test_features.py
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from src.features import (
+    FeatureEncoder,
+    RawRecordEncoder,
+    apply_dtype_plan,
+    boolean_columns,
+    build_vocabulary,
+    categorical_groups,
+    dtype_plan,
+    encode_frame,
+    feature_columns,
+    load_registry,
+    memory_report,
+    numeric_columns,
+)
+
+REGISTRY = load_registry()
+
+
+def make_frame(n=200, seed=0):
+    """
+    DataFrame no formato de X_train (numéricas + booleanas), em ordem embaralhada
+    para garantir que o encoder respeita a ordem do modelo e não a do registry.
+    """
+    rng = np.random.default_rng(seed)
+    data = {col: rng.integers(0, 100, n) for col in numeric_columns(REGISTRY)}
+    for col in boolean_columns(REGISTRY):
+        data[col] = rng.random(n) < 0.3
+    cols = feature_columns(REGISTRY)
+    rng.shuffle(cols)
+    return pd.DataFrame(data)[cols]
+
+
+def test_registry_has_42_features():
+    assert len(feature_columns(REGISTRY)) == REGISTRY["n_features"] == 42
+    assert len(boolean_columns(REGISTRY)) == 35
+
+    groups = categorical_groups(REGISTRY)
+    assert list(groups) == ["job", "marital", "education", "contact", "month", "poutcome"]
+    assert sum(len(cols) for cols in groups.values()) == 32
+
+
+def test_dtype_plan_from_registry():
+    plan = dtype_plan(REGISTRY)
+
+    assert set(plan) == set(feature_columns(REGISTRY))
+    assert {plan[c] for c in numeric_columns(REGISTRY)} == {"int32"}
+    assert {plan[c] for c in boolean_columns(REGISTRY)} == {"bool"}
+
+
+def test_apply_dtype_plan_shrinks_csv_roundtrip_matrix_and_keeps_metrics():
+    """
+    Matriz como sai de um CSV (tudo int64) vs plano compacto: vários x menor e
+    métricas idênticas nos dois modelos do treino.
+    """
+    X = make_frame(n=2000).astype("int64")
+    y = ((X["duration"] > 50) ^ (X["housing_yes"] == 1)).astype(int)
+    compact = apply_dtype_plan(X, dtype_plan(REGISTRY))
+
+    assert compact["age"].dtype == np.int32
+    assert compact["job_student"].dtype == bool
+    assert memory_report(X) / memory_report(compact) > 5
+
+    for model in (
+        LogisticRegression(max_iter=300),
+        RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+    ):
+        p_wide = model.fit(X, y).predict_proba(X)[:, 1]
+        p_compact = model.fit(compact, y).predict_proba(compact)[:, 1]
+        np.testing.assert_allclose(p_compact, p_wide)
+
+
+def test_apply_dtype_plan_rejects_overflow():
+    X = pd.DataFrame({"balance": [0, 3_000_000_000], "other": [1.5, 2.5]})
+
+    with pytest.raises(ValueError, match="balance"):
+        apply_dtype_plan(X, {"balance": "int32"})
+
+    # Colunas fora do plano não mudam
+    assert apply_dtype_plan(X, {})["other"].dtype == np.float64
+
+
+@pytest.mark.filterwarnings("ignore:X does not have valid feature names")
+@pytest.mark.parametrize(
+    "model",
+    [
+        LogisticRegression(max_iter=200),
+        RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0),
+    ],
+)
+def test_encoder_gives_identical_predictions(model):
+    """
+    As predições via encoder (array NumPy) devem ser idênticas às do caminho
+    antigo (DataFrame de 1 linha com colunas booleanas).
+    """
+    X = make_frame()
+    y = (X["age"] > 50).astype(int)
+    model.fit(X, y)
+
+    encoder = FeatureEncoder.for_model(model, REGISTRY)
+    assert list(encoder.columns) == list(X.columns)
+
+    records = X.head(25).to_dict(orient="records")
+    # Cliente mandando 0/1 em vez de bool também deve funcionar
+    records[0] = {k: int(v) if isinstance(v, bool) else v for k, v in records[0].items()}
+
+    for record in records:
+        expected = model.predict_proba(pd.DataFrame([record])[list(X.columns)].astype(X.dtypes))
+        got = model.predict_proba(encoder.encode(record))
+        np.testing.assert_array_equal(got, expected)
+
+    batch = model.predict_proba(encoder.encode_many(records))
+    np.testing.assert_array_equal(batch, model.predict_proba(X.head(25)))
+
+
+def test_encode_layout_and_missing_column():
+    encoder = FeatureEncoder.from_registry(REGISTRY)
+    record = {col: 0 for col in encoder.columns}
+    record["age"] = 33
+    record["job_student"] = True
+
+    row = encoder.encode(record)
+    assert row.shape == (1, 42)
+    assert row.dtype == np.float64
+    assert row.flags["C_CONTIGUOUS"]
+    assert row[0, encoder.columns.index("job_student")] == 1.0
+
+    del record["balance"]
+    assert encoder.missing(record) == ["balance"]
+    with pytest.raises(KeyError):
+        encoder.encode(record)
+
+
+def test_to_record_types():
+    encoder = FeatureEncoder.from_registry(REGISTRY)
+    record = {col: 0 for col in encoder.columns}
+    record["age"] = 41
+    record["loan_yes"] = 1
+
+    decoded = encoder.to_record(encoder.encode(record)[0])
+    assert decoded["age"] == 41 and isinstance(decoded["age"], int)
+    assert decoded["loan_yes"] is True
+    assert decoded["month_may"] is False
+
+
+def test_model_columns_must_match_registry():
+    with pytest.raises(ValueError):
+        FeatureEncoder.from_registry(REGISTRY, columns=["age", "balance"])
+
+
+def test_vocabulary_matches_get_dummies(raw_bank_df):
+    """
+    O encoding via vocabulário deve ser idêntico ao pd.get_dummies(drop_first=True)
+    (mesmas colunas, mesma ordem, mesmos dtypes e valores) e bater com o registry.
+    """
+    X_raw = raw_bank_df.drop(columns=["y"])
+
+    vocabulary = build_vocabulary(X_raw)
+    encoded = encode_frame(X_raw, vocabulary)
+    expected = pd.get_dummies(X_raw, drop_first=True)
+
+    pd.testing.assert_frame_equal(encoded, expected)
+    assert set(vocabulary["columns"]) == set(feature_columns(REGISTRY))
+    assert vocabulary["categorical"]["job"]["admin."] is None  # categoria de referência
+
+
+def test_raw_record_encoder_matches_training_vectors(raw_bank_df):
+    """
+    Treino (encode_frame) e serving (RawRecordEncoder) geram vetores idênticos.
+    """
+    X_raw = raw_bank_df.drop(columns=["y"])
+    vocabulary = json.loads(json.dumps(build_vocabulary(X_raw)))  # ida e volta em JSON
+    expected = encode_frame(X_raw, vocabulary).to_numpy(dtype=np.float64)
+
+    raw = RawRecordEncoder(vocabulary)
+    records = X_raw.to_dict(orient="records")
+
+    np.testing.assert_array_equal(raw.encode_many(records), expected)
+    np.testing.assert_array_equal(raw.encode(records[3]), expected[3:4])
+
+
+def test_raw_record_encoder_errors(raw_bank_df):
+    raw = RawRecordEncoder(build_vocabulary(raw_bank_df.drop(columns=["y"])))
+    record = raw_bank_df.drop(columns=["y"]).iloc[0].to_dict()
+
+    with pytest.raises(ValueError, match="job"):
+        raw.encode({**record, "job": "astronaut"})
+    for invalid in (["admin."], {"a": 1}, 3):
+        with pytest.raises(ValueError, match="job"):
+            raw.encode({**record, "job": invalid})
+
+    del record["month"]
+    assert raw.missing(record) == ["month"]
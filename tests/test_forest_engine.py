@@ -0,0 +1,66 @@
+# tests/test_forest_engine.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.forest_engine import PackedForest
+
+
+def make_data(n=600, n_features=12, seed=0):
+    """
+    Mistura de colunas contínuas, inteiras e booleanas (como o X_train real).
+    """
+    rng = np.random.default_rng(seed)
+    X = np.column_stack(
+        [
+            rng.normal(size=(n, 4)),
+            rng.integers(-5, 500, size=(n, 3)),
+            rng.random((n, n_features - 7)) < 0.3,
+        ]
+    ).astype(float)
+    y = ((X[:, 0] + X[:, 7] - X[:, 4] / 500) > 0.4).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("max_depth", [3, 10, None])
+def test_parity_with_sklearn_predict_proba(max_depth):
+    X, y = make_data()
+    rf = RandomForestClassifier(n_estimators=30, max_depth=max_depth, random_state=42).fit(X, y)
+    packed = PackedForest.from_estimator(rf)
+
+    X_new, _ = make_data(n=200, seed=1)
+
+    # Lote inteiro e linha única
+    np.testing.assert_allclose(packed.predict_proba(X_new), rf.predict_proba(X_new), atol=1e-12)
+    np.testing.assert_allclose(
+        packed.predict_proba(X_new[:1]), rf.predict_proba(X_new[:1]), atol=1e-12
+    )
+    np.testing.assert_array_equal(packed.predict(X_new), rf.predict(X_new))
+    assert packed.n_trees == 30
+
+
+def test_thresholds_on_training_values_match():
+    """
+    Valores exatamente iguais aos thresholds (caso comum com inteiros/booleanos)
+    seguem o mesmo caminho que no sklearn.
+    """
+    X, y = make_data()
+    rf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    packed = PackedForest.from_estimator(rf)
+
+    np.testing.assert_allclose(packed.predict_proba(X), rf.predict_proba(X), atol=1e-12)
+
+
+def test_save_load_roundtrip_keeps_feature_names(tmp_path):
+    X, y = make_data()
+    cols = [f"f{i}" for i in range(X.shape[1])]
+    df = pd.DataFrame(X, columns=cols)
+    rf = RandomForestClassifier(n_estimators=15, max_depth=6, random_state=1).fit(df, y)
+
+    path = tmp_path / "packed_forest.npz"
+    PackedForest.from_estimator(rf).save(path)
+    loaded = PackedForest.load(path)
+
+    assert list(loaded.feature_names_in_) == cols
+    np.testing.assert_allclose(loaded.predict_proba(df), rf.predict_proba(df), atol=1e-12)
@@ -0,0 +1,119 @@
+# tests/test_inference_logger.py
+import json
+import threading
+
+import pytest
+
+from src.inference_logger import InferenceLogger
+
+
+def _record(i):
+    return ("RUN1", "3", {"age": i}, i / 100)
+
+
+def test_flushes_in_batches_and_drains_on_stop():
+    """
+    Garante que o logger:
+      - agrupa os registros em lotes de no máximo batch_size
+      - grava tudo o que estava na fila ao parar
+    """
+    batches = []
+    logger = InferenceLogger(
+        flush_fn=lambda batch: batches.append(list(batch)),
+        batch_size=4,
+        flush_interval=5.0,
+    )
+
+    logger.submit_many([_record(i) for i in range(10)])
+    logger.stop()
+
+    assert sum(len(b) for b in batches) == 10
+    assert all(len(b) <= 4 for b in batches)
+    assert [r[2]["age"] for b in batches for r in b] == list(range(10))
+    assert logger.stats()["written"] == 10
+    assert logger.stats()["queued"] == 0
+
+
+def test_time_trigger_flushes_partial_batch():
+    flushed = threading.Event()
+    logger = InferenceLogger(
+        flush_fn=lambda batch: flushed.set(),
+        batch_size=1000,
+        flush_interval=0.05,
+    )
+
+    logger.submit(*_record(1))
+
+    assert flushed.wait(timeout=2.0)
+    logger.stop()
+
+
+def test_drop_policy_when_queue_is_full():
+    logger = InferenceLogger(flush_fn=lambda batch: None, max_queue=2, policy="drop")
+    # Sem thread consumindo, a fila enche na terceira linha
+    logger.start = lambda: None
+
+    accepted = logger.submit_many([_record(i) for i in range(5)])
+
+    assert accepted == 2
+    assert logger.stats()["dropped"] == 3
+
+
+def test_block_policy_bounds_the_whole_batch():
+    """
+    Fila cheia com "block": o lote inteiro espera no máximo block_timeout,
+    não block_timeout por registro.
+    """
+    import time
+
+    logger = InferenceLogger(
+        flush_fn=lambda batch: None, max_queue=2, policy="block", block_timeout=0.2
+    )
+    logger.start = lambda: None
+
+    started = time.monotonic()
+    accepted = logger.submit_many([_record(i) for i in range(12)])
+    elapsed = time.monotonic() - started
+
+    assert accepted == 2
+    assert logger.stats()["dropped"] == 10
+    assert elapsed < 0.6
+
+
+def test_spill_policy_writes_jsonl(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    logger = InferenceLogger(
+        flush_fn=lambda batch: None, max_queue=1, policy="spill", spill_path=spill
+    )
+    logger.start = lambda: None
+
+    logger.submit_many([_record(1), _record(2)])
+
+    lines = [json.loads(line) for line in spill.read_text().splitlines()]
+    assert lines == [
+        {"run_id": "RUN1", "model_version": "3", "input": {"age": 2}, "prediction": 0.02}
+    ]
+    assert logger.stats()["spilled"] == 1
+
+
+def test_failed_flush_is_spilled(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+
+    def failing_flush(batch):
+        raise RuntimeError("db fora do ar")
+
+    logger = InferenceLogger(flush_fn=failing_flush, spill_path=spill)
+    logger.submit_many([_record(1), _record(2)])
+    logger.stop()
+
+    assert len(spill.read_text().splitlines()) == 2
+    stats = logger.stats()
+    assert stats["failed"] == 2
+    assert stats["spilled"] == 2
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        InferenceLogger(policy="whatever")
+    with pytest.raises(ValueError):
+        InferenceLogger(policy="spill")
@@ -0,0 +1,97 @@
+# tests/test_micro_batcher.py
+import threading
+
+import numpy as np
+import pytest
+
+from src.micro_batcher import MicroBatcher
+
+
+class RecordingModel:
+    """
+    Probabilidade = primeira coluna; guarda o tamanho de cada lote recebido.
+    """
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def predict_proba(self, X):
+        with self._lock:
+            self.batches.append(len(X))
+        p = X[:, 0] + self.offset
+        return np.column_stack([1 - p, p])
+
+
+def run_concurrently(batcher, model, values):
+    results = {}
+    barrier = threading.Barrier(len(values))
+
+    def worker(v):
+        barrier.wait()
+        results[v] = batcher.predict(model, np.array([v, 0.0]), timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(v,)) for v in values]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_requests_are_batched_and_fanned_out():
+    batcher = MicroBatcher(max_batch=64, max_wait=0.05, adaptive=False)
+    model = RecordingModel()
+    values = [i / 100 for i in range(20)]
+
+    results = run_concurrently(batcher, model, values)
+    batcher.stop()
+
+    # Cada requisição recebe a probabilidade da própria linha
+    assert results == pytest.approx({v: v for v in values})
+    assert sum(model.batches) == 20
+    assert len(model.batches) < 20
+    assert batcher.stats()["requests"] == 20
+
+
+def test_max_batch_caps_batch_size():
+    batcher = MicroBatcher(max_batch=4, max_wait=0.05, adaptive=False)
+    model = RecordingModel()
+
+    run_concurrently(batcher, model, [i / 100 for i in range(12)])
+    batcher.stop()
+
+    assert max(model.batches) <= 4
+
+
+def test_adaptive_window_does_not_wait_for_isolated_request():
+    batcher = MicroBatcher(max_batch=64, max_wait=1.0, adaptive=True)
+    model = RecordingModel()
+
+    future = batcher.submit(model, np.array([0.3, 0.0]))
+    assert future.result(timeout=0.5) == pytest.approx(0.3)
+    batcher.stop()
+
+
+def test_models_are_not_mixed_in_a_batch():
+    batcher = MicroBatcher(max_batch=64, max_wait=0.05, adaptive=False)
+    old, new = RecordingModel(), RecordingModel(offset=0.5)
+
+    futures = [batcher.submit(old, np.array([0.1])), batcher.submit(new, np.array([0.1]))]
+    results = [f.result(timeout=5) for f in futures]
+    batcher.stop()
+
+    assert results == pytest.approx([0.1, 0.6])
+
+
+def test_model_error_is_propagated_to_waiting_requests():
+    class Broken:
+        def predict_proba(self, X):
+            raise RuntimeError("boom")
+
+    batcher = MicroBatcher(max_batch=8, max_wait=0.0)
+    future = batcher.submit(Broken(), np.array([0.1]))
+    with pytest.raises(RuntimeError, match="boom"):
+        future.result(timeout=5)
+    batcher.stop()
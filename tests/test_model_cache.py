@@ -0,0 +1,208 @@
+# tests/test_model_cache.py
+import numpy as np
+import pytest
+from mlflow.tracking import MlflowClient
+from sklearn.linear_model import LogisticRegression
+
+import src.model_cache as mc
+
+
+@pytest.fixture
+def file_store(tmp_path):
+    """
+    Tracking store baseado em arquivos (sem servidor MLflow nem S3).
+    """
+    uri = f"file:{tmp_path / 'mlruns'}"
+    client = MlflowClient(tracking_uri=uri)
+    experiment_id = client.create_experiment("cache-test")
+    return uri, client, experiment_id
+
+
+def log_model_run(tmp_path, file_store, C=1.0):
+    uri, client, experiment_id = file_store
+    run_id = client.create_run(experiment_id).info.run_id
+
+    model = LogisticRegression(C=C).fit(np.array([[0.0], [1.0], [2.0], [3.0]]), [0, 0, 1, 1])
+    local = tmp_path / f"model-{run_id}"
+    mc.mlflow.sklearn.save_model(model, str(local))
+    client.log_artifacts(run_id, str(local), "model")
+    client.log_dict(run_id, {"columns": ["x"]}, "encoding.json")
+    return run_id
+
+
+def test_second_load_comes_from_local_disk(tmp_path, file_store, monkeypatch):
+    """
+    O primeiro load baixa do tracking store; o segundo (ex.: restart com a mesma
+    versão em Production) não chama download_artifacts.
+    """
+    uri = file_store[0]
+    run_id = log_model_run(tmp_path, file_store)
+    cache_dir = tmp_path / "cache"
+
+    model = mc.load_cached_model(run_id, cache_dir=cache_dir, tracking_uri=uri)
+    assert model.predict([[3.0]])[0] == 1
+    mc.load_cached_dict(run_id, "encoding.json", cache_dir=cache_dir, tracking_uri=uri)
+
+    def no_download(**kwargs):
+        raise AssertionError("não deveria baixar de novo")
+
+    monkeypatch.setattr(mc.mlflow.artifacts, "download_artifacts", no_download)
+
+    again = mc.load_cached_model(run_id, cache_dir=cache_dir, tracking_uri=uri)
+    assert again.predict([[3.0]])[0] == 1
+    assert mc.load_cached_dict(run_id, "encoding.json", cache_dir=cache_dir) == {"columns": ["x"]}
+
+
+def test_corrupted_entry_is_downloaded_again(tmp_path, file_store):
+    uri = file_store[0]
+    run_id = log_model_run(tmp_path, file_store)
+    cache_dir = tmp_path / "cache"
+
+    path = mc.fetch_artifact(run_id, "encoding.json", cache_dir=cache_dir, tracking_uri=uri)
+    sha = mc._read_index(cache_dir)[f"{run_id}/encoding.json"]["sha256"]
+    path.write_text("lixo")
+
+    path = mc.fetch_artifact(run_id, "encoding.json", cache_dir=cache_dir, tracking_uri=uri)
+    assert mc.dir_checksum(path) == sha
+    assert "columns" in path.read_text()
+
+
+def test_lru_eviction_respects_size_limit(tmp_path, file_store):
+    """
+    Com limite de tamanho, a entrada usada há mais tempo sai primeiro.
+    """
+    uri = file_store[0]
+    runs = [log_model_run(tmp_path, file_store, C=c) for c in (0.1, 1.0, 10.0)]
+    cache_dir = tmp_path / "cache"
+
+    first = mc.fetch_artifact(runs[0], "model", cache_dir=cache_dir, tracking_uri=uri)
+    one_model = mc.dir_size(first)
+    limit = int(one_model * 2.5)
+
+    mc.fetch_artifact(runs[1], "model", cache_dir=cache_dir, max_bytes=limit, tracking_uri=uri)
+    # Usa de novo o primeiro: o segundo vira o menos recente
+    mc.fetch_artifact(runs[0], "model", cache_dir=cache_dir, max_bytes=limit, tracking_uri=uri)
+    mc.fetch_artifact(runs[2], "model", cache_dir=cache_dir, max_bytes=limit, tracking_uri=uri)
+
+    index = mc._read_index(cache_dir)
+    assert f"{runs[0]}/model" in index
+    assert f"{runs[1]}/model" not in index
+    assert f"{runs[2]}/model" in index
+    assert len(list((cache_dir / "objects").iterdir())) == 2
+
+
+def test_eviction_skips_objects_being_loaded_by_another_process(tmp_path, file_store):
+    """
+    Um objeto com lock de leitura (outro processo carregando) não é removido
+    na evicção; sai numa evicção seguinte, quando o lock é solto.
+    """
+    import fcntl
+    import multiprocessing
+
+    uri = file_store[0]
+    runs = [log_model_run(tmp_path, file_store, C=c) for c in (0.1, 1.0, 10.0)]
+    cache_dir = tmp_path / "cache"
+
+    first = mc.fetch_artifact(runs[0], "model", cache_dir=cache_dir, tracking_uri=uri)
+    limit = int(mc.dir_size(first) * 1.5)
+    sha = first.parent.name
+
+    # Outro processo segura o lock de leitura do primeiro objeto
+    ctx = multiprocessing.get_context("fork")
+    locked, release = ctx.Event(), ctx.Event()
+
+    def reader():
+        with mc._flock(mc._object_lock(cache_dir, sha), fcntl.LOCK_SH):
+            locked.set()
+            release.wait(10)
+
+    proc = ctx.Process(target=reader)
+    proc.start()
+    try:
+        assert locked.wait(10)
+        mc.fetch_artifact(runs[1], "model", cache_dir=cache_dir, max_bytes=limit, tracking_uri=uri)
+        assert first.exists()
+        assert f"{runs[0]}/model" in mc._read_index(cache_dir)
+    finally:
+        release.set()
+        proc.join(10)
+
+    mc.fetch_artifact(runs[2], "model", cache_dir=cache_dir, max_bytes=limit, tracking_uri=uri)
+    index = mc._read_index(cache_dir)
+    assert f"{runs[0]}/model" not in index
+    assert not first.exists()
+
+
+def test_index_updates_from_concurrent_processes_are_not_lost(tmp_path, file_store):
+    import multiprocessing
+
+    uri = file_store[0]
+    runs = [log_model_run(tmp_path, file_store, C=c) for c in (0.1, 1.0, 10.0, 100.0)]
+    cache_dir = tmp_path / "cache"
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [
+        ctx.Process(
+            target=mc.fetch_artifact,
+            args=(run_id, "encoding.json"),
+            kwargs={"cache_dir": cache_dir, "tracking_uri": uri},
+        )
+        for run_id in runs
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(30)
+
+    assert all(proc.exitcode == 0 for proc in procs)
+    assert set(mc._read_index(cache_dir)) == {f"{run_id}/encoding.json" for run_id in runs}
+
+
+def test_cold_download_does_not_block_cache_hits(tmp_path, file_store, monkeypatch):
+    """
+    Um miss baixa sem o lock do índice: enquanto o download de um run está
+    parado, o hit de outro run no mesmo cache responde normalmente.
+    """
+    import threading
+
+    uri = file_store[0]
+    cached_run = log_model_run(tmp_path, file_store)
+    cold_run = log_model_run(tmp_path, file_store, C=0.5)
+    cache_dir = tmp_path / "cache"
+    mc.load_cached_dict(cached_run, "encoding.json", cache_dir=cache_dir, tracking_uri=uri)
+
+    started, release = threading.Event(), threading.Event()
+    download = mc.mlflow.artifacts.download_artifacts
+
+    def slow_download(**kwargs):
+        started.set()
+        release.wait(30)
+        return download(**kwargs)
+
+    monkeypatch.setattr(mc.mlflow.artifacts, "download_artifacts", slow_download)
+    cold = threading.Thread(
+        target=mc.load_cached_dict,
+        args=(cold_run, "encoding.json"),
+        kwargs={"cache_dir": cache_dir, "tracking_uri": uri},
+    )
+    hits = []
+    hit = threading.Thread(
+        target=lambda: hits.append(
+            mc.load_cached_dict(cached_run, "encoding.json", cache_dir=cache_dir)
+        )
+    )
+    cold.start()
+    try:
+        assert started.wait(30)
+        hit.start()
+        hit.join(10)
+        # O hit terminou com o download do outro run ainda parado
+        assert hits == [{"columns": ["x"]}]
+    finally:
+        release.set()
+        cold.join(30)
+        hit.join(30)
+
+    assert set(mc._read_index(cache_dir)) == {
+        f"{run_id}/encoding.json" for run_id in (cached_run, cold_run)
+    }
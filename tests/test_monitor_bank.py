@@ -1,11 +1,9 @@
 # tests/test_monitor_bank.py
 
-from unittest.mock import MagicMock
-
 import pandas as pd
 
 
-def test_fetch_latest_training_snapshot(monkeypatch):
+def test_fetch_latest_training_snapshot(fake_pooled_conn):
     """
     Testa se fetch_latest_training_snapshot:
       - chama get_conn()
@@ -23,19 +21,14 @@ def test_fetch_latest_training_snapshot(monkeypatch):
         250,  # n_test
         42,  # n_features
         '{"age": {"mean": 45.0}}',  # feature_stats (JSON string)
+        '{"age": {"edges": [40.0], "counts": [3, 7]}}',  # feature_histograms
+        None,  # category_counts (run antigo)
     )
 
-    # ----- Fake cursor -----
-    fake_cursor = MagicMock()
+    # ----- Patch pooled_conn → entrega conexão/cursor fake -----
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
     fake_cursor.fetchone.return_value = fake_row
 
-    # ----- Fake connection -----
-    fake_conn = MagicMock()
-    fake_conn.cursor.return_value = fake_cursor
-
-    # ----- Patch get_conn → retorna fake_conn -----
-    monkeypatch.setattr("src.monitor_bank.get_conn", lambda: fake_conn)
-
     import src.monitor_bank as mb
 
     result = mb.fetch_latest_training_snapshot()
@@ -48,13 +41,14 @@ def test_fetch_latest_training_snapshot(monkeypatch):
     assert result["n_test"] == 250
     assert result["n_features"] == 42
     assert result["feature_stats"]["age"]["mean"] == 45.0
+    assert result["feature_histograms"]["age"]["counts"] == [3, 7]
+    assert result["category_counts"] == {}
 
-    # cursor e conexão fechados
+    # cursor fechado (a conexão volta para o pool)
     fake_cursor.close.assert_called_once()
-    fake_conn.close.assert_called_once()
 
 
-def test_fetch_recent_inferences(monkeypatch):
+def test_fetch_recent_inferences(fake_pooled_conn):
     """
     Testa se fetch_recent_inferences:
       - executa SELECT
@@ -66,14 +60,9 @@ def test_fetch_recent_inferences(monkeypatch):
         ({"age": 45, "balance": 900}, 0.9),
     ]
 
-    fake_cursor = MagicMock()
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
     fake_cursor.fetchall.return_value = fake_rows
 
-    fake_conn = MagicMock()
-    fake_conn.cursor.return_value = fake_cursor
-
-    monkeypatch.setattr("src.monitor_bank.get_conn", lambda: fake_conn)
-
     import src.monitor_bank as mb
 
     inputs, preds = mb.fetch_recent_inferences("RUN123", limit=2)
@@ -85,7 +74,6 @@ def test_fetch_recent_inferences(monkeypatch):
     assert preds == [0.7, 0.9]
 
     fake_cursor.close.assert_called_once()
-    fake_conn.close.assert_called_once()
 
 
 def test_compute_simple_stats():
@@ -117,3 +105,505 @@ def test_compute_simple_stats():
 
     # missing_col não aparece
     assert "missing_col" not in result
+
+
+def test_fetch_inferences_since_uses_watermark(fake_pooled_conn):
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
+    fake_cursor.fetchall.return_value = [(11, {"age": 30}, 0.2), (12, None, 0.8)]
+
+    import src.monitor_bank as mb
+
+    ids, inputs, preds = mb.fetch_inferences_since("RUN123", watermark=10, limit=2)
+
+    sql, params = fake_cursor.execute.call_args[0]
+    assert "id > %s" in sql
+    assert "timestamp < NOW() - %s::interval" in sql
+    assert "ORDER BY id" in sql
+    assert params == ("RUN123", 10, mb.COMMIT_LAG, "RUN123", 10, mb.COMMIT_LAG, 2)
+    assert ids == [11, 12]
+    assert inputs == [{"age": 30}, {}]
+    assert preds == [0.2, 0.8]
+
+
+def test_update_drift_state_processes_only_new_rows(monkeypatch):
+    """
+    Duas execuções: a segunda parte do watermark salvo e só lê o que chegou
+    depois; as estatísticas acumuladas batem com as do histórico completo.
+    """
+    import numpy as np
+
+    import src.monitor_bank as mb
+
+    logs = [(i, {"age": 20 + i % 50}, (i % 10) / 10) for i in range(1, 26)]
+    saved = {}
+    reads = []
+
+    def fake_fetch(run_id, watermark, limit, commit_lag):
+        batch = [row for row in logs if row[0] > watermark][:limit]
+        reads.append(len(batch))
+        return [r[0] for r in batch], [r[1] for r in batch], [r[2] for r in batch]
+
+    def fake_load(run_id):
+        if run_id in saved:
+            return mb.DriftState.from_dict(run_id, saved[run_id])
+        return mb.DriftState(run_id)
+
+    def fake_save(state):
+        saved[state.run_id] = state.to_dict()
+
+    monkeypatch.setattr(mb, "fetch_inferences_since", fake_fetch)
+    monkeypatch.setattr(mb, "load_drift_state", fake_load)
+    monkeypatch.setattr(mb, "save_drift_state", fake_save)
+
+    state, n_new = mb.update_drift_state("RUN", ["age"], batch_size=10)
+    assert n_new == 25
+    assert reads == [10, 10, 5, 0]
+    assert state.watermark == 25
+
+    logs.extend((i, {"age": 99}, 0.5) for i in range(26, 31))
+    reads.clear()
+    state, n_new = mb.update_drift_state("RUN", ["age"], batch_size=10)
+
+    assert n_new == 5
+    assert reads == [5, 0]
+    ages = np.array([row[1]["age"] for row in logs], dtype=float)
+    summary = state.feature_summary()["age"]
+    assert summary["count"] == 30
+    assert abs(summary["mean"] - ages.mean()) < 1e-9
+    assert abs(summary["std"] - ages.std(ddof=1)) < 1e-9
+
+    # Nada novo: não regrava o estado
+    monkeypatch.setattr(mb, "save_drift_state", lambda state: reads.append("save"))
+    mb.update_drift_state("RUN", ["age"], batch_size=10)
+    assert "save" not in reads
+
+
+def test_save_drift_state_upserts(fake_pooled_conn):
+    import json
+
+    import src.monitor_bank as mb
+
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
+    state = mb.DriftState("RUN", watermark=42)
+
+    mb.save_drift_state(state)
+
+    sql, params = fake_cursor.execute.call_args[0]
+    assert "ON CONFLICT (run_id)" in sql
+    assert params[:2] == ("RUN", 42)
+    assert json.loads(params[2])["watermark"] == 42
+
+
+def test_main_incremental_reports_drift_from_state(monkeypatch, capsys):
+    from unittest.mock import MagicMock
+
+    import src.monitor_bank as mb
+
+    monkeypatch.setattr(
+        mb,
+        "fetch_latest_training_snapshot",
+        lambda: {
+            "run_id": "RUN",
+            "model_version": "1",
+            "metric_name": "roc_auc",
+            "metric_value": 0.9,
+            "n_train": 100,
+            "n_test": 20,
+            "n_features": 2,
+            "feature_stats": {"age": {"mean": 40.0}, "balance": {"mean": 1000.0}},
+        },
+    )
+    state = mb.DriftState("RUN")
+    state.update(
+        [1, 2],
+        [{"age": 60, "balance": 1000}, {"age": 60, "balance": 1010}],
+        [0.1, 0.3],
+        ["age", "balance"],
+    )
+    monkeypatch.setattr(
+        mb, "update_drift_state", lambda run_id, keys, batch_size, commit_lag: (state, 2)
+    )
+    monkeypatch.setattr(mb, "close_pool", MagicMock())
+
+    mb.main(incremental=True)
+
+    out = capsys.readouterr().out
+    assert "Watermark: inference_logs.id = 2" in out
+    assert "[DRIFT] age" in out
+    assert "[OK] balance" in out
+
+
+def test_build_summary_query_passes_features_as_params():
+    import src.monitor_bank as mb
+
+    sql, params = mb.build_summary_query("RUN", ["age", "balance"], since="2024-01-01", limit=100)
+
+    assert sql.count("jsonb_typeof") == 2
+    assert "stddev_samp(prediction)" in sql
+    assert "stddev_samp(f1)" in sql
+    assert "timestamp >= %s" in sql
+    assert "LIMIT %s" in sql
+    assert "age" not in sql
+    assert params == ["age", "age", "balance", "balance", "RUN", "2024-01-01", 100]
+
+
+def test_fetch_window_summary_returns_only_aggregates(fake_pooled_conn):
+    import math
+
+    import src.monitor_bank as mb
+
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
+    # prediction, age, balance (balance sem nenhum valor numérico na janela)
+    fake_cursor.fetchone.return_value = (
+        *(3, 0.5, 0.1, 0.4, 0.6),
+        *(3, 40.0, 10.0, 30.0, 50.0),
+        *(0, None, None, None, None),
+    )
+
+    summary = mb.fetch_window_summary("RUN", ["age", "balance"], limit=500)
+
+    fake_cursor.execute.assert_called_once()
+    assert summary["prediction"]["count"] == 3
+    assert summary["prediction"]["mean"] == 0.5
+    assert summary["features"] == {
+        "age": {"count": 3, "mean": 40.0, "std": 10.0, "min": 30.0, "max": 50.0}
+    }
+
+    fake_cursor.fetchone.return_value = (0, None, None, None, None)
+    empty = mb.fetch_window_summary("RUN", [])
+    assert empty["prediction"]["count"] == 0
+    assert math.isnan(empty["prediction"]["mean"])
+
+
+def test_sql_summary_matches_pandas_path(postgres_conn):
+    """
+    Paridade com um Postgres de verdade: o resumo calculado no banco bate
+    com compute_simple_stats sobre as mesmas linhas.
+    """
+    import json
+    import uuid
+
+    import numpy as np
+
+    import src.monitor_bank as mb
+
+    run_id = f"parity-{uuid.uuid4().hex}"
+    rng = np.random.default_rng(0)
+    rows = [
+        {
+            "age": int(rng.integers(18, 90)),
+            "balance": float(rng.normal(1000, 300)),
+            "job": "admin.",
+            **({"pdays": -1} if i % 3 else {}),
+        }
+        for i in range(200)
+    ]
+    preds = rng.random(200).tolist()
+
+    cur = postgres_conn.cursor()
+    try:
+        cur.executemany(
+            "INSERT INTO inference_logs (run_id, model_version, input, prediction) "
+            "VALUES (%s, '1', %s::jsonb, %s)",
+            [(run_id, json.dumps(r), p) for r, p in zip(rows, preds, strict=True)],
+        )
+        keys = ["age", "balance", "pdays", "job", "missing"]
+
+        summary = mb.fetch_window_summary(run_id, keys, limit=150)
+        inputs, recent_preds = mb.fetch_recent_inferences(run_id, limit=150)
+    finally:
+        cur.execute("DELETE FROM inference_logs WHERE run_id = %s", (run_id,))
+        cur.close()
+
+    expected = mb.compute_simple_stats(pd.DataFrame(inputs), ["age", "balance", "pdays"])
+    assert set(summary["features"]) == set(expected)
+    for feat, stats in expected.items():
+        assert summary["features"][feat]["count"] == stats["count"]
+        assert abs(summary["features"][feat]["mean"] - stats["mean"]) < 1e-9
+        assert abs(summary["features"][feat]["std"] - stats["std"]) < 1e-9
+
+    pred_series = pd.Series(recent_preds)
+    assert summary["prediction"]["count"] == 150
+    assert abs(summary["prediction"]["mean"] - pred_series.mean()) < 1e-9
+    assert abs(summary["prediction"]["std"] - pred_series.std()) < 1e-9
+
+
+def test_main_reports_psi_ks_from_training_histograms(monkeypatch, capsys):
+    from unittest.mock import MagicMock
+
+    import numpy as np
+
+    import src.monitor_bank as mb
+    from src.drift_engine import fit_histograms
+
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame({"age": rng.normal(40, 10, 2_000), "balance": rng.normal(0, 1, 2_000)})
+    monkeypatch.setattr(
+        mb,
+        "fetch_latest_training_snapshot",
+        lambda: {
+            "run_id": "RUN",
+            "model_version": "1",
+            "metric_name": "roc_auc",
+            "metric_value": 0.9,
+            "n_train": 2_000,
+            "n_test": 500,
+            "n_features": 2,
+            "feature_stats": X_train.describe().to_dict(),
+            "feature_histograms": fit_histograms(X_train),
+            "category_counts": {},
+        },
+    )
+    # Mesma média, variância muito maior: só o PSI/KS enxerga
+    inputs = [
+        {"age": float(a), "balance": float(b)}
+        for a, b in zip(rng.normal(40, 10, 500), rng.normal(0, 5, 500), strict=True)
+    ]
+    monkeypatch.setattr(mb, "fetch_recent_inferences", lambda run_id, limit: (inputs, [0.5] * 500))
+    monkeypatch.setattr(mb, "close_pool", MagicMock())
+
+    mb.main()
+
+    out = capsys.readouterr().out
+    assert "PSI/KS" in out
+    assert "[OK] age" in out
+    assert "[DRIFT] balance" in out
+
+
+def test_main_reports_drifted_categories(monkeypatch, capsys):
+    from unittest.mock import MagicMock
+
+    import src.monitor_bank as mb
+
+    monkeypatch.setattr(
+        mb,
+        "fetch_latest_training_snapshot",
+        lambda: {
+            "run_id": "RUN",
+            "model_version": "1",
+            "metric_name": "roc_auc",
+            "metric_value": 0.9,
+            "n_train": 100,
+            "n_test": 20,
+            "n_features": 2,
+            "feature_stats": {},
+            "feature_histograms": {},
+            "category_counts": {
+                "contact": {
+                    "columns": ["contact_telephone", "contact_unknown"],
+                    "counts": [60, 10, 30],
+                }
+            },
+        },
+    )
+    # Inferência: quase tudo vira contact_unknown
+    inputs = [{"contact_telephone": 0.0, "contact_unknown": 1.0}] * 90 + [
+        {"contact_telephone": 0.0, "contact_unknown": 0.0}
+    ] * 10
+    monkeypatch.setattr(mb, "fetch_recent_inferences", lambda run_id, limit: (inputs, [0.5] * 100))
+    monkeypatch.setattr(mb, "close_pool", MagicMock())
+
+    mb.main()
+
+    out = capsys.readouterr().out
+    assert "[DRIFT] contact" in out
+    assert "contact_unknown" in out
+    assert "30.0% ->  90.0%" in out
+
+
+def test_build_bucket_query_groups_in_a_single_scan():
+    import src.monitor_bank as mb
+
+    sql, params = mb.build_bucket_query("RUN", ["age"], bucket="1 hour")
+
+    assert sql.count("FROM inference_logs") == 1
+    assert "date_bin(%s::interval, timestamp" in sql
+    assert "GROUP BY bucket ORDER BY bucket" in sql
+    assert "NOW() - %s::interval" in sql
+    assert params == ["1 hour", "age", "age", "RUN", mb.LOOKBACK]
+
+    sql, params = mb.build_bucket_query("RUN", [], since="2024-06-01", until="2024-07-01")
+    assert "NOW()" not in sql
+    assert params == ["1 day", "RUN", "2024-06-01", "2024-07-01"]
+
+
+def test_bucket_validation_rejects_calendar_units_before_querying(fake_pooled_conn, monkeypatch):
+    """
+    date_bin não aceita meses/anos: --bucket inválido vira um ValueError
+    claro antes de qualquer acesso ao banco.
+    """
+    from unittest.mock import MagicMock
+
+    import pytest
+
+    import src.monitor_bank as mb
+
+    assert mb.validate_bucket("15 Minutes") == "15 minutes"
+    assert mb.validate_bucket("1week") == "1 week"
+
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
+    snapshot = MagicMock(side_effect=AssertionError("não deveria consultar o banco"))
+    monkeypatch.setattr(mb, "fetch_latest_training_snapshot", snapshot)
+    for bucket in ("1 month", "1 year", "0 days", "daily"):
+        with pytest.raises(ValueError, match="Bucket inválido"):
+            mb.fetch_bucket_summaries("RUN", ["age"], bucket=bucket)
+        with pytest.raises(ValueError, match="meses e anos"):
+            mb.main(bucket=bucket)
+    fake_cursor.execute.assert_not_called()
+
+
+def test_fetch_bucket_summaries_and_drift_timeseries(fake_pooled_conn):
+    import math
+    from datetime import datetime
+
+    import src.monitor_bank as mb
+
+    fake_conn, fake_cursor = fake_pooled_conn("src.monitor_bank")
+    day1, day2 = datetime(2024, 6, 1), datetime(2024, 6, 2)
+    # bucket, prediction, age, balance
+    fake_cursor.fetchall.return_value = [
+        (day1, *(10, 0.5, 0.1, 0.2, 0.9), *(10, 42.0, 5.0, 30.0, 60.0), *(10, 1000.0, 1, 0, 2)),
+        (day2, *(4, 0.7, 0.2, 0.3, 0.9), *(4, 60.0, 5.0, 50.0, 70.0), *(0, None, None, None, None)),
+    ]
+
+    buckets = mb.fetch_bucket_summaries("RUN", ["age", "balance"], bucket="1 day")
+
+    fake_cursor.execute.assert_called_once()
+    assert [start for start, _ in buckets] == [day1, day2]
+    assert buckets[1][1]["features"].keys() == {"age"}
+
+    table = mb.drift_timeseries(
+        buckets, {"age": {"mean": 40.0}, "balance": {"mean": 1000.0}, "pdays": {"mean": 0.0}}
+    )
+
+    assert list(table.columns) == ["n", "pred_mean", "pred_std", "age", "balance", "n_drift"]
+    assert table["n"].tolist() == [10, 4]
+    assert abs(table.loc[day1, "age"] - 0.05) < 1e-9
+    assert abs(table.loc[day2, "age"] - 0.5) < 1e-9
+    assert math.isnan(table.loc[day2, "balance"])
+    assert table["n_drift"].tolist() == [0, 1]
+
+
+def test_bucket_summaries_match_window_summary(postgres_conn):
+    """
+    Com um Postgres de verdade: cada bucket bate com o resumo da mesma
+    janela de tempo consultada separadamente.
+    """
+    import json
+    import uuid
+    from datetime import datetime, timedelta
+
+    import src.monitor_bank as mb
+
+    run_id = f"buckets-{uuid.uuid4().hex}"
+    start = datetime(2024, 6, 1)
+    rows = [
+        (run_id, json.dumps({"age": 20 + i % 40}), (i % 10) / 10, start + timedelta(minutes=17 * i))
+        for i in range(300)
+    ]
+
+    cur = postgres_conn.cursor()
+    try:
+        cur.executemany(
+            "INSERT INTO inference_logs (run_id, model_version, input, prediction, timestamp) "
+            "VALUES (%s, '1', %s::jsonb, %s, %s)",
+            rows,
+        )
+        buckets = mb.fetch_bucket_summaries(run_id, ["age"], bucket="1 day", since=start)
+        windows = [
+            mb.fetch_window_summary(run_id, ["age"], since=b, until=b + timedelta(days=1))
+            for b, _ in buckets
+        ]
+    finally:
+        cur.execute("DELETE FROM inference_logs WHERE run_id = %s", (run_id,))
+        cur.close()
+
+    assert sum(summary["prediction"]["count"] for _, summary in buckets) == 300
+    for (_, summary), window in zip(buckets, windows, strict=True):
+        assert summary["prediction"]["count"] == window["prediction"]["count"]
+        assert abs(summary["features"]["age"]["mean"] - window["features"]["age"]["mean"]) < 1e-9
+
+
+def test_fetch_inferences_since_waits_for_late_commits(postgres_conn):
+    """
+    Com um Postgres de verdade: uma linha de id menor cuja transação ainda
+    está dentro do atraso de segurança (commit tardio de outro writer)
+    segura o watermark; as de id maior só são lidas junto com ela depois.
+    """
+    import json
+    import uuid
+
+    import src.monitor_bank as mb
+
+    run_id = f"late-{uuid.uuid4().hex}"
+
+    cur = postgres_conn.cursor()
+    try:
+        ids = []
+        for age in ("1 hour", "0 seconds", "1 hour"):
+            cur.execute(
+                "INSERT INTO inference_logs (run_id, model_version, input, prediction, timestamp) "
+                "VALUES (%s, '1', %s::jsonb, 0.5, NOW() - %s::interval) RETURNING id",
+                (run_id, json.dumps({"age": 30}), age),
+            )
+            ids.append(cur.fetchone()[0])
+
+        first, _, _ = mb.fetch_inferences_since(run_id, 0, commit_lag="10 minutes")
+
+        # O tempo passa: a linha do meio sai do atraso de segurança
+        cur.execute(
+            "UPDATE inference_logs SET timestamp = NOW() - interval '1 hour' WHERE id = %s",
+            (ids[1],),
+        )
+        rest, _, _ = mb.fetch_inferences_since(run_id, first[-1], commit_lag="10 minutes")
+    finally:
+        cur.execute("DELETE FROM inference_logs WHERE run_id = %s", (run_id,))
+        cur.close()
+
+    assert first == ids[:1]
+    assert rest == ids[1:]
+
+
+def test_main_bucket_mode_prints_timeseries(monkeypatch, capsys, tmp_path):
+    from datetime import datetime
+    from unittest.mock import MagicMock
+
+    import src.monitor_bank as mb
+
+    monkeypatch.setattr(
+        mb,
+        "fetch_latest_training_snapshot",
+        lambda: {
+            "run_id": "RUN",
+            "model_version": "1",
+            "metric_name": "roc_auc",
+            "metric_value": 0.9,
+            "n_train": 100,
+            "n_test": 20,
+            "n_features": 1,
+            "feature_stats": {"age": {"mean": 40.0}},
+            "feature_histograms": {},
+            "category_counts": {},
+        },
+    )
+    calls = []
+
+    def fake_buckets(run_id, keys, bucket, since):
+        calls.append((run_id, list(keys), bucket, since))
+        summary = {
+            "prediction": {"count": 3, "mean": 0.5, "std": 0.1, "min": 0.4, "max": 0.6},
+            "features": {"age": {"count": 3, "mean": 60.0, "std": 1.0, "min": 59, "max": 61}},
+        }
+        return [(datetime(2024, 6, 1, 10), summary)]
+
+    monkeypatch.setattr(mb, "fetch_bucket_summaries", fake_buckets)
+    monkeypatch.setattr(mb, "close_pool", MagicMock())
+    output = tmp_path / "drift.csv"
+
+    mb.main(bucket="1 hour", output=str(output))
+
+    out = capsys.readouterr().out
+    assert calls == [("RUN", ["age"], "1 hour", None)]
+    assert "2024-06-01 10:00:00" in out
+    assert "n_drift" in out
+    assert pd.read_csv(output)["n_drift"].tolist() == [1]
@@ -9,17 +9,24 @@ import pandas as pd
 import src.predict_bank as pb
 
 
-def test_load_input_reads_csv_and_samples_20(monkeypatch):
+def test_load_input_reads_processed_and_samples_20(monkeypatch):
     """
     Garante que load_input:
-      - lê o CSV correto
+      - lê o X_test processado
       - retorna exatamente 20 linhas
     """
     fake_df = pd.DataFrame({"a": range(100)})
-    monkeypatch.setattr(pd, "read_csv", lambda path: fake_df)
+    calls = []
+
+    def fake_read_frame(directory, name):
+        calls.append(name)
+        return fake_df
+
+    monkeypatch.setattr(pb, "read_frame", fake_read_frame)
 
     result = pb.load_input()
     assert len(result) == 20
+    assert calls == ["X_test"]
 
 
 def test_load_production_model(monkeypatch):
@@ -27,7 +34,7 @@ def test_load_production_model(monkeypatch):
     Garante que load_production_model:
       - chama MlflowClient
       - pega última versão Production
-      - carrega o modelo com mlflow.sklearn.load_model
+      - carrega o modelo pelo cache local de artefatos
     """
 
     # Fake response do MlflowClient
@@ -40,15 +47,17 @@ def test_load_production_model(monkeypatch):
     # Mock do MlflowClient() → retorna fake_client
     monkeypatch.setattr(pb, "MlflowClient", lambda: fake_client)
 
-    # Mock do loader do modelo
+    # Mock do loader do modelo (cache local)
     fake_model = MagicMock()
-    monkeypatch.setattr(pb.mlflow.sklearn, "load_model", lambda uri: fake_model)
+    loaded = []
+    monkeypatch.setattr(pb, "load_cached_model", lambda run_id: loaded.append(run_id) or fake_model)
 
     model, run_id, model_uri = pb.load_production_model("bank-model")
 
     assert model is fake_model
     assert run_id == "RUN123"
     assert model_uri == "runs:/RUN123/model"
+    assert loaded == ["RUN123"]
 
 
 def test_main_runs_full_flow(monkeypatch, capsys):
@@ -57,7 +66,7 @@ def test_main_runs_full_flow(monkeypatch, capsys):
       - load_input → df fake
       - load_production_model → modelo fake
       - predict_proba é chamado
-      - save_inference_row é chamado N vezes
+      - save_inference_rows é chamado uma única vez com todas as linhas
       - imprime JSON final
     """
 
@@ -79,15 +88,18 @@ def test_main_runs_full_flow(monkeypatch, capsys):
         lambda model_name: (dummy_model, "RUN999", "runs:/RUN999/model"),
     )
 
-    # ---- Mock save_inference_row ----
+    # ---- Mock save_inference_rows ----
     mock_save = MagicMock()
-    monkeypatch.setattr(pb, "save_inference_row", mock_save)
+    monkeypatch.setattr(pb, "save_inference_rows", mock_save)
+    monkeypatch.setattr(pb, "close_pool", MagicMock())
 
     # ---- Executa main ----
     pb.main()
 
-    # save_inference_row deve ser chamado uma vez por linha
-    assert mock_save.call_count == len(df_fake)
+    # Um único INSERT em lote com todas as linhas
+    mock_save.assert_called_once()
+    assert len(mock_save.call_args.kwargs["rows"]) == len(df_fake)
+    assert mock_save.call_args.kwargs["predictions"] == [0.8, 0.8]
 
     # ---- Verifica impressão JSON ----
     captured = capsys.readouterr().out
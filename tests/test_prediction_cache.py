@@ -0,0 +1,92 @@
+# tests/test_prediction_cache.py
+import numpy as np
+
+from src.prediction_cache import PredictionCache, entry_nbytes, row_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_row_key_depends_on_values_and_model_version():
+    row = np.array([1.0, 0.0, 35.0])
+
+    assert row_key("7", row) == row_key("7", row.reshape(1, -1).astype(np.int64))
+    assert row_key("7", row) == row_key("7", np.array([1.0, -0.0, 35.0]))
+    assert row_key("7", row) != row_key("8", row)
+    assert row_key("7", row) != row_key("7", np.array([1.0, 0.0, 36.0]))
+
+
+def test_get_put_counts_hits_and_misses():
+    cache = PredictionCache(max_entries=10)
+
+    assert cache.get(b"a") is None
+    cache.put(b"a", 0.25)
+    assert cache.get(b"a") == 0.25
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["entries"] == 1
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = PredictionCache(max_entries=2)
+    cache.put(b"a", 0.1)
+    cache.put(b"b", 0.2)
+    cache.get(b"a")  # "b" vira o menos usado
+    cache.put(b"c", 0.3)
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == 0.1
+    assert cache.get(b"c") == 0.3
+    assert cache.stats()["evictions"] == 1
+
+    one = entry_nbytes(bytes([0]), 0.0, 60.0)
+    by_bytes = PredictionCache(max_entries=100, max_bytes=3 * one)
+    for i in range(5):
+        by_bytes.put(bytes([i]), float(i))
+    assert by_bytes.stats()["entries"] == 3
+    assert by_bytes.stats()["bytes"] == 3 * one
+    assert by_bytes.get(bytes([0])) is None
+
+    # Chaves maiores ocupam mais: cabem menos entradas no mesmo limite
+    big_keys = PredictionCache(max_entries=100, max_bytes=3 * one)
+    for i in range(5):
+        big_keys.put(bytes([i]) * 64, float(i))
+    assert big_keys.stats()["entries"] < 3
+
+    # Regravar a mesma chave não conta em dobro
+    by_bytes.put(bytes([4]), 4.0)
+    assert by_bytes.stats()["bytes"] == 3 * one
+
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = PredictionCache(max_entries=10, ttl=5, clock=clock)
+    cache.put(b"a", 0.5)
+
+    clock.now = 4.9
+    assert cache.get(b"a") == 0.5
+    clock.now = 5.0
+    assert cache.get(b"a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_clear_and_disabled_cache():
+    cache = PredictionCache(max_entries=10)
+    cache.put(b"a", 0.5)
+    cache.clear()
+    assert cache.get(b"a") is None
+    assert cache.stats()["invalidations"] == 1
+
+    disabled = PredictionCache(max_entries=0)
+    disabled.put(b"a", 0.5)
+    assert disabled.get(b"a") is None
+    assert disabled.stats()["misses"] == 0
+    assert disabled.enabled is False
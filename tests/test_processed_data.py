@@ -0,0 +1,75 @@
+# tests/test_processed_data.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processed_data import (
+    FrameWriter,
+    open_shared_frame,
+    processed_format,
+    read_frame,
+    read_target,
+    share_frame,
+    write_frame,
+)
+
+
+def make_frame():
+    return pd.DataFrame(
+        {
+            "age": np.array([30, 40, 50], dtype=np.int64),
+            "balance": [1.5, -2.0, 0.0],
+            "job_student": [True, False, True],
+        },
+        index=[7, 3, 9],
+    )
+
+
+def test_feather_roundtrip_preserves_dtypes(tmp_path):
+    df = make_frame()
+    path = write_frame(df, tmp_path, "X_train")
+
+    assert path.suffix == ".feather"
+    loaded = read_frame(tmp_path, "X_train")
+    pd.testing.assert_frame_equal(loaded, df.reset_index(drop=True))
+
+    assert list(read_frame(tmp_path, "X_train", columns=["job_student"]).columns) == ["job_student"]
+
+
+def test_series_target_and_csv_fallback(tmp_path):
+    write_frame(pd.Series([0, 1, 1], name="y"), tmp_path, "y_train", fmt="csv")
+
+    # Sem .feather, o leitor usa o CSV
+    assert read_target(tmp_path, "y_train").tolist() == [0, 1, 1]
+
+
+def test_processed_format_from_env(monkeypatch):
+    monkeypatch.setenv("PROCESSED_FORMAT", "csv")
+    assert processed_format() == "csv"
+
+    monkeypatch.setenv("PROCESSED_FORMAT", "xlsx")
+    with pytest.raises(ValueError):
+        processed_format()
+
+
+@pytest.mark.parametrize("fmt", ["feather", "csv"])
+def test_frame_writer_appends_chunks(tmp_path, fmt):
+    df = make_frame()
+    with FrameWriter(tmp_path, "X_train", fmt) as writer:
+        writer.write(df.iloc[:2])
+        writer.write(df.iloc[2:])
+
+    assert writer.rows == 3
+    pd.testing.assert_frame_equal(read_frame(tmp_path, "X_train"), df.reset_index(drop=True))
+
+
+def test_shared_frame_is_memory_mapped(tmp_path):
+    df = make_frame()
+    spec = share_frame(df, tmp_path, "X_train")
+    y_spec = share_frame(np.array([0, 1, 1]), tmp_path, "y_train")
+
+    shared = open_shared_frame(spec)
+    pd.testing.assert_frame_equal(shared.copy(), df.reset_index(drop=True))
+    # Sem cópia: a coluna continua sendo o mapeamento read-only do arquivo
+    assert not shared["age"].to_numpy().flags.writeable
+    assert open_shared_frame(y_spec).tolist() == [0, 1, 1]
@@ -0,0 +1,99 @@
+# tests/test_run_uploader.py
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.run_uploader import RunUploader, log_run_data, upload_run
+
+
+def make_staging(tmp_path):
+    staging = tmp_path / "staging"
+    (staging / "model").mkdir(parents=True)
+    (staging / "model" / "MLmodel").write_text("flavors: {}")
+    (staging / "encoding.json").write_text("{}")
+    return staging
+
+
+def artifacts(*names):
+    return [MagicMock(path=name) for name in names]
+
+
+def test_log_run_data_sends_everything_in_one_batch():
+    client = MagicMock()
+
+    log_run_data(client, "RUN", {"C": 1.0, "max_iter": 500}, {"roc_auc": 0.9}, {"train_rows": 10})
+
+    client.log_batch.assert_called_once()
+    kwargs = client.log_batch.call_args.kwargs
+    assert {p.key: p.value for p in kwargs["params"]} == {"C": "1.0", "max_iter": "500"}
+    assert [(m.key, m.value) for m in kwargs["metrics"]] == [("roc_auc", 0.9)]
+    assert [(t.key, t.value) for t in kwargs["tags"]] == [("train_rows", "10")]
+
+
+def test_upload_run_finishes_only_after_artifacts_confirmed(tmp_path):
+    staging = make_staging(tmp_path)
+    client = MagicMock()
+    client.list_artifacts.return_value = artifacts("model", "encoding.json")
+
+    upload_run(client, "RUN", staging)
+
+    client.log_artifacts.assert_called_once_with("RUN", str(staging))
+    client.set_terminated.assert_called_once_with("RUN", "FINISHED")
+    assert not staging.exists()
+
+
+def test_upload_run_marks_failed_when_artifact_missing(tmp_path):
+    staging = make_staging(tmp_path)
+    client = MagicMock()
+    client.list_artifacts.return_value = artifacts("model")
+
+    with pytest.raises(RuntimeError, match="encoding.json"):
+        upload_run(client, "RUN", staging)
+
+    client.set_terminated.assert_called_once_with("RUN", "FAILED")
+    assert not staging.exists()
+
+
+def test_uploader_runs_in_background_and_wait_blocks(tmp_path):
+    """
+    submit() volta na hora; o run só é finalizado quando o upload termina, e
+    wait() espera por isso.
+    """
+    staging = make_staging(tmp_path)
+    release = threading.Event()
+    client = MagicMock()
+    client.log_artifacts.side_effect = lambda *a: release.wait(5)
+    client.list_artifacts.return_value = artifacts("model", "encoding.json")
+
+    with RunUploader(client, max_workers=1) as uploader:
+        future = uploader.submit("RUN", staging)
+        assert not future.done()
+        client.set_terminated.assert_not_called()
+
+        release.set()
+        uploader.wait()
+
+    client.set_terminated.assert_called_once_with("RUN", "FINISHED")
+    stats = uploader.stats()
+    assert stats["uploads"] == 1
+    assert stats["failed"] == 0
+    assert stats["bytes"] > 0
+
+
+def test_uploader_wait_raises_first_failure_after_all_finish(tmp_path):
+    client = MagicMock()
+    client.log_artifacts.side_effect = [OSError("S3 fora do ar"), None]
+    client.list_artifacts.return_value = artifacts("model", "encoding.json")
+
+    uploader = RunUploader(client, max_workers=1)
+    uploader.submit("RUN-1", make_staging(tmp_path / "a"))
+    uploader.submit("RUN-2", make_staging(tmp_path / "b"))
+
+    with pytest.raises(OSError, match="S3"):
+        uploader.close()
+
+    assert uploader.stats()["failed"] == 1
+    assert uploader.stats()["uploads"] == 1
+    client.set_terminated.assert_any_call("RUN-1", "FAILED")
+    client.set_terminated.assert_any_call("RUN-2", "FINISHED")
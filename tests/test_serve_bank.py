@@ -0,0 +1,414 @@
+# tests/test_serve_bank.py
+import importlib
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src.features import build_vocabulary, feature_columns, load_registry
+
+COLUMNS = feature_columns(load_registry())
+
+
+class DummyModel:
+    """
+    Modelo fake: probabilidade = age / 100, para conferir a ordem das linhas.
+    """
+
+    def __init__(self, columns):
+        self.feature_names_in_ = np.array(columns, dtype=object)
+        self.calls = 0
+
+    def predict_proba(self, X):
+        self.calls += 1
+        p = np.asarray(X)[:, list(self.feature_names_in_).index("age")] / 100
+        return np.column_stack([1 - p, p])
+
+
+def make_record(age, **overrides):
+    record = {col: 0 for col in COLUMNS}
+    record["age"] = age
+    record.update(overrides)
+    return record
+
+
+def fake_version(run_id, version):
+    v = MagicMock()
+    v.run_id = run_id
+    v.version = version
+    return v
+
+
+@pytest.fixture
+def vocabulary(raw_bank_df):
+    return build_vocabulary(raw_bank_df.drop(columns=["y"]))
+
+
+@pytest.fixture
+def registry_client():
+    """
+    MlflowClient fake: a versão em Production é RUN123 / v7.
+    """
+    client = MagicMock()
+    client.get_latest_versions.return_value = [fake_version("RUN123", "7")]
+    return client
+
+
+@pytest.fixture
+def serve(monkeypatch, vocabulary, registry_client):
+    """
+    Importa src.serve_bank com MLflow mockado (o modelo e o vocabulário
+    categórico são carregados no import).
+    """
+    monkeypatch.setenv("MODEL_POLL_INTERVAL", "0")
+    dummy_model = DummyModel(vocabulary["columns"])
+
+    sys.modules.pop("src.serve_bank", None)
+    with (
+        patch("mlflow.tracking.MlflowClient", return_value=registry_client),
+        patch("src.model_cache.load_cached_model", return_value=dummy_model),
+        patch("src.model_cache.load_cached_dict", return_value=vocabulary),
+    ):
+        module = importlib.import_module("src.serve_bank")
+
+    yield module
+    sys.modules.pop("src.serve_bank", None)
+
+
+def test_predict_logs_single_row(serve, monkeypatch):
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+
+    client = TestClient(serve.app)
+    resp = client.post("/predict", json={"input": make_record(80, job_student=1)})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["class"] == 1
+    assert abs(body["probability"] - 0.8) < 1e-9
+
+    # O log só é enfileirado, não gravado no caminho da requisição
+    mock_log.submit.assert_called_once()
+    kwargs = mock_log.submit.call_args.kwargs
+    assert kwargs["run_id"] == "RUN123"
+    assert kwargs["model_version"] == "7"
+    assert kwargs["features"]["job_student"] is True
+    assert kwargs["features"]["age"] == 80
+
+
+def test_predict_missing_features_returns_422(serve, monkeypatch):
+    monkeypatch.setattr(serve, "inference_log", MagicMock())
+
+    client = TestClient(serve.app)
+    record = make_record(40)
+    del record["balance"]
+    resp = client.post("/predict", json={"input": record})
+
+    assert resp.status_code == 422
+    assert "balance" in resp.json()["detail"]
+
+
+def test_predict_non_scalar_feature_returns_422(serve, monkeypatch):
+    monkeypatch.setattr(serve, "inference_log", MagicMock())
+
+    client = TestClient(serve.app)
+    resp = client.post("/predict", json={"input": {**make_record(40), "age": {"a": 1}}})
+
+    assert resp.status_code == 422
+
+
+def test_predict_batch_scores_in_one_call_and_keeps_order(serve, monkeypatch):
+    """
+    Garante que /predict_batch:
+      - chama predict_proba uma única vez para o lote inteiro
+      - devolve classe/probabilidade na mesma ordem do input
+      - enfileira todas as linhas de log com uma única chamada
+    """
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+
+    calls_before = serve.state.model.calls
+    client = TestClient(serve.app)
+    inputs = [make_record(30), make_record(90, job_student=1), make_record(10)]
+    resp = client.post("/predict_batch", json={"inputs": inputs})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["n_rows"] == 3
+    assert [p["class"] for p in body["predictions"]] == [0, 1, 0]
+    assert [round(p["probability"], 6) for p in body["predictions"]] == [0.3, 0.9, 0.1]
+
+    assert serve.state.model.calls == calls_before + 1
+
+    mock_log.submit_many.assert_called_once()
+    records = mock_log.submit_many.call_args[0][0]
+    assert len(records) == 3
+    assert records[1][:2] == ("RUN123", "7")
+    assert records[1][2]["job_student"] is True
+    assert [r[3] for r in records] == pytest.approx([0.3, 0.9, 0.1])
+
+
+def test_predict_batch_empty(serve, monkeypatch):
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+
+    client = TestClient(serve.app)
+    resp = client.post("/predict_batch", json={"inputs": []})
+
+    assert resp.status_code == 200
+    assert resp.json()["predictions"] == []
+    mock_log.submit_many.assert_not_called()
+
+
+RAW_RECORD = {
+    "age": 40,
+    "job": "student",
+    "marital": "single",
+    "education": "tertiary",
+    "default": "no",
+    "balance": 640,
+    "housing": "yes",
+    "loan": "no",
+    "contact": "cellular",
+    "day": 8,
+    "month": "may",
+    "duration": 347,
+    "campaign": 2,
+    "pdays": -1,
+    "previous": 0,
+    "poutcome": "unknown",
+}
+
+
+def test_predict_raw_record(serve, monkeypatch):
+    """
+    input_format="raw" aceita os campos originais do CSV e gera o mesmo vetor
+    que o cliente teria mandado já com as dummies.
+    """
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+
+    client = TestClient(serve.app)
+    resp = client.post("/predict", json={"input": RAW_RECORD, "input_format": "raw"})
+
+    assert resp.status_code == 200
+    assert abs(resp.json()["probability"] - 0.40) < 1e-9
+
+    logged = mock_log.submit.call_args.kwargs["features"]
+    assert logged["job_student"] is True
+    assert logged["marital_single"] is True
+    assert logged["housing_yes"] is True
+    assert logged["month_may"] is True
+    assert logged["poutcome_unknown"] is True
+    assert sum(v is True for v in logged.values()) == 6
+
+
+def test_predict_batch_raw_unknown_category_returns_422(serve, monkeypatch):
+    monkeypatch.setattr(serve, "inference_log", MagicMock())
+
+    client = TestClient(serve.app)
+    inputs = [RAW_RECORD, {**RAW_RECORD, "month": "smarch"}]
+    resp = client.post("/predict_batch", json={"inputs": inputs, "input_format": "raw"})
+
+    assert resp.status_code == 422
+    assert "smarch" in resp.json()["detail"]
+
+
+def test_predict_raw_unavailable_without_vocabulary(serve, monkeypatch):
+    monkeypatch.setattr(serve, "state", serve.state._replace(raw_encoder=None))
+
+    client = TestClient(serve.app)
+    resp = client.post("/predict", json={"input": RAW_RECORD, "input_format": "raw"})
+
+    assert resp.status_code == 400
+
+
+def test_admin_model_reports_live_version(serve):
+    client = TestClient(serve.app)
+    body = client.get("/admin/model").json()
+
+    assert body["version"] == "7"
+    assert body["run_id"] == "RUN123"
+    assert body["raw_input"] is True
+    assert body["reloads"] == 0
+
+
+def test_refresh_model_swaps_state_when_production_changes(
+    serve, monkeypatch, vocabulary, registry_client
+):
+    """
+    Quando a versão em Production muda, o novo modelo é carregado, aquecido e
+    trocado de uma vez; o estado antigo continua válido para quem já o leu.
+    """
+    old_state = serve.state
+    new_model = DummyModel(vocabulary["columns"])
+    monkeypatch.setattr(serve, "load_cached_model", lambda run_id: new_model)
+    monkeypatch.setattr(serve, "load_cached_dict", lambda run_id, path: vocabulary)
+
+    # Mesma versão: nada muda
+    assert serve.refresh_model() is False
+    assert serve.state is old_state
+
+    registry_client.get_latest_versions.return_value = [fake_version("RUN456", "8")]
+    assert serve.refresh_model() is True
+
+    assert serve.state.version == "8"
+    assert serve.state.run_id == "RUN456"
+    assert serve.state.model is new_model
+    assert new_model.calls == 1  # aquecido antes da troca
+    assert old_state.version == "7"
+
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+    client = TestClient(serve.app)
+    client.post("/predict", json={"input": make_record(50)})
+    assert mock_log.submit.call_args.kwargs["model_version"] == "8"
+    assert client.get("/admin/model").json()["reloads"] == 1
+
+
+def test_refresh_model_failure_keeps_serving_old_model(serve, monkeypatch, registry_client):
+    old_state = serve.state
+
+    def broken_load(run_id):
+        raise OSError("artefato indisponível")
+
+    monkeypatch.setattr(serve, "load_cached_model", broken_load)
+    registry_client.get_latest_versions.return_value = [fake_version("RUN456", "8")]
+
+    client = TestClient(serve.app)
+    resp = client.post("/admin/model/reload")
+
+    assert resp.status_code == 503
+    assert serve.state is old_state
+    assert "artefato indisponível" in client.get("/admin/model").json()["last_error"]
+
+
+def test_packed_forest_engine_used_when_enabled(serve, monkeypatch, vocabulary, tmp_path):
+    """
+    Com USE_PACKED_FOREST=1, a nova versão é servida pelo motor compilado
+    (mesmas probabilidades do RandomForest sklearn).
+    """
+    from contextlib import nullcontext
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    from src.forest_engine import PackedForest
+
+    columns = vocabulary["columns"]
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 2, size=(200, len(columns))), columns=columns)
+    y = rng.integers(0, 2, 200)
+    rf = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0).fit(X, y)
+
+    path = tmp_path / "packed_forest.npz"
+    PackedForest.from_estimator(rf).save(path)
+
+    monkeypatch.setattr(serve, "USE_PACKED_FOREST", True)
+    monkeypatch.setattr(serve, "open_artifact", lambda run_id, name: nullcontext(path))
+    monkeypatch.setattr(serve, "load_cached_dict", lambda run_id, name: vocabulary)
+    monkeypatch.setattr(serve, "inference_log", MagicMock())
+
+    serve.state = serve.load_state(fake_version("RUNRF", "9"))
+    assert isinstance(serve.state.model, PackedForest)
+
+    record = X.iloc[0].to_dict()
+    resp = TestClient(serve.app).post("/predict", json={"input": record})
+    assert resp.status_code == 200
+    assert abs(resp.json()["probability"] - rf.predict_proba(X.iloc[:1])[0, 1]) < 1e-12
+    assert TestClient(serve.app).get("/admin/model").json()["engine"] == "PackedForest"
+
+
+def test_prediction_cache_hit_skips_predict_proba_but_is_logged(serve, monkeypatch):
+    """
+    Hits não chamam o modelo, mas continuam indo para inference_logs (o
+    tráfego monitorado não muda com o cache ligado).
+    """
+    from src.prediction_cache import PredictionCache
+
+    # Padrão do código (um infra/.env local pode ter outro valor)
+    monkeypatch.setattr(serve, "PREDICTION_CACHE_LOG_HITS", True)
+    monkeypatch.setattr(serve, "prediction_cache", PredictionCache(max_entries=100))
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+    model = serve.state.model
+    client = TestClient(serve.app)
+
+    client.post("/predict", json={"input": make_record(30)})
+    calls_before = model.calls
+    client.post("/predict", json={"input": make_record(30)})
+    client.post("/predict_batch", json={"inputs": [make_record(30), make_record(30)]})
+
+    assert model.calls == calls_before
+    assert mock_log.submit.call_count == 2
+    assert len(mock_log.submit_many.call_args.args[0]) == 2
+
+
+def test_prediction_cache_hit_skips_predict_proba_and_log(serve, monkeypatch):
+    from src.prediction_cache import PredictionCache
+
+    monkeypatch.setattr(serve, "PREDICTION_CACHE_LOG_HITS", False)
+    monkeypatch.setattr(serve, "prediction_cache", PredictionCache(max_entries=100))
+    mock_log = MagicMock()
+    monkeypatch.setattr(serve, "inference_log", mock_log)
+    model = serve.state.model
+    client = TestClient(serve.app)
+
+    first = client.post("/predict", json={"input": make_record(30)}).json()
+    calls_before = model.calls
+    second = client.post("/predict", json={"input": make_record(30)}).json()
+
+    assert second == first
+    assert model.calls == calls_before
+    mock_log.submit.assert_called_once()
+
+    # Lote: só as linhas novas passam pelo modelo (numa única chamada)
+    resp = client.post(
+        "/predict_batch", json={"inputs": [make_record(30), make_record(60), make_record(30)]}
+    )
+    probas = [p["probability"] for p in resp.json()["predictions"]]
+    assert np.allclose(probas, [0.3, 0.6, 0.3])
+    assert model.calls == calls_before + 1
+    assert len(mock_log.submit_many.call_args.args[0]) == 1
+
+    stats = client.get("/admin/model").json()["prediction_cache"]
+    assert stats["hits"] == 3
+    assert stats["misses"] == 2
+
+
+def test_prediction_cache_cleared_on_model_swap(serve, monkeypatch, vocabulary, registry_client):
+    from src.prediction_cache import PredictionCache
+
+    cache = PredictionCache(max_entries=100)
+    monkeypatch.setattr(serve, "prediction_cache", cache)
+    monkeypatch.setattr(serve, "inference_log", MagicMock())
+    client = TestClient(serve.app)
+    client.post("/predict", json={"input": make_record(30)})
+    assert cache.stats()["entries"] == 1
+
+    new_model = DummyModel(vocabulary["columns"])
+    monkeypatch.setattr(serve, "load_cached_model", lambda run_id: new_model)
+    monkeypatch.setattr(serve, "load_cached_dict", lambda run_id, path: vocabulary)
+    registry_client.get_latest_versions.return_value = [fake_version("RUN456", "8")]
+    serve.refresh_model()
+
+    assert cache.stats()["entries"] == 0
+    client.post("/predict", json={"input": make_record(30)})
+    assert new_model.calls == 2  # aquecimento + predição (sem hit do modelo antigo)
+
+
+def test_predict_goes_through_micro_batcher_when_enabled(serve, monkeypatch):
+    from src.micro_batcher import MicroBatcher
+
+    batcher = MicroBatcher(max_batch=16, max_wait=0.001)
+    monkeypatch.setattr(serve, "micro_batcher", batcher)
+    monkeypatch.setattr(serve, "inference_log", MagicMock())
+
+    resp = TestClient(serve.app).post("/predict", json={"input": make_record(40)})
+    batcher.stop()
+
+    assert resp.status_code == 200
+    assert abs(resp.json()["probability"] - 0.4) < 1e-9
+    assert batcher.stats()["requests"] == 1
@@ -0,0 +1,44 @@
+# tests/test_stage_cache.py
+from src.stage_cache import code_version, load_manifest, lookup, record, stage_key
+
+
+def test_stage_key_changes_with_params_files_and_code(tmp_path):
+    raw = tmp_path / "bank-full.csv"
+    raw.write_text("a;b\n1;2\n")
+    code = tmp_path / "stage.py"
+    code.write_text("x = 1\n")
+
+    base = stage_key("data", {"test_size": 0.2}, files=[raw], code=code_version(code))
+    assert base == stage_key("data", {"test_size": 0.2}, files=[raw], code=code_version(code))
+
+    assert base != stage_key("data", {"test_size": 0.3}, files=[raw], code=code_version(code))
+
+    raw.write_text("a;b\n1;3\n")
+    changed_file = stage_key("data", {"test_size": 0.2}, files=[raw], code=code_version(code))
+    assert changed_file != base
+
+    code.write_text("x = 2\n")
+    assert changed_file != stage_key(
+        "data", {"test_size": 0.2}, files=[raw], code=code_version(code)
+    )
+
+
+def test_record_and_lookup_track_hits(isolated_stage_cache):
+    assert lookup("train", "k1") is None
+
+    record("train", "k1", "miss", outputs={"run_id": "RUN1"})
+    assert lookup("train", "k1") == {"run_id": "RUN1"}
+    assert lookup("train", "k2") is None
+
+    record("train", "k1", "hit")
+    record("train", "k1", "hit")
+
+    manifest = load_manifest()
+    assert manifest["stages"]["train"]["hits"] == 2
+    assert [e["event"] for e in manifest["history"]] == ["miss", "hit", "hit"]
+
+    # Nova chave (ou --force) substitui o resultado cacheado do estágio
+    record("train", "k2", "force", outputs={"run_id": "RUN2"})
+    assert lookup("train", "k1") is None
+    assert load_manifest()["stages"]["train"]["hits"] == 0
+    assert (isolated_stage_cache / "manifest.json").exists()
@@ -1,9 +1,10 @@
 # tests/test_train_bank_marketing.py
 import json
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
 import numpy as np
 import pandas as pd
+import pytest
 
 import src.train_bank_marketing as tbm
 
@@ -26,82 +27,156 @@ def test_compute_metric_f1_and_roc_auc():
     assert roc == 1.0
 
 
-def test_train_and_log_uses_mlflow(monkeypatch):
+@pytest.fixture
+def mlflow_file_store(tmp_path):
     """
-    Testa se train_and_log:
-      - chama fit e predict_proba do modelo
-      - chama mlflow.log_params, mlflow.log_metric
-      - chama mlflow.sklearn.log_model
-      - retorna dict com run_id vindo do mlflow.active_run()
+    Tracking/registry do MLflow em um file store temporário, com o
+    experimento "bank-marketing" criado. Restaura a URI anterior no fim.
     """
+    previous_uri = tbm.mlflow.get_tracking_uri()
+    tbm.mlflow.set_tracking_uri((tmp_path / "mlruns").as_uri())
+    client = tbm.MlflowClient()
+    exp_id = client.create_experiment("bank-marketing")
+    tbm.mlflow.set_experiment(experiment_id=exp_id)
+    yield client
+    tbm.mlflow.set_tracking_uri(previous_uri)
 
-    X_train = pd.DataFrame({"f1": [0, 1, 2], "f2": [3, 4, 5]})
-    y_train = [0, 1, 0]
-    X_test = pd.DataFrame({"f1": [10, 11], "f2": [12, 13]})
-    y_test = [0, 1]
 
-    class DummyModel:
-        def __init__(self):
-            self._params = {"C": 1.0}
+def test_train_and_log_uses_mlflow(mlflow_file_store):
+    """
+    train_and_log loga params/métrica/tags, o modelo com assinatura e só
+    retorna com o run finalizado e o modelo carregável do artifact store.
+    """
+    from sklearn.linear_model import LogisticRegression
 
-        def fit(self, X, y):
-            self._fitted = True
+    X_train = pd.DataFrame({"f1": [0, 1, 2, 3], "f2": [3, 4, 5, 6]})
+    y_train = [0, 1, 0, 1]
 
-        def predict_proba(self, X):
-            # Retorna numpy array para suportar [:,1] no código de produção
-            return np.array([[0.4, 0.6]] * len(X))
+    result = tbm.train_and_log(
+        model_name="log_reg",
+        model=LogisticRegression(C=0.5),
+        X_train=X_train,
+        y_train=y_train,
+        X_test=X_train,
+        y_test=y_train,
+        metric_name="roc_auc",
+        tags={"train_rows": 4},
+    )
 
-        def get_params(self, deep=True):
-            return self._params
+    run = mlflow_file_store.get_run(result["run_id"])
+    assert result["model_name"] == "log_reg"
+    assert isinstance(result["metric"], float)
+    assert run.info.run_name == "log_reg"
+    assert run.info.status == "FINISHED"
+    assert run.data.params["C"] == "0.5"
+    assert run.data.metrics["roc_auc"] == result["metric"]
+    assert run.data.tags["train_rows"] == "4"
+    # Proveniência como no mlflow.start_run + log_model
+    for tag in ("mlflow.user", "mlflow.source.name", "mlflow.source.type"):
+        assert tag in run.data.tags
+    history = json.loads(run.data.tags["mlflow.log-model.history"])
+    assert history[0]["run_id"] == result["run_id"]
+    assert history[0]["artifact_path"] == "model"
+
+    model = tbm.mlflow.sklearn.load_model(f"runs:/{result['run_id']}/model")
+    assert model.predict_proba(X_train).shape == (4, 2)
+    mlmodel = tbm.mlflow.models.get_model_info(f"runs:/{result['run_id']}/model")
+    assert mlmodel.signature is not None
+
+
+def test_train_and_log_batches_params_and_metrics(mlflow_file_store, monkeypatch):
+    """
+    Params, métrica e tags vão em um único log_batch por run.
+    """
+    from sklearn.linear_model import LogisticRegression
 
-    dummy_model = DummyModel()
+    calls = []
+    original = tbm.MlflowClient.log_batch
 
-    mock_run_ctx = MagicMock()
-    mock_run_ctx.__enter__.return_value = MagicMock()
-    mock_run_ctx.__exit__.return_value = False
+    def spy(self, run_id, *args, **kwargs):
+        calls.append(run_id)
+        return original(self, run_id, *args, **kwargs)
 
-    monkeypatch.setattr(tbm.mlflow, "start_run", lambda run_name=None: mock_run_ctx)
+    monkeypatch.setattr(tbm.MlflowClient, "log_batch", spy)
 
-    active_run_mock = MagicMock()
-    active_run_mock.info.run_id = "fake-run-id"
-    monkeypatch.setattr(tbm.mlflow, "active_run", lambda: active_run_mock)
+    X = pd.DataFrame({"f1": [0, 1, 2, 3]})
+    result = tbm.train_and_log("lr", LogisticRegression(), X, [0, 1, 0, 1], X, [0, 1, 0, 1], "f1")
 
-    mock_log_params = MagicMock()
-    mock_log_metric = MagicMock()
-    mock_log_model = MagicMock()
+    assert calls == [result["run_id"]]
 
-    monkeypatch.setattr(tbm.mlflow, "log_params", mock_log_params)
-    monkeypatch.setattr(tbm.mlflow, "log_metric", mock_log_metric)
-    monkeypatch.setattr(tbm.mlflow.sklearn, "log_model", mock_log_model)
 
-    mock_signature = MagicMock()
-    monkeypatch.setattr(tbm, "infer_signature", MagicMock(return_value=mock_signature))
+def test_train_and_log_logs_encoding_with_model(mlflow_file_store):
+    """
+    O vocabulário categórico (encoding.json) é logado no mesmo run do modelo.
+    """
+    from sklearn.linear_model import LogisticRegression
 
-    result = tbm.train_and_log(
-        model_name="dummy_model",
-        model=dummy_model,
-        X_train=X_train,
-        y_train=y_train,
-        X_test=X_test,
-        y_test=y_test,
-        metric_name="roc_auc",
-    )
+    X = pd.DataFrame({"f1": [0, 1, 2, 3], "f2": [3, 4, 5, 6]})
+    y = [0, 1, 0, 1]
 
-    mock_log_params.assert_called_once()
-    mock_log_metric.assert_called_once()
-    mock_log_model.assert_called_once()
+    encoding = {"version": 1, "columns": ["f1", "f2"]}
+    result = tbm.train_and_log("lr", LogisticRegression(), X, y, X, y, "roc_auc", encoding=encoding)
 
-    assert result["model_name"] == "dummy_model"
-    assert result["run_id"] == "fake-run-id"
-    assert isinstance(result["metric"], float)
+    logged = tbm.mlflow.artifacts.load_dict(f"runs:/{result['run_id']}/encoding.json")
+    assert logged == encoding
+
+
+def test_train_and_log_logs_packed_forest_for_rf(mlflow_file_store):
+    """
+    Para Random Forest, o run também recebe o artefato packed_forest.npz.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = pd.DataFrame({"f1": [0, 1, 2, 3], "f2": [3, 4, 5, 6]})
+    y = [0, 1, 0, 1]
+
+    rf = RandomForestClassifier(n_estimators=5, random_state=0)
+    result = tbm.train_and_log("rf", rf, X, y, X, y, "roc_auc")
+
+    path = tbm.mlflow.artifacts.download_artifacts(f"runs:/{result['run_id']}/packed_forest.npz")
+    assert tbm.PackedForest.load(path).n_trees == 5
+
+
+def test_train_candidates_uploads_in_background(mlflow_file_store, monkeypatch):
+    """
+    Treino sequencial: cada upload é entregue ao RunUploader e o próximo
+    candidato treina sem esperar; no retorno todos os runs estão finalizados.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
 
+    monkeypatch.setenv("TRAIN_N_JOBS", "1")
+    submitted = []
+    original = tbm.RunUploader.submit
 
-def test_log_training_metadata_to_db_inserts_and_closes(monkeypatch):
+    def spy(self, run_id, local_dir):
+        # Nenhum run termina antes de o upload dele ser confirmado
+        assert mlflow_file_store.get_run(run_id).info.status == "RUNNING"
+        submitted.append(run_id)
+        return original(self, run_id, local_dir)
+
+    monkeypatch.setattr(tbm.RunUploader, "submit", spy)
+
+    X = pd.DataFrame({"f1": np.arange(20.0), "f2": np.arange(20.0) % 3})
+    y = (X["f1"] > 9).astype(int).to_numpy()
+    models = {
+        "log_reg": LogisticRegression(),
+        "rf": RandomForestClassifier(n_estimators=3, random_state=0),
+    }
+
+    results = tbm.train_candidates(models, X, y, X, y, "roc_auc")
+
+    assert submitted == [r["run_id"] for r in results]
+    statuses = {mlflow_file_store.get_run(r["run_id"]).info.status for r in results}
+    assert statuses == {"FINISHED"}
+
+
+def test_log_training_metadata_to_db_inserts_via_pool(fake_pooled_conn):
     """
     Garante que log_training_metadata_to_db:
-      - abre conexão com psycopg2.connect
+      - usa uma conexão do pool (pooled_conn)
       - executa INSERT na tabela training_data
-      - commita e fecha cursor/conn
+      - fecha o cursor
       - salva feature_stats como JSON
     """
 
@@ -110,27 +185,22 @@ def test_log_training_metadata_to_db_inserts_and_closes(monkeypatch):
     y_train = [0, 1, 0]
     y_test = [1, 0]
 
-    fake_conn = MagicMock()
-    fake_cursor = MagicMock()
-    fake_conn.cursor.return_value = fake_cursor
-
-    with patch("src.train_bank_marketing.psycopg2.connect", return_value=fake_conn):
-        tbm.log_training_metadata_to_db(
-            X_train=X_train,
-            X_test=X_test,
-            y_train=y_train,
-            y_test=y_test,
-            run_id="run-xyz",
-            model_version=2,
-            metric_name="roc_auc",
-            metric_value=0.88,
-        )
+    fake_conn, fake_cursor = fake_pooled_conn("src.train_bank_marketing")
+
+    tbm.log_training_metadata_to_db(
+        X_train=X_train,
+        X_test=X_test,
+        y_train=y_train,
+        y_test=y_test,
+        run_id="run-xyz",
+        model_version=2,
+        metric_name="roc_auc",
+        metric_value=0.88,
+    )
 
     fake_conn.cursor.assert_called_once()
     fake_cursor.execute.assert_called_once()
-    fake_conn.commit.assert_called_once()
     fake_cursor.close.assert_called_once()
-    fake_conn.close.assert_called_once()
 
     sql, params = fake_cursor.execute.call_args[0]
     assert "INSERT INTO training_data" in sql
@@ -146,3 +216,402 @@ def test_log_training_metadata_to_db_inserts_and_closes(monkeypatch):
     feature_stats = json.loads(params[7])
     assert "f1" in feature_stats
     assert "f2" in feature_stats
+
+    histograms = json.loads(params[9])
+    assert sum(histograms["f1"]["counts"]) == len(X_train)
+    # Sem dummies do registry em X_train: nenhum grupo categórico
+    assert json.loads(params[10]) == {}
+
+
+def test_main_reuses_cached_run_when_inputs_unchanged(tmp_path, monkeypatch):
+    """
+    Segunda execução com os mesmos dados/parâmetros/código não treina nem
+    registra de novo: devolve o run da execução anterior. --force retreina.
+    """
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    (processed / "X_train.feather").write_bytes(b"dados")
+    monkeypatch.setattr(tbm, "PROCESSED", processed)
+
+    X = pd.DataFrame({"f1": [0, 1, 2, 3], "f2": [3, 4, 5, 6]})
+    y = [0, 1, 0, 1]
+    load_calls = []
+
+    def fake_load_data():
+        load_calls.append(1)
+        return X, X, y, y
+
+    monkeypatch.setattr(tbm, "load_data", fake_load_data)
+    monkeypatch.setattr(tbm, "load_encoding", lambda: None)
+    monkeypatch.setattr(
+        tbm,
+        "train_and_log",
+        lambda name, *a, **k: {"model_name": name, "metric": 0.9, "run_id": f"RUN-{name}"},
+    )
+    monkeypatch.setattr(tbm.mlflow, "register_model", MagicMock(return_value=MagicMock(version=3)))
+    monkeypatch.setattr(tbm, "log_training_metadata_to_db", MagicMock())
+    monkeypatch.setattr(tbm, "close_pool", MagicMock())
+    monkeypatch.setattr(tbm, "cached_run_available", lambda outputs, name: True)
+
+    first = tbm.main()
+    second = tbm.main()
+
+    assert second == first
+    assert len(load_calls) == 1
+    tbm.mlflow.register_model.assert_called_once()
+
+    tbm.main(force=True)
+    assert len(load_calls) == 2
+
+    # Run removido do MLflow: o cache não vale mais
+    monkeypatch.setattr(tbm, "cached_run_available", lambda outputs, name: False)
+    tbm.main()
+    assert len(load_calls) == 3
+
+    # Dados processados mudaram: nova chave
+    monkeypatch.setattr(tbm, "cached_run_available", lambda outputs, name: True)
+    (processed / "X_train.feather").write_bytes(b"outros dados")
+    tbm.main()
+    assert len(load_calls) == 4
+
+
+def test_code_files_cover_modules_that_shape_the_run():
+    """
+    Encoding/dtypes, histogramas de drift e o upload dos artefatos entram no
+    hash do estágio: mudar só esses módulos também invalida o cache.
+    """
+    names = {path.name for path in tbm.CODE_FILES}
+    assert all(path.exists() for path in tbm.CODE_FILES)
+    assert {"features.py", "drift_engine.py", "run_uploader.py"} <= names
+
+
+def test_plan_parallelism_splits_core_budget():
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    models = {"lr": LogisticRegression(), "rf": RandomForestClassifier(n_jobs=-1)}
+
+    assert tbm.plan_parallelism(models, cores=8) == (2, 4)
+    assert models["rf"].n_jobs == 4
+
+    assert tbm.plan_parallelism(models, cores=8, max_workers=1) == (1, 8)
+    assert tbm.plan_parallelism(models, cores=1) == (1, 1)
+    assert models["rf"].n_jobs == 1
+
+
+def test_train_candidates_in_process_pool(tmp_path, monkeypatch):
+    """
+    Com orçamento de 2 núcleos, cada candidato treina em seu processo, loga o
+    próprio run e os resultados voltam na ordem dos candidatos.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    tracking_uri = (tmp_path / "mlruns").as_uri()
+    monkeypatch.setattr(tbm.mlflow, "get_tracking_uri", lambda: tracking_uri)
+    mlflow_client = tbm.MlflowClient(tracking_uri=tracking_uri)
+    exp_id = mlflow_client.create_experiment("bank-marketing")
+    monkeypatch.setattr(
+        tbm.mlflow, "get_experiment_by_name", lambda name: MagicMock(experiment_id=exp_id)
+    )
+    monkeypatch.setenv("TRAIN_N_JOBS", "2")
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"f1": rng.normal(size=80), "f2": rng.random(80) < 0.5})
+    y = (X["f1"] > 0).astype(int).to_numpy()
+    models = {
+        "log_reg": LogisticRegression(),
+        "rf": RandomForestClassifier(n_estimators=5, random_state=0, n_jobs=-1),
+    }
+
+    results = tbm.train_candidates(models, X, y, X, y, "roc_auc")
+
+    assert [r["model_name"] for r in results] == ["log_reg", "rf"]
+    runs = {r["run_id"]: mlflow_client.get_run(r["run_id"]) for r in results}
+    assert {run.info.run_name for run in runs.values()} == {"log_reg", "rf"}
+    rf_run = runs[results[1]["run_id"]]
+    assert rf_run.data.params["n_jobs"] == "1"
+
+
+def test_search_candidate_logs_nested_trials_and_returns_best(tmp_path, monkeypatch):
+    """
+    Successive halving: todas as configurações começam com pouco recurso,
+    cada trial vira run aninhado e o vencedor volta como estimador não treinado.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    tracking_uri = (tmp_path / "mlruns").as_uri()
+    previous_uri = tbm.mlflow.get_tracking_uri()
+    tbm.mlflow.set_tracking_uri(tracking_uri)
+    try:
+        exp_id = tbm.mlflow.create_experiment("search-test")
+        tbm.mlflow.set_experiment(experiment_id=exp_id)
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame({"f1": rng.normal(size=300), "f2": rng.normal(size=300)})
+        y = ((X["f1"] + 0.3 * rng.normal(size=300)) > 0).astype(int).to_numpy()
+        space = {
+            "params": {"max_depth": [2, 4, 8], "min_samples_leaf": [1, 5, 20]},
+            "resource": "n_estimators",
+            "max_resources": 18,
+        }
+        config = {"n_candidates": 6, "factor": 3, "cv": 2}
+
+        best = tbm.search_candidate(
+            "rf", RandomForestClassifier(random_state=0), space, X, y, "roc_auc", config, 1
+        )
+
+        runs = tbm.mlflow.search_runs(experiment_ids=[exp_id], output_format="list")
+    finally:
+        tbm.mlflow.set_tracking_uri(previous_uri)
+
+    assert not hasattr(best, "estimators_")
+    assert best.max_depth in (2, 4, 8)
+    assert best.n_estimators == 18
+
+    parent = [r for r in runs if r.info.run_name == "search:rf"]
+    trials = [r for r in runs if r.info.run_name.startswith("rf-trial-")]
+    assert len(parent) == 1
+    # 6 configs na 1ª rodada + as 2 melhores na 2ª
+    assert len(trials) == 8
+    assert all(t.data.tags["mlflow.parentRunId"] == parent[0].info.run_id for t in trials)
+    assert all("mlflow.source.name" in r.data.tags for r in parent + trials)
+    assert "best_max_depth" in parent[0].data.params
+
+
+def test_main_uses_search_winners_when_enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(tbm, "PROCESSED", tmp_path)
+    monkeypatch.setenv("TRAIN_SEARCH", "1")
+
+    X = pd.DataFrame({"f1": [0, 1, 2, 3]})
+    monkeypatch.setattr(tbm, "load_data", lambda: (X, X, [0, 1, 0, 1], [0, 1, 0, 1]))
+    monkeypatch.setattr(tbm, "load_encoding", lambda: None)
+
+    winners = {"rf": MagicMock()}
+    monkeypatch.setattr(tbm, "search_candidates", lambda models, *a: winners)
+    trained = {}
+
+    def fake_train_candidates(models, *args, **kwargs):
+        trained.update(models)
+        return [{"model_name": "rf", "metric": 0.9, "run_id": "RUN-rf"}]
+
+    monkeypatch.setattr(tbm, "train_candidates", fake_train_candidates)
+    monkeypatch.setattr(tbm.mlflow, "register_model", MagicMock(return_value=MagicMock(version=1)))
+    monkeypatch.setattr(tbm, "log_training_metadata_to_db", MagicMock())
+    monkeypatch.setattr(tbm, "close_pool", MagicMock())
+
+    tbm.main()
+
+    assert trained == winners
+    tbm.mlflow.register_model.assert_called_once_with("runs:/RUN-rf/model", "bank-model")
+
+
+def test_warm_start_model_keeps_previous_fit():
+    """
+    RF ganha árvores novas sem refazer as antigas; LR continua dos
+    coeficientes atuais. Outros estimadores não têm modo incremental.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"f1": rng.normal(size=200), "f2": rng.normal(size=200)})
+    y = (X["f1"] > 0).astype(int).to_numpy()
+
+    rf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X[:100], y[:100])
+    old_trees = list(rf.estimators_)
+    tbm.warm_start_model(rf, extra_trees=5).fit(X[100:], y[100:])
+    assert len(rf.estimators_) == 15
+    assert rf.estimators_[:10] == old_trees
+
+    lr = LogisticRegression().fit(X[:100], y[:100])
+    assert tbm.warm_start_model(lr, extra_trees=5).warm_start is True
+
+    # Só o RF treina apenas nas linhas novas; a LR reajusta no treino inteiro
+    X_fit, _ = tbm.incremental_fit_rows(rf, X, y, X[100:], y[100:])
+    assert len(X_fit) == 100
+    X_fit, _ = tbm.incremental_fit_rows(lr, X, y, X[100:], y[100:])
+    assert len(X_fit) == 200
+
+    try:
+        tbm.warm_start_model(MagicMock(), extra_trees=5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("esperava ValueError")
+
+
+def test_new_rows_since_requires_matching_snapshot():
+    X = pd.DataFrame({"f1": [0, 1, 2, 3, 4], "f2": [5, 6, 7, 8, 9]})
+    y = np.array([0, 1, 0, 1, 1])
+    snapshot = tbm.snapshot_tags(X.iloc[:3], y[:3])
+
+    X_new, y_new = tbm.new_rows_since(snapshot, X, y)
+    assert X_new["f1"].tolist() == [3, 4]
+    assert y_new.tolist() == [1, 1]
+
+    # Histórico reprocessado (outra ordem): não dá para saber o que é novo
+    shuffled = X.iloc[::-1].reset_index(drop=True)
+    for args in ((snapshot, shuffled, y[::-1]), ({}, X, y)):
+        try:
+            tbm.new_rows_since(*args)
+        except ValueError:
+            continue
+        raise AssertionError("esperava ValueError")
+
+
+def test_main_incremental_trains_on_new_rows_and_registers(mlflow_file_store, monkeypatch):
+    """
+    Com a v1 em Production treinada nas 60 primeiras linhas, o incremental
+    acha as 40 novas e registra a v2 com o novo snapshot. A regressão
+    logística (lbfgs) é reajustada no treino inteiro, partindo dos
+    coeficientes da v1.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"f1": rng.normal(size=100), "f2": rng.normal(size=100)})
+    y = ((X["f1"] + 0.5 * rng.normal(size=100)) > 0).astype(int).to_numpy()
+
+    monkeypatch.setattr(tbm, "load_data", lambda: (X, X, y, y))
+    monkeypatch.setattr(tbm, "load_encoding", lambda: None)
+    monkeypatch.setattr(
+        tbm,
+        "load_cached_model",
+        lambda run_id: tbm.mlflow.sklearn.load_model(f"runs:/{run_id}/model"),
+    )
+    metadata = MagicMock()
+    monkeypatch.setattr(tbm, "log_training_metadata_to_db", metadata)
+    monkeypatch.setattr(tbm, "close_pool", MagicMock())
+
+    base = tbm.train_and_log(
+        "log_reg",
+        LogisticRegression(),
+        X.iloc[:60],
+        y[:60],
+        X,
+        y,
+        "roc_auc",
+        tags=tbm.snapshot_tags(X.iloc[:60], y[:60]),
+    )
+    tbm.mlflow.register_model(f"runs:/{base['run_id']}/model", "bank-model")
+    client = mlflow_file_store
+    client.transition_model_version_stage("bank-model", "1", "Production")
+
+    fitted_rows = []
+    train_and_log = tbm.train_and_log
+
+    def recording_train_and_log(name, model, X_fit, *args, **kwargs):
+        fitted_rows.append(len(X_fit))
+        return train_and_log(name, model, X_fit, *args, **kwargs)
+
+    monkeypatch.setattr(tbm, "train_and_log", recording_train_and_log)
+    result = tbm.main_incremental()
+
+    run = client.get_run(result["run_id"])
+    versions = client.search_model_versions("name='bank-model'")
+
+    assert run.info.run_name == "log_reg-incremental"
+    assert run.data.tags["incremental_from_version"] == "1"
+    assert run.data.tags["incremental_rows"] == "40"
+    assert run.data.tags["train_rows"] == "100"
+    assert run.data.params["warm_start"] == "True"
+    assert fitted_rows == [100]
+    assert {str(v.version) for v in versions} == {"1", "2"}
+    assert str(metadata.call_args.kwargs["model_version"]) == "2"
+    assert len(metadata.call_args.kwargs["X_train"]) == 100
+
+
+def test_main_copies_training_rows_in_background(tmp_path, monkeypatch):
+    """
+    Com TRAIN_MATERIALIZE_ROWS=1 o COPY do treino começa antes do fit, com o
+    snapshot do treino como chave, que também vai para training_data.
+    """
+    monkeypatch.setattr(tbm, "PROCESSED", tmp_path)
+    monkeypatch.setenv("TRAIN_MATERIALIZE_ROWS", "1")
+
+    X = pd.DataFrame({"f1": [0, 1, 2, 3]})
+    y = np.array([0, 1, 0, 1])
+    monkeypatch.setattr(tbm, "load_data", lambda: (X, X, y, y))
+    monkeypatch.setattr(tbm, "load_encoding", lambda: None)
+
+    events = []
+
+    def fake_copy(snapshot, X_train, y_train, chunk_size):
+        events.append(("copy", snapshot, len(X_train)))
+        return len(X_train)
+
+    def fake_train_candidates(models, *args, **kwargs):
+        events.append(("train",))
+        return [{"model_name": "rf", "metric": 0.9, "run_id": "RUN-rf"}]
+
+    monkeypatch.setattr(tbm, "copy_training_rows", fake_copy)
+    monkeypatch.setattr(tbm, "train_candidates", fake_train_candidates)
+    monkeypatch.setattr(tbm.mlflow, "register_model", MagicMock(return_value=MagicMock(version=1)))
+    metadata = MagicMock()
+    monkeypatch.setattr(tbm, "log_training_metadata_to_db", metadata)
+    monkeypatch.setattr(tbm, "close_pool", MagicMock())
+
+    tbm.main()
+
+    snapshot = tbm.data_fingerprint(X, y)
+    assert ("copy", snapshot, 4) in events
+    assert metadata.call_args.kwargs["train_snapshot"] == snapshot
+
+
+def test_training_rows_copy_failure_does_not_break_training(monkeypatch, capsys):
+    monkeypatch.setenv("TRAIN_MATERIALIZE_ROWS", "1")
+
+    def broken_copy(*args):
+        raise RuntimeError("postgres fora do ar")
+
+    monkeypatch.setattr(tbm, "copy_training_rows", broken_copy)
+
+    future = tbm.start_training_rows_copy("SNAP", pd.DataFrame({"f1": [1]}), [0])
+    tbm.finish_training_rows_copy(future)
+
+    assert "postgres fora do ar" in capsys.readouterr().out
+
+    monkeypatch.setenv("TRAIN_MATERIALIZE_ROWS", "0")
+    assert tbm.start_training_rows_copy("SNAP", None, None) is None
+
+
+def test_candidates_for_budget():
+    config = {"n_candidates": 24, "factor": 3, "cv": 3, "budget_s": 60}
+
+    # Rodada = 3 x 3 fits de 1s em 1 núcleo = 9s
+    assert tbm.candidates_for_budget(9 * 3, 1.0, config, n_jobs=1) == 9
+    assert tbm.candidates_for_budget(9 * 3, 1.0, config, n_jobs=3) == 24
+    assert tbm.candidates_for_budget(9 * 1, 1.0, config, n_jobs=1) == 0
+
+
+def test_search_candidate_runs_estimator_single_threaded_within_budget(monkeypatch):
+    """
+    Na busca o estimador usa n_jobs=1 (o paralelismo é do halving) e o
+    orçamento limita o nº de configurações; sem orçamento, fica o padrão.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    seen = {}
+
+    class FakeSearch:
+        def __init__(self, estimator, params, n_candidates, n_jobs, **kwargs):
+            seen.update(estimator_n_jobs=estimator.n_jobs, n_candidates=n_candidates)
+            raise StopIteration
+
+    monkeypatch.setattr(tbm, "HalvingRandomSearchCV", FakeSearch)
+    monkeypatch.setattr(tbm, "probe_fit_seconds", lambda *a: 1.0)
+    model = RandomForestClassifier(n_jobs=-1)
+    space = {"params": {}, "resource": "n_estimators", "max_resources": 10}
+    config = {"n_candidates": 24, "factor": 3, "cv": 3, "budget_s": 1.0 + 27}
+
+    try:
+        tbm.search_candidate("rf", model, space, None, None, "roc_auc", config, 1)
+    except StopIteration:
+        pass
+    assert seen == {"estimator_n_jobs": 1, "n_candidates": 9}
+    assert model.n_jobs == -1
+
+    config["budget_s"] = 5.0
+    best = tbm.search_candidate("rf", model, space, None, None, "roc_auc", config, 1)
+    assert best.get_params() == model.get_params()